@@ -23,17 +23,42 @@ from __future__ import absolute_import, unicode_literals, print_function
 
 import io
 import os
+import json
+import time
 import shlex
-import shutil
+from collections import OrderedDict
 
 from . import task
+from .executor import invoke_tasks
+from .uptodate import uptodate
 from .. import config
 from ..util import antglob, notify, shell, buildsys
+from ..util.filesys import remove_files, move_to_trash, purge_trash, disk_usage, TRASH_DIR
 from ..util._compat import isodate
 
 
 __all__ = ['help', 'clean', 'build', 'freeze']
 
+# Never considered as inputs of builds
+BUILD_EXCLUDES = [
+    '.git/', '.hg/', '.svn/', '.tox/', '.eggs/', '.rituals-trash/', 'build/', 'dist/', '{docs,doc}/_build/',
+    '**/__pycache__/', '**/*.py[co]', '**/*.egg-info/', '**/*~',
+]
+
+
+def build_inputs(_ctx, cfg, docs=False):
+    """Return patterns of all files a build depends on."""
+    patterns = ['setup.py', 'setup.cfg', 'pyproject.toml', 'MANIFEST.in', 'requirements.txt']
+    patterns.append('**/*' if cfg.srcdir in ('', '.') else cfg.srcdir + '/**/*')
+    if docs:
+        patterns.extend(['*.md', '*.rst', '{docs,doc}/**/*'])
+    return patterns + [antglob.excludes(i) for i in BUILD_EXCLUDES]
+
+
+def build_outputs(_ctx, _cfg, docs=False):
+    """Return patterns of the paths a build creates."""
+    return ['build/lib*'] + (['doc*/_build/index.html'] if docs else [])
+
 
 @task(default=True)
 def help(_dummy_ctx): # pylint: disable=redefined-builtin
@@ -43,33 +68,42 @@ def help(_dummy_ctx): # pylint: disable=redefined-builtin
     notify.info("Use 'invoke -h ‹taskname›' to get detailed help.")
 
 
-@task(help=dict(
-    docs="Also clean the documentation build area",
-    backups="Also clean '*~' files etc.",
-    bytecode="Also clean '.pyc', '.pyo', and package metadata",
-    dist="Also clean the 'dist' dir",
-    all="The same as --backups --bytecode --dist --docs",
-    venv="Include an existing virtualenv (in '.' or in '.venv')",
-    tox="Include '.tox' directory",
-    extra="Any extra patterns, space-separated and possibly quoted",
-))
-def clean(_dummy_ctx, docs=False, backups=False, bytecode=False, dist=False, # pylint: disable=redefined-outer-name
-        all=False, venv=False, tox=False, extra=''): # pylint: disable=redefined-builtin
-    """Perform house-keeping."""
-    cfg = config.load()
-    notify.banner("Cleaning up project files")
+def clean_report(fileset, names, usage, dry_run=False):
+    """ Aggregate matched `names` and their `usage` by the pattern that selected them.
 
+        Returns a JSON-serializable dict.
+    """
+    by_pattern = OrderedDict()
+    for name, (count, size) in zip(names, usage):
+        pattern = fileset.matching(name.rstrip('/'), is_dir=name.endswith('/'))
+        entry = by_pattern.setdefault(pattern.spec, dict(pattern=pattern.spec, files=0, bytes=0, paths=[]))
+        entry['files'] += count
+        entry['bytes'] += size
+        entry['paths'].append(dict(path=name, files=count, bytes=size))
+
+    return dict(
+        root=fileset.root,
+        dry_run=dry_run,
+        files=sum(i[0] for i in usage),
+        bytes=sum(i[1] for i in usage),
+        patterns=list(by_pattern.values()),
+    )
+
+
+def clean_fileset(cfg, docs=False, backups=False, bytecode=False, dist=False, venv=False, tox=False, extra=''):
+    """ Build the fileset of things to clean, according to the given options.
+    """
     # Add patterns based on given parameters
     venv_dirs = ['bin', 'include', 'lib', 'share', 'local', '.venv']
     patterns = ['build/', 'pip-selfcheck.json']
-    excludes = ['.git/', '.hg/', '.svn/', 'debian/*/']
-    if docs or all:
+    excludes = ['.git/', '.hg/', '.svn/', 'debian/*/', TRASH_DIR + '/']
+    if docs:
         patterns.extend(['docs/_build/', 'doc/_build/'])
-    if dist or all:
+    if dist:
         patterns.append('dist/')
-    if backups or all:
+    if backups:
         patterns.extend(['**/*~'])
-    if bytecode or all:
+    if bytecode:
         patterns.extend([
             '**/*.py[co]', '**/__pycache__/', '*.egg-info/',
             cfg.srcjoin('*.egg-info/')[len(cfg.project_root)+1:],
@@ -88,20 +122,97 @@ def clean(_dummy_ctx, docs=False, backups=False, bytecode=False, dist=False, # p
     if not venv:
         # Do not scan venv dirs when not cleaning them
         patterns.extend([antglob.excludes(i + '/') for i in venv_dirs])
-    fileset = antglob.FileSet(cfg.project_root, patterns)
+    return antglob.FileSet(cfg.project_root, patterns)
 
-    # Iterate over matches and remove them
-    for name in fileset:
-        notify.info('rm {0}'.format(name))
-        if name.endswith('/'):
-            shutil.rmtree(os.path.join(cfg.project_root, name))
-        else:
-            os.unlink(os.path.join(cfg.project_root, name))
+
+def print_clean_report(summary, json_=False):
+    """ Print a `clean_report` summary, either as text or in JSON format.
+    """
+    if json_:
+        print(json.dumps(summary, indent=4, sort_keys=True))
+        return
+
+    for entry in summary['patterns']:
+        notify.info("{files:>8d} files {mib:>10.1f} MiB  {pattern}".format(
+                    mib=entry['bytes'] / 1024.0 / 1024.0, **entry))
+        for path in entry['paths']:
+            notify.info("{files:>8d} files {mib:>10.1f} MiB      {path}".format(
+                        mib=path['bytes'] / 1024.0 / 1024.0, **path))
+
+
+def trash_dirs(root, names):
+    """ Move the directories in `names` to the trash area, for removal in the background.
+
+        Returns the names that are left to be removed directly.
+    """
+    dirs = [i for i in names if i.endswith('/')]
+    names = [i for i in names if not i.endswith('/')]
+    if dirs:
+        failed = move_to_trash(root, dirs)
+        names.extend(failed)
+        notify.info("Moved {} directories to '{}', removing them in the background."
+                    .format(len(dirs) - len(failed), TRASH_DIR))
+    return names
+
+
+@task(help=dict(
+    docs="Also clean the documentation build area",
+    backups="Also clean '*~' files etc.",
+    bytecode="Also clean '.pyc', '.pyo', and package metadata",
+    dist="Also clean the 'dist' dir",
+    all="The same as --backups --bytecode --dist --docs",
+    venv="Include an existing virtualenv (in '.' or in '.venv')",
+    tox="Include '.tox' directory",
+    extra="Any extra patterns, space-separated and possibly quoted",
+    verbose="List each removed file or directory",
+    async_="Move matched directories to a trash area, and remove them in the background",
+    noop="Only show what would be removed (dry run)",
+    report="Print matches with file counts and sizes, aggregated by pattern",
+    json_="Print the report in JSON format (implies --noop)",
+))
+def clean(_dummy_ctx, docs=False, backups=False, bytecode=False, dist=False, # pylint: disable=too-many-arguments, too-many-locals
+        all=False, venv=False, tox=False, extra='', verbose=False, async_=False, # pylint: disable=redefined-builtin
+        noop=False, report=False, json_=False):
+    """Perform house-keeping."""
+    cfg = config.load()
+    noop = noop or json_
+    notify.banner("Cleaning up project files")
+
+    fileset = clean_fileset(cfg, docs=docs or all, backups=backups or all, bytecode=bytecode or all,
+                            dist=dist or all, venv=venv, tox=tox, extra=extra)
+
+    # Collect matches (nothing below a matched directory), and remove them in parallel
+    started = time.time()
+    names = list(fileset.walk(prune_matches=True))
+    if verbose and not json_:
+        for name in names:
+            notify.info('{0} {1}'.format('would rm' if noop else 'rm', name))
+
+    if noop or report:
+        summary = clean_report(fileset, names, disk_usage(cfg.project_root, names), dry_run=noop)
+        if report or json_:
+            print_clean_report(summary, json_=json_)
+        if noop:
+            if not json_:
+                notify.info("Would remove {} file(s) in {} match(es), freeing {:.1f} MiB."
+                            .format(summary['files'], len(names), summary['bytes'] / 1024.0 / 1024.0))
+            return
+
+    if async_:
+        names = trash_dirs(cfg.project_root, names)
+
+    count, size = remove_files(cfg.project_root, names)
+    notify.info("Removed {} file(s) in {} match(es), freeing {:.1f} MiB in {:.1f} secs."
+                .format(count, len(names), size / 1024.0 / 1024.0, time.time() - started))
+
+    # Also takes care of stale trash from earlier, interrupted runs
+    purge_trash(cfg.project_root)
 
 
 @task(help=dict(
     docs="Also build the documentation (with Sphinx)",
 ))
+@uptodate(inputs=build_inputs, outputs=build_outputs)
 def build(ctx, docs=False):
     """Build the project."""
     cfg = config.load()
@@ -115,7 +226,7 @@ def build(ctx, docs=False):
             doc_path = None
 
         if doc_path:
-            ctx.run("invoke docs")
+            invoke_tasks(ctx, "docs")
         else:
             notify.warning("Cannot find either a 'docs' or 'doc' Sphinx directory!")
 
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+""" Artifact cache tasks.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+import sys
+import glob
+
+from munch import munchify
+
+from . import Collection, task
+from .uptodate import fingerprint
+from ..util import notify
+from ..util.artifacts import ArtifactCache, cache_home, digest, interpreter_tag
+from ..util.filesys import pretty_path
+
+
+def cache_settings(ctx=None):
+    """ Return the cache configuration in `ctx`.
+
+        ``INVOKE_RITUALS_CACHE_DIR`` and ``INVOKE_RITUALS_CACHE_SIZE_MIB``
+        override the configuration, also outside of tasks of this collection.
+    """
+    try:
+        settings = ctx.rituals.cache
+    except AttributeError:
+        settings = munchify(namespace.configuration()).rituals.cache
+    return munchify(dict(
+        dir=os.path.expanduser(os.environ.get('INVOKE_RITUALS_CACHE_DIR', settings.dir) or cache_home()),
+        size_mib=float(os.environ.get('INVOKE_RITUALS_CACHE_SIZE_MIB', settings.size_mib)),
+    ))
+
+
+def artifact_cache(ctx=None):
+    """Return the artifact cache, as configured in `ctx`."""
+    settings = cache_settings(ctx)
+    return ArtifactCache(os.path.join(settings.dir, 'artifacts'), int(settings.size_mib * 1024 * 1024))
+
+
+def wheelhouse(ctx=None):
+    """ Return the path of the wheelhouse shared by all projects.
+
+        Wheel file names carry the release and platform tags,
+        so one directory serves all interpreters and platforms.
+    """
+    return os.path.join(cache_settings(ctx).dir, 'wheelhouse')
+
+
+def downloads(ctx=None):
+    """Return the path of the persistent download cache shared by all projects."""
+    return os.path.join(cache_settings(ctx).dir, 'downloads')
+
+
+def artifact_key(cfg, patterns, *options):
+    """ Return the cache key for artifacts built from the project files matching `patterns`.
+
+        The key also covers the interpreter's version, ABI, and platform,
+        and the given `options` (builder name, flags, and the like).
+    """
+    sources = fingerprint(cfg.project_root, patterns)
+    return digest(interpreter_tag(), sorted((k, v[2]) for k, v in sources.items()), list(options))
+
+
+@task
+def stats(ctx):
+    """Report artifact cache hit rate, and disk use of the caches."""
+    cache = artifact_cache(ctx)
+    info = cache.stats()
+    notify.info("Artifact cache in '{}'{}".format(pretty_path(info.root), '' if cache.enabled else ' (disabled)'))
+    notify.info("{:>8d} entries {:>10.1f} MiB of {:.1f} MiB".format(
+                info.entries, info.bytes / 1024.0 / 1024.0, info.max_bytes / 1024.0 / 1024.0))
+    notify.info("{:>8d} hits, {} misses ({:.1f}% hit rate)".format(info.hits, info.misses, info.hit_rate * 100))
+
+    wheels = glob.glob(os.path.join(wheelhouse(ctx), '*.whl'))
+    notify.info("Wheelhouse in '{}'".format(pretty_path(wheelhouse(ctx))))
+    notify.info("{:>8d} wheels  {:>10.1f} MiB".format(
+                len(wheels), sum(os.path.getsize(i) for i in wheels) / 1024.0 / 1024.0))
+
+    files = glob.glob(os.path.join(downloads(ctx), '*', 'data'))
+    notify.info("Downloads in '{}'".format(pretty_path(downloads(ctx))))
+    notify.info("{:>8d} files   {:>10.1f} MiB".format(
+                len(files), sum(os.path.getsize(i) for i in files) / 1024.0 / 1024.0))
+
+
+namespace = Collection.from_module(sys.modules[__name__], config={'rituals': dict(
+    cache = dict(
+        dir = '',  # default is '~/.cache/rituals' (or below $XDG_CACHE_HOME)
+        size_mib = 2048,  # 0 disables the cache
+    ),
+)})
@@ -38,11 +38,11 @@ try:
 except ImportError:
     from ConfigParser import RawConfigParser as ConfigParser, Error as ConfigError  # pylint: disable=import-error
 
-import requests
-
 from . import Collection, task
+from .executor import invoke_tasks
+from .uptodate import uptodate
 from .. import config
-from ..util import notify
+from ..util import antglob, notify
 from ..util.filesys import pushd
 from ..util.shell import capture
 
@@ -151,6 +151,24 @@ def convert_markdown(ctx, cfg):
                 out.write('    {}\n'.format(license_text))
 
 
+def sphinx_inputs(ctx, cfg, **_):
+    """Return patterns of all files the docs depend on."""
+    sources = os.path.relpath(cfg.rootjoin(ctx.rituals.docs.sources), cfg.project_root)
+    srcdir = cfg.srcdir.strip('/')
+    return [
+        sources + '/**/*', '*.md', '*.rst', '**/*.py' if srcdir in ('', '.') else srcdir + '/**/*.py',
+        antglob.excludes(sources + '/' + ctx.rituals.docs.build.strip('/') + '/'),
+        antglob.excludes('**/__pycache__/'), antglob.excludes('.tox/'), antglob.excludes('.git/'),
+        antglob.excludes('.eggs/'), antglob.excludes('build/'), antglob.excludes('dist/'),
+    ]
+
+
+def sphinx_outputs(ctx, cfg, **_):
+    """Return the HTML index page of the docs."""
+    return [os.path.relpath(cfg.rootjoin(ctx.rituals.docs.sources, ctx.rituals.docs.build, 'index.html'),
+                            cfg.project_root)]
+
+
 @task(default=True, help={
     'browse': "Open index page in browser tab",
     'clean': "Start with a clean build area",
@@ -159,6 +177,8 @@ def convert_markdown(ctx, cfg):
     'status': "Show autobuild watchdog process state",
     'opts': "Extra flags for Sphinx builder",
 })
+@uptodate(inputs=sphinx_inputs, outputs=sphinx_outputs,
+          when=lambda browse, clean, watchdog, kill, status, **_: not any((browse, clean, watchdog, kill, status)))
 def sphinx(ctx, browse=False, clean=False, watchdog=False, kill=False, status=False, opts=''):
     """Build Sphinx docs."""
     cfg = config.load()
@@ -169,7 +189,7 @@ def sphinx(ctx, browse=False, clean=False, watchdog=False, kill=False, status=Fa
         return
 
     if clean:
-        ctx.run("invoke clean --docs")
+        invoke_tasks(ctx, "clean --docs")
 
     convert_markdown(ctx, cfg)
 
@@ -263,7 +283,7 @@ def confluence(ctx, no_publish=False, clean=False, opts=''):
     cfg = config.load()
 
     if clean:
-        ctx.run("invoke clean --docs")
+        invoke_tasks(ctx, "clean --docs")
 
     cmd = ['sphinx-build', '-b', 'confluence']
     cmd.extend(['-E', '-a'])  # force a full rebuild
@@ -319,6 +339,8 @@ class DocsUploader():
 
     def _to_pypi(self, docs_base, release):
         """Upload to PyPI."""
+        import requests
+
         url = None
         with self._zipped(docs_base) as handle:
             reply = requests.post(self.params['url'], auth=get_pypi_auth(), allow_redirects=False,
@@ -337,6 +359,8 @@ class DocsUploader():
 
     def _to_webdav(self, docs_base, release):
         """Upload to WebDAV store."""
+        import requests
+
         try:
             git_path = subprocess.check_output('git remote get-url origin 2>/dev/null', shell=True)
         except subprocess.CalledProcessError:
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+""" Execution of task chains.
+
+    Instead of starting a nested ``invoke`` process, tasks call
+    :func:`invoke_tasks` with the same command line. The chain is run
+    against the project's namespace in the current process, and each task
+    call (same task, same arguments) is only done once per process – so
+    shared prerequisites like ``clean`` and ``build`` are not repeated.
+
+    Independent tasks can run concurrently, by using :func:`parallel`
+    in the ``pre`` list of another task.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+import sys
+import shlex
+import signal
+import inspect
+import threading
+import subprocess
+from queue import Queue
+
+from invoke.tasks import Task
+from invoke.parser import Parser
+from invoke.executor import Executor
+
+from . import Collection, exceptions
+from ..util import notify
+
+# Task calls from the command line, as (task, kwargs) tuples
+CALLED = []
+
+# Task calls of the running `invoke_tasks` DAG (including nested ones), or `None`
+DAG_CALLED = None
+
+# Seconds a stopped parallel command gets to terminate, before it's killed
+STOP_GRACE_SECS = 5
+
+
+def full_kwargs(task, kwargs):
+    """Return `kwargs` with the defaults of all other parameters of `task` added."""
+    try:
+        params = task.argspec(task.body).parameters.values()
+    except (TypeError, ValueError):
+        return dict(kwargs)
+    result = {i.name: i.default for i in params if i.default is not inspect.Parameter.empty}
+    result.update(kwargs)
+    return result
+
+
+def mark_called(task, kwargs):
+    """Remember that `task` was called with `kwargs`, in the running DAG or else on the command line."""
+    if not was_called(task, kwargs):
+        (CALLED if DAG_CALLED is None else DAG_CALLED).append((task, full_kwargs(task, kwargs)))
+
+
+def was_called(task, kwargs):
+    """Check whether `task` was already called with `kwargs`, in the running DAG or on the command line."""
+    kwargs = full_kwargs(task, kwargs)
+    return any((task == i or i == task) and kwargs == i_kwargs
+               for i, i_kwargs in (CALLED if DAG_CALLED is None else DAG_CALLED))
+
+
+def get_namespace():
+    """Return the root namespace of the project's ``tasks`` module."""
+    tasks = sys.modules.get('tasks')
+    for name in ('ns', 'namespace'):
+        namespace = getattr(tasks, name, None)
+        if isinstance(namespace, Collection):
+            return namespace
+    if tasks:
+        return Collection.from_module(tasks)
+
+    from ..easy import namespace
+    return namespace
+
+
+class DagExecutor(Executor):
+    """ Executor that skips task calls already done in the running DAG.
+
+        Pre- and post-tasks are expanded and deduplicated as usual,
+        after that, calls done before (by this or an enclosing executor
+        of the same `invoke_tasks` call, or from the command line) are removed.
+    """
+
+    def dedupe(self, calls):
+        result = []
+        for call in Executor.dedupe(self, calls):
+            if was_called(call.task, call.kwargs):
+                notify.info("Skipping '{}', already done.".format(call.called_as or call.task.name))
+            else:
+                mark_called(call.task, call.kwargs)
+                result.append(call)
+        return result
+
+
+def invoke_tasks(ctx, command, collection=None):
+    """ Run the tasks in `command` in this process, like ``invoke {command}`` would.
+
+        `collection` defaults to the namespace of the project's ``tasks`` module.
+        Returns a dict mapping the executed tasks to their results.
+
+        Calls already done from the command line, or by this DAG
+        (i.e. by tasks it runs that call `invoke_tasks` in turn), are skipped.
+        Later, unrelated calls of `invoke_tasks` run their tasks again.
+    """
+    global DAG_CALLED  # pylint: disable=global-statement
+
+    collection = collection or get_namespace()
+    calls = Parser(contexts=collection.to_contexts()).parse_argv(shlex.split(command))
+    outer, DAG_CALLED = DAG_CALLED, list(CALLED) if DAG_CALLED is None else DAG_CALLED
+    try:
+        return DagExecutor(collection, config=ctx.config.clone()).execute(*calls)
+    finally:
+        DAG_CALLED = outer
+
+
+def run_parallel(commands, output=None):
+    """ Run the commands in the `commands` dict concurrently, as subprocesses.
+
+        Output lines are prefixed with the command's key. When a command
+        fails, the others are terminated, including any processes they started;
+        those still running after ``STOP_GRACE_SECS`` are killed.
+        Returns a dict with the exit code of each command, in order of completion
+        (negative ones mean terminated).
+    """
+    output = output or sys.stdout
+    lock = threading.Lock()
+    done = Queue()
+    stopped = set()
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+
+    def pump(name, process):
+        "Helper"
+        for line in iter(process.stdout.readline, b''):
+            with lock:
+                if name in stopped:
+                    continue  # keep draining, so a stopped worker never blocks on a full pipe
+                output.write('[{}] {}\n'.format(name, line.decode('utf-8', 'replace').rstrip('\r\n')))
+                output.flush()
+        done.put((name, process.wait()))
+
+    def stop(process, kill=False):
+        "Terminate (or kill) the process group of a worker."
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+            elif kill:
+                process.kill()
+            else:
+                process.terminate()
+        except OSError:
+            pass  # already gone
+
+    processes = {}
+    for name, argv in commands.items():
+        processes[name] = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env,
+                                           start_new_session=True)
+        threading.Thread(target=pump, args=(name, processes[name]), daemon=True).start()
+
+    results = {}
+    while len(results) < len(processes):
+        name, returncode = done.get()
+        if name in results:
+            continue  # terminated before
+        results[name] = returncode
+        if returncode:
+            with lock:
+                stopped.update(i for i in processes if i not in results)
+            others = [i for i in processes if i in stopped and i not in results]
+            for other in others:
+                stop(processes[other])
+            for other in others:
+                try:
+                    results[other] = processes[other].wait(STOP_GRACE_SECS)  # no waiting for output pipes
+                except subprocess.TimeoutExpired:
+                    stop(processes[other], kill=True)
+                    results[other] = processes[other].wait()
+    return results
+
+
+def parallel(*tasks):
+    """ Return a task that runs `tasks` concurrently, each in its own ``invoke`` process.
+
+        Use it in ``pre`` lists, e.g. ``pre=[build, parallel(test_pytest, check_pylint)]``.
+        Output is prefixed with the task names. When one task fails, the others are
+        stopped, and the combined exit status is the first failure's one.
+    """
+    def run(_):
+        "Run the tasks in parallel."
+        namespace = get_namespace()
+        names = [task_path(namespace, i) for i in tasks]
+        notify.info("Running {} in parallel...".format(', '.join(names)))
+        results = run_parallel({name: [sys.executable, '-m', 'invoke', name] for name in names})
+        failed = [name for name in results if results[name]]
+        if failed:
+            summary = ', '.join('{} (RC={})'.format(i, results[i]) for i in failed)
+            raise exceptions.Exit("Parallel tasks failed: {}".format(summary), code=max(1, results[failed[0]]))
+
+    return Task(run, name='parallel({})'.format(','.join(i.name for i in tasks)))
+
+
+def task_path(namespace, task):
+    """Return the full name of `task` in `namespace`."""
+    from .lazy import find_task
+
+    for name in namespace.task_names:
+        found = find_task(namespace, name)
+        if found == task or task == found:
+            return name
+    raise KeyError("Task {!r} is not in namespace {!r}".format(task, namespace.name))
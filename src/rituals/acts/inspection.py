@@ -21,20 +21,300 @@
 #    https://github.com/jhermann/rituals
 from __future__ import absolute_import, unicode_literals, print_function
 
+import io
 import os
+import ast
 import sys
+import json
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from invoke.runners import Result
 
 from . import Collection, task, exceptions
 from .. import config
 from ..util import antglob, notify, shell, add_dir2pypath
 
+# Return code bits of pylint, by message type
+PYLINT_TYPE_BITS = dict(fatal=1, error=2, warning=4, refactor=8, convention=16)
+
+
+def pylint_version():
+    """Return version of the installed pylint, without starting a process."""
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return shell.capture('pylint --version', ignore_failures=True) or ''
+    try:
+        return version('pylint')
+    except PackageNotFoundError:
+        return ''
+
+
+def module_names(cfg, filenames):
+    """Return a mapping of importable module names to the given (relative) Python file names."""
+    roots = sorted({cfg.srcdir, cfg.testdir}, key=len, reverse=True)
+    result = {}
+    for filename in filenames:
+        relname = filename
+        for root in roots:
+            root = root.strip('/')
+            if root in ('', '.') or filename.startswith(root + '/'):
+                relname = filename if root in ('', '.') else filename[len(root) + 1:]
+                break
+        parts = relname[:-3].split('/')
+        if parts[-1] == '__init__':
+            parts.pop()
+        result['.'.join(parts)] = filename
+    return result
+
+
+def imported_modules(filename, module):
+    """ Return all names of modules that are (possibly) imported by `filename`,
+        including parent packages. `module` is the module name of the file.
+    """
+    try:
+        with io.open(filename, 'rb') as handle:
+            tree = ast.parse(handle.read(), filename)
+    except (SyntaxError, ValueError):
+        return set()
+
+    package = module.split('.')
+    if not filename.endswith('__init__.py'):
+        package.pop()
+
+    names = set(['.'.join(package)]) if package else set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = package[:len(package) - node.level + 1] if node.level else []
+            if node.module:
+                base += node.module.split('.')
+            names.add('.'.join(base))
+            names.update('.'.join(base + [alias.name]) for alias in node.names)
+
+    for name in list(names):
+        while '.' in name:
+            name = name.rsplit('.', 1)[0]
+            names.add(name)
+    return names
+
+
+def python_files(namelist):
+    """Return a sorted list of Python files in `namelist`, expanding package directories."""
+    filenames = set()
+    for name in namelist:
+        if os.path.isdir(name):
+            filenames |= set(antglob.FileSet(name, '**/*.py').walk(with_root=True))
+        else:
+            filenames.add(name)
+    return sorted(i.replace(os.sep, '/') for i in filenames)
+
+
+def shard_files(filenames, count):
+    """ Split `filenames` into at most `count` lists of roughly equal total size.
+
+        Largest files are assigned first, each to the currently smallest shard.
+    """
+    def size(filename):
+        "Helper"
+        try:
+            return os.path.getsize(filename)
+        except OSError:
+            return 0
+
+    shards = [[0, []] for _ in range(max(1, min(count, len(filenames))))]
+    for filename in sorted(filenames, key=size, reverse=True):
+        shard = min(shards, key=lambda i: i[0])
+        shard[0] += size(filename) or 1
+        shard[1].append(filename)
+    return [sorted(i[1]) for i in shards if i[1]]
+
+
+def pylint_json(ctx, options, filenames, shards=1):
+    """ Run pylint with JSON output on the given files.
+
+        With ``shards > 1``, the files are split into size-balanced buckets,
+        each checked by its own concurrently running pylint process.
+
+        Returns the pylint exit code (the bit flags of all processes combined),
+        and the list of reported messages, in order of `filenames`.
+    """
+    def check(names):
+        "Helper"
+        cmd = 'pylint "{}" {} --output-format=json'.format('" "'.join(names), options)
+        result = shell.run(cmd, report_error=False, runner=ctx.run, hide='out', warn=True)
+        try:
+            return result.return_code, json.loads(result.stdout or '[]')
+        except ValueError:
+            notify.error("Cannot parse pylint output: {}".format(result.stdout[:200]))
+            return result.return_code | 32, []
+
+    buckets = shard_files(filenames, shards)
+    if len(buckets) > 1:
+        with ThreadPoolExecutor(max_workers=len(buckets)) as pool:
+            results = list(pool.map(check, buckets))
+    else:
+        results = [check(sorted(filenames))]
+
+    return_code, messages = 0, []
+    for bucket_rc, bucket_messages in results:
+        return_code |= bucket_rc
+        messages.extend(bucket_messages)
+    order = {name: idx for idx, name in enumerate(filenames)}
+    messages.sort(key=lambda i: order.get(i['path'].replace(os.sep, '/'), -1))
+    return return_code, messages
+
+
+def pylint_text(messages):
+    """ Format pylint JSON `messages` like pylint's text output.
+
+        Returns the exit code bits for the message types, and the text.
+    """
+    return_code, output, module = 0, [], None
+    for message in messages:
+        return_code |= PYLINT_TYPE_BITS.get(message['type'], 0)
+        if message['module'] != module:
+            module = message['module']
+            output.append('************* Module {}'.format(module))
+        output.append('{path}:{line}:{column}: {message-id}: {message} ({symbol})'.format(**message))
+    return return_code, '\n'.join(output)
+
+
+def pylint_cache_keys(cfg, filenames, options, rcfile=None):
+    """ Compute the cache key of each file in `filenames`.
+
+        A key covers the file's content, the content of any project module it imports
+        (directly or indirectly), the pylint version, the options, and the rcfile.
+    """
+    salt = hashlib.sha256()
+    salt.update('{}\0{}\0'.format(pylint_version(), options).encode('utf-8'))
+    if rcfile:
+        with io.open(rcfile, 'rb') as handle:
+            salt.update(handle.read())
+    salt = salt.hexdigest()
+
+    digests = {}
+    for filename in filenames:
+        with io.open(filename, 'rb') as handle:
+            digests[filename] = hashlib.sha256(handle.read()).hexdigest()
+
+    modules = module_names(cfg, filenames)
+    imports = {
+        filename: {modules[i] for i in imported_modules(filename, module) if i in modules and i != module}
+        for module, filename in modules.items()
+    }
+    keys = {}
+    for filename in modules.values():
+        deps, todo = set(), list(imports[filename])
+        while todo:
+            dep = todo.pop()
+            if dep not in deps and dep != filename:
+                deps.add(dep)
+                todo.extend(imports[dep])
+        keys[filename] = hashlib.sha256('\0'.join(
+            [salt, digests[filename]] + [i + '=' + digests[i] for i in sorted(deps)]
+        ).encode('utf-8')).hexdigest()
+    return keys
+
+
+def load_pylint_cache(cache_file):
+    """Load cached pylint results, or return an empty cache."""
+    try:
+        with io.open(cache_file, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    except (EnvironmentError, ValueError):
+        return {}
+
+
+def save_pylint_cache(cache_file, files, others):
+    """Save pylint results per file, and `others` not related to a checked file."""
+    if not os.path.isdir(os.path.dirname(cache_file)):
+        os.makedirs(os.path.dirname(cache_file))
+    with io.open(cache_file, 'w', encoding='utf-8') as handle:
+        json.dump(dict(files=files, others=others), handle)
+
+
+def pylint_stale(ctx, options, stale, keys, shards=1):
+    """ Check the `stale` files, and group the messages into new cache entries.
+
+        Returns the pylint exit code bits for a crash or unparsable output (message bits
+        are computed when the messages are replayed), the cache entries of the checked files,
+        and any messages not related to them.
+    """
+    return_code, messages = pylint_json(ctx, options, stale, shards)
+    by_path = defaultdict(list)
+    for message in messages:
+        by_path[message['path'].replace(os.sep, '/')].append(message)
+    files = {i: dict(key=keys[i], messages=by_path.pop(i, [])) for i in stale}
+    others = [i for path in sorted(by_path) for i in by_path[path]]
+    return return_code & (1 | 32), files, others
+
+
+def pylint_incremental(ctx, cfg, namelist, options, rcfile=None, shards=1):
+    """ Check the given files and packages, re-using cached results for unchanged modules.
+
+        A file is checked again if its cache key changed (see `pylint_cache_keys`).
+        Results are kept in ``build/.rituals/pylint.json``,
+        unless pylint failed fatally or its output could not be parsed.
+
+        Returns the combined pylint exit code, and the text output.
+    """
+    filenames = python_files(namelist)
+    keys = pylint_cache_keys(cfg, filenames, options, rcfile)
+    cache_file = cfg.cachejoin('pylint.json')
+    cache = load_pylint_cache(cache_file)
+    cached = cache.get('files', {})
+    stale = [i for i in filenames if cached.get(i, {}).get('key') != keys[i]]
+
+    return_code = 0
+    files = {i: cached[i] for i in filenames if i not in stale}
+    others = cache.get('others', [])
+    if stale:
+        notify.info("Checking {} of {} modules, the rest is unchanged.".format(len(stale), len(filenames)))
+        return_code, checked, others = pylint_stale(ctx, options, stale, keys, shards)
+        files.update(checked)
+        if not return_code:  # no crash, and output could be parsed
+            save_pylint_cache(cache_file, files, others)
+    else:
+        notify.info("All {} modules are unchanged since the last check.".format(len(filenames)))
+
+    # Replay all messages, in pylint's text format
+    bits, output = pylint_text(others + [i for path in filenames for i in files[path]['messages']])
+    return return_code | bits, output
+
+
+def run_pylint(ctx, cfg, cmd, namelist, options, rcfile=None, incremental=False, shards=1):
+    """ Check `namelist` with a plain `cmd` run, or incrementally / in `shards` via JSON output.
+
+        Raises `invoke.exceptions.Failure` when pylint reports any problems.
+    """
+    if incremental:
+        return_code, output = pylint_incremental(ctx, cfg, namelist, options, rcfile, shards)
+    elif shards > 1:
+        return_code, messages = pylint_json(ctx, options, python_files(namelist), shards)
+        bits, output = pylint_text(messages)
+        return_code |= bits
+    else:
+        shell.run(cmd, report_error=False, runner=ctx.run)
+        return
+
+    if output:
+        notify.info(output)
+    if return_code:
+        raise exceptions.Failure(Result(command=cmd, stdout=output, exited=return_code))
+
 
 @task(default=True, help=dict(
     skip_tests="Do not check test modules",
     skip_root="Do not check scripts in project root",
     reports="Create extended report?",
+    incremental="Only check modules changed since the last check (no reports)",
+    jobs="Split modules into N size-balanced shards checked in parallel (0 = one per CPU)",
 ))
-def pylint(ctx, skip_tests=False, skip_root=False, reports=False):
+def pylint(ctx, skip_tests=False, skip_root=False, reports=False, incremental=False, jobs=1):
     """Perform source code checks via pylint."""
     cfg = config.load()
     add_dir2pypath(cfg.project_root)
@@ -60,15 +340,17 @@ def pylint(ctx, skip_tests=False, skip_root=False, reports=False):
             namelist |= set(root_py)
 
     namelist = set([i[len(os.getcwd())+1:] if i.startswith(os.getcwd() + os.sep) else i for i in namelist])
-    cmd = 'pylint'
-    cmd += ' "{}"'.format('" "'.join(sorted(namelist)))
-    cmd += ' --reports={0}'.format('y' if reports else 'n')
+    options = '--reports={0}'.format('y' if reports else 'n')
+    rcfile = None
     for cfgfile in ('.pylintrc', 'pylint.rc', 'pylint.cfg', 'project.d/pylint.cfg'):
         if os.path.exists(cfgfile):
-            cmd += ' --rcfile={0}'.format(cfgfile)
+            rcfile = cfgfile
+            options += ' --rcfile={0}'.format(cfgfile)
             break
+    cmd = 'pylint "{}" {}'.format('" "'.join(sorted(namelist)), options)
     try:
-        shell.run(cmd, report_error=False, runner=ctx.run)
+        run_pylint(ctx, cfg, cmd, namelist, options, rcfile, incremental=incremental and not reports,
+                   shards=1 if reports else jobs or os.cpu_count() or 1)
         notify.info("OK - No problems found by pylint.")
     except exceptions.Failure as exc:
         # Check bit flags within pylint return code
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access
+""" Lazy loading of task collections.
+
+    Names, signatures and help texts of the tasks in the standard act
+    modules are kept in the static ``manifest`` module. Listing tasks,
+    showing their help, and parsing the command line thus does not import
+    any act module. A module is only imported when one of its tasks runs,
+    or when the configuration of its collection is needed for that.
+
+    After changing any task, call ``python -m rituals.acts.lazy``
+    to update the manifest (a test checks that it is current).
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import io
+import os
+import inspect
+import pprint
+import importlib
+
+from invoke.tasks import Task
+from invoke.config import copy_dict, merge_dicts
+
+from . import Collection
+from .executor import mark_called
+
+# Act modules described in the manifest, in the order they're rendered
+ACT_MODULES = ('basic', 'testing', 'documentation', 'inspection', 'releasing',
+               'cache', 'devpi', 'github', 'jenkins', 'pkgdeb')
+
+MANIFEST_HEADER = '''\
+# -*- coding: utf-8 -*-
+# pylint: disable=too-many-lines
+""" Static description of the task collections in ``rituals.acts``.
+
+    Generated by ``python -m rituals.acts.lazy`` – DO NOT EDIT!
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+'''
+
+
+def load_act(act):
+    """Import and return the act module named `act`."""
+    return importlib.import_module('{}.{}'.format(__package__, act))
+
+
+class LazyTask(Task):
+    """ A task that imports its act module on the first call.
+
+        `spec` is the task's entry in the manifest.
+    """
+
+    def __init__(self, act, spec):
+        self.act = act
+        self.params = spec['params']
+
+        def body(*args, **kwargs):
+            "Call the real task."
+            if len(args) == 1:
+                mark_called(self, kwargs)
+            return self.load()(*args, **kwargs)
+
+        body.__name__ = spec['func']
+        body.__doc__ = spec['doc']
+        body.__module__ = '{}.{}'.format(__package__, act)
+        Task.__init__(
+            self, body, name=spec['name'], aliases=spec['aliases'], default=spec['default'],
+            positional=spec['positional'], optional=spec['optional'],
+            iterable=spec['iterable'], incrementable=spec['incrementable'],
+            auto_shortflags=spec['auto_shortflags'], autoprint=spec['autoprint'],
+            help=spec['help'],
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Task) and self.name == other.name and (
+            getattr(other.body, '__module__', None), getattr(other.body, '__name__', None)
+        ) == (self.body.__module__, self.body.__name__)
+
+    def __hash__(self):
+        return hash((self.name, self.body.__module__, self.body.__name__))
+
+    def argspec(self, body):
+        """Return the signature recorded in the manifest."""
+        return inspect.Signature([
+            inspect.Parameter(param[0], inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                              default=param[1] if len(param) > 1 else inspect.Parameter.empty)
+            for param in self.params
+        ])
+
+    def load(self):
+        """Import the act module, and return the real task."""
+        return getattr(load_act(self.act), self.body.__name__)
+
+
+class LazyCollection(Collection):
+    """ A collection of lazy tasks, which imports its act module
+        when its configuration is requested.
+    """
+
+    def __init__(self, act, spec):
+        Collection.__init__(self, spec['name'])
+        self.__doc__ = spec['doc']
+        self.act = act
+        self.unconfigured = spec['configured']
+        for task_spec in spec['tasks']:
+            self.add_task(LazyTask(act, task_spec))
+
+    def configuration(self, taskpath=None):
+        if taskpath is None and self.unconfigured:
+            self.unconfigured = False
+            config = copy_dict(Collection.from_module(load_act(self.act))._configuration)
+            merge_dicts(config, self._configuration)
+            self._configuration = config
+        return Collection.configuration(self, taskpath)
+
+
+def lazy_collection(act):
+    """Return a lazy collection for the act module named `act`."""
+    from .manifest import ACTS
+
+    return LazyCollection(act, ACTS[act])
+
+
+def find_task(collection, name):
+    """Return the task called `name` in `collection`, without loading any configuration."""
+    name = collection.transform(name or '')
+    if not name:
+        return collection.tasks[collection.default]
+    if '.' in name:
+        coll, rest = collection._split_path(name)
+        return find_task(collection.collections[coll], rest)
+    if name in collection.collections:
+        return find_task(collection.collections[name], '')
+    return collection.tasks[name]
+
+
+def describe_act(act):
+    """Return the manifest entry for the act module named `act`."""
+    collection = Collection.from_module(load_act(act))
+    tasks = []
+    for name in sorted(collection.tasks):
+        task = collection.tasks[name]
+        if task.pre or task.post:
+            raise ValueError("Task {!r} has pre/post tasks, which the manifest can't represent".format(name))
+        if task.body.__module__ != '{}.{}'.format(__package__, act):
+            raise ValueError("Task {!r} is not defined in {!r}".format(name, act))
+        params = [
+            (i.name,) if i.default is i.empty else (i.name, i.default)
+            for i in task.argspec(task.body).parameters.values()
+        ]
+        tasks.append(dict(
+            func=task.body.__name__, name=task._name, doc=task.__doc__,
+            aliases=tuple(task.aliases), default=name == collection.default,
+            positional=list(task.positional), optional=list(task.optional),
+            iterable=list(task.iterable), incrementable=list(task.incrementable),
+            auto_shortflags=task.auto_shortflags, autoprint=task.autoprint,
+            help=task.help, params=params,
+        ))
+
+    return dict(
+        name=collection.name, doc=collection.__doc__,
+        configured=bool(collection._configuration), tasks=tasks,
+    )
+
+
+def render_manifest():
+    """Return the source code of the manifest module."""
+    acts = {act: describe_act(act) for act in ACT_MODULES}
+    return '{}\nACTS = {}\n'.format(MANIFEST_HEADER, pprint.pformat(acts, width=100))
+
+
+def manifest_filename():
+    """Return the path to the manifest module."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manifest.py')
+
+
+if __name__ == '__main__':
+    with io.open(manifest_filename(), 'w', encoding='utf-8') as handle:
+        handle.write(render_manifest())
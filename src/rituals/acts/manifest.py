@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=too-many-lines
+""" Static description of the task collections in ``rituals.acts``.
+
+    Generated by ``python -m rituals.acts.lazy`` – DO NOT EDIT!
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+
+ACTS = {'basic': {'configured': False,
+           'doc': ' Basic tasks.\n',
+           'name': 'basic',
+           'tasks': [{'aliases': (),
+                      'auto_shortflags': True,
+                      'autoprint': False,
+                      'default': False,
+                      'doc': 'Build the project.',
+                      'func': 'build',
+                      'help': {'docs': 'Also build the documentation (with Sphinx)'},
+                      'incrementable': [],
+                      'iterable': [],
+                      'name': None,
+                      'optional': [],
+                      'params': [('docs', False)],
+                      'positional': []},
+                     {'aliases': (),
+                      'auto_shortflags': True,
+                      'autoprint': False,
+                      'default': False,
+                      'doc': 'Perform house-keeping.',
+                      'func': 'clean',
+                      'help': {'all': 'The same as --backups --bytecode --dist --docs',
+                               'async_': 'Move matched directories to a trash area, and remove '
+                                         'them in the background',
+                               'backups': "Also clean '*~' files etc.",
+                               'bytecode': "Also clean '.pyc', '.pyo', and package metadata",
+                               'dist': "Also clean the 'dist' dir",
+                               'docs': 'Also clean the documentation build area',
+                               'extra': 'Any extra patterns, space-separated and possibly quoted',
+                               'json_': 'Print the report in JSON format (implies --noop)',
+                               'noop': 'Only show what would be removed (dry run)',
+                               'report': 'Print matches with file counts and sizes, aggregated by '
+                                         'pattern',
+                               'tox': "Include '.tox' directory",
+                               'venv': "Include an existing virtualenv (in '.' or in '.venv')",
+                               'verbose': 'List each removed file or directory'},
+                      'incrementable': [],
+                      'iterable': [],
+                      'name': None,
+                      'optional': [],
+                      'params': [('docs', False),
+                                 ('backups', False),
+                                 ('bytecode', False),
+                                 ('dist', False),
+                                 ('all', False),
+                                 ('venv', False),
+                                 ('tox', False),
+                                 ('extra', ''),
+                                 ('verbose', False),
+                                 ('async_', False),
+                                 ('noop', False),
+                                 ('report', False),
+                                 ('json_', False)],
+                      'positional': []},
+                     {'aliases': (),
+                      'auto_shortflags': True,
+                      'autoprint': False,
+                      'default': False,
+                      'doc': 'Freeze currently installed requirements.',
+                      'func': 'freeze',
+                      'help': {'local': 'If in a virtualenv that has global access, do not output '
+                                        'globally installed packages'},
+                      'incrementable': [],
+                      'iterable': [],
+                      'name': None,
+                      'optional': [],
+                      'params': [('local', False)],
+                      'positional': []},
+                     {'aliases': (),
+                      'auto_shortflags': True,
+                      'autoprint': False,
+                      'default': True,
+                      'doc': 'Invoked with no arguments.',
+                      'func': 'help',
+                      'help': {},
+                      'incrementable': [],
+                      'iterable': [],
+                      'name': None,
+                      'optional': [],
+                      'params': [],
+                      'positional': []}]},
+ 'cache': {'configured': True,
+           'doc': ' Artifact cache tasks.\n',
+           'name': 'cache',
+           'tasks': [{'aliases': (),
+                      'auto_shortflags': True,
+                      'autoprint': False,
+                      'default': False,
+                      'doc': 'Report artifact cache hit rate, and disk use of the caches.',
+                      'func': 'stats',
+                      'help': {},
+                      'incrementable': [],
+                      'iterable': [],
+                      'name': None,
+                      'optional': [],
+                      'params': [],
+                      'positional': []}]},
+ 'devpi': {'configured': False, 'doc': " 'devpi' tasks.\n", 'name': 'devpi', 'tasks': []},
+ 'documentation': {'configured': True,
+                   'doc': " 'docs' tasks.\n",
+                   'name': 'docs',
+                   'tasks': [{'aliases': (),
+                              'auto_shortflags': True,
+                              'autoprint': False,
+                              'default': True,
+                              'doc': 'Build Sphinx docs.',
+                              'func': 'sphinx',
+                              'help': {'browse': 'Open index page in browser tab',
+                                       'clean': 'Start with a clean build area',
+                                       'kill': 'Stop autobuild watchdog (and do nothing else)',
+                                       'opts': 'Extra flags for Sphinx builder',
+                                       'status': 'Show autobuild watchdog process state',
+                                       'watchdog': 'Start autobuild watchdog?'},
+                              'incrementable': [],
+                              'iterable': [],
+                              'name': None,
+                              'optional': [],
+                              'params': [('browse', False),
+                                         ('clean', False),
+                                         ('watchdog', False),
+                                         ('kill', False),
+                                         ('status', False),
+                                         ('opts', '')],
+                              'positional': []},
+                             {'aliases': (),
+                              'auto_shortflags': True,
+                              'autoprint': False,
+                              'default': False,
+                              'doc': 'Upload a ZIP of built docs (by default to PyPI, else a '
+                                     'WebDAV URL).',
+                              'func': 'upload',
+                              'help': {'browse': 'Open index page on successful upload',
+                                       'release': 'Version for upload path (default: latest)',
+                                       'target': 'Upload target name (default: pypi)'},
+                              'incrementable': [],
+                              'iterable': [],
+                              'name': None,
+                              'optional': [],
+                              'params': [('browse', False),
+                                         ('target', None),
+                                         ('release', 'latest')],
+                              'positional': []}]},
+ 'github': {'configured': False,
+            'doc': ' GitHub automation.\n',
+            'name': 'github',
+            'tasks': [{'aliases': (),
+                       'auto_shortflags': True,
+                       'autoprint': False,
+                       'default': False,
+                       'doc': "Update GH pages from project's README.",
+                       'func': 'sync_readme',
+                       'help': {},
+                       'incrementable': [],
+                       'iterable': [],
+                       'name': 'sync-readme',
+                       'optional': [],
+                       'params': [],
+                       'positional': []}]},
+ 'inspection': {'configured': False,
+                'doc': " 'docs' tasks.\n",
+                'name': 'check',
+                'tasks': [{'aliases': (),
+                           'auto_shortflags': True,
+                           'autoprint': False,
+                           'default': True,
+                           'doc': 'Perform source code checks via pylint.',
+                           'func': 'pylint',
+                           'help': {'incremental': 'Only check modules changed since the last '
+                                                   'check (no reports)',
+                                    'jobs': 'Split modules into N size-balanced shards checked in '
+                                            'parallel (0 = one per CPU)',
+                                    'reports': 'Create extended report?',
+                                    'skip_root': 'Do not check scripts in project root',
+                                    'skip_tests': 'Do not check test modules'},
+                           'incrementable': [],
+                           'iterable': [],
+                           'name': None,
+                           'optional': [],
+                           'params': [('skip_tests', False),
+                                      ('skip_root', False),
+                                      ('reports', False),
+                                      ('incremental', False),
+                                      ('jobs', 1)],
+                           'positional': []}]},
+ 'jenkins': {'configured': False,
+             'doc': ' Tasks specific to Jenkins.\n',
+             'name': 'jenkins',
+             'tasks': [{'aliases': (),
+                        'auto_shortflags': True,
+                        'autoprint': False,
+                        'default': False,
+                        'doc': 'Dump project metadata for Jenkins Description Setter Plugin.',
+                        'func': 'description',
+                        'help': {'markdown': 'Use Markdown instead of HTML'},
+                        'incrementable': [],
+                        'iterable': [],
+                        'name': None,
+                        'optional': [],
+                        'params': [('markdown', False)],
+                        'positional': []}]},
+ 'pkgdeb': {'configured': True,
+            'doc': " 'deb' tasks.\n",
+            'name': 'deb',
+            'tasks': [{'aliases': (),
+                       'auto_shortflags': True,
+                       'autoprint': False,
+                       'default': True,
+                       'doc': 'Build a DEB package.',
+                       'func': 'build',
+                       'help': {'dput': "Host to upload to (use 'dput -H' to list them)",
+                                'opts': 'Extra flags for package build'},
+                       'incrementable': [],
+                       'iterable': [],
+                       'name': None,
+                       'optional': [],
+                       'params': [('dput', ''), ('opts', '')],
+                       'positional': []}]},
+ 'releasing': {'configured': True,
+               'doc': ' Release tasks.\n',
+               'name': 'release',
+               'tasks': [{'aliases': (),
+                          'auto_shortflags': True,
+                          'autoprint': False,
+                          'default': False,
+                          'doc': 'Bump a development version.',
+                          'func': 'bump',
+                          'help': {'pypi': 'Do not create a local part for the PEP-440 version.',
+                                   'verbose': 'Print version information as it is collected.'},
+                          'incrementable': [],
+                          'iterable': [],
+                          'name': None,
+                          'optional': [],
+                          'params': [('verbose', False), ('pypi', False)],
+                          'positional': []},
+                         {'aliases': (),
+                          'auto_shortflags': True,
+                          'autoprint': False,
+                          'default': False,
+                          'doc': 'Distribute the project.',
+                          'func': 'dist',
+                          'help': {'auto': 'Create EGG for Python2, and WHL whenever possible',
+                                   'devpi': "Upload the created 'dist' using 'devpi'",
+                                   'egg': 'Also create an EGG',
+                                   'wheel': 'Also create a WHL'},
+                          'incrementable': [],
+                          'iterable': [],
+                          'name': None,
+                          'optional': [],
+                          'params': [('devpi', False),
+                                     ('egg', False),
+                                     ('wheel', False),
+                                     ('auto', True)],
+                          'positional': []},
+                         {'aliases': (),
+                          'auto_shortflags': True,
+                          'autoprint': False,
+                          'default': False,
+                          'doc': 'Package the project with PEX.',
+                          'func': 'pex',
+                          'help': {'jobs': 'Build the PEX files of several entry points '
+                                           'concurrently (0 means one per CPU)',
+                                   'opts': 'Extra flags for PEX',
+                                   'pyrun': 'Create installer including an eGenix PyRun runtime',
+                                   'upload': 'Upload the created archive to a WebDAV repository',
+                                   'windows': 'Build for Windows platform'},
+                          'incrementable': [],
+                          'iterable': [],
+                          'name': None,
+                          'optional': [],
+                          'params': [('pyrun', ''),
+                                     ('upload', False),
+                                     ('opts', ''),
+                                     ('windows', False),
+                                     ('jobs', 1)],
+                          'positional': []},
+                         {'aliases': (),
+                          'auto_shortflags': True,
+                          'autoprint': False,
+                          'default': False,
+                          'doc': 'Prepare for a release.',
+                          'func': 'prep',
+                          'help': {'commit': 'Commit any automatic changes and tag the release'},
+                          'incrementable': [],
+                          'iterable': [],
+                          'name': None,
+                          'optional': [],
+                          'params': [('commit', True)],
+                          'positional': []},
+                         {'aliases': (),
+                          'auto_shortflags': True,
+                          'autoprint': False,
+                          'default': False,
+                          'doc': "Package the project to a zipapp with 'shiv'.",
+                          'func': 'shiv',
+                          'help': {'jobs': 'Build the zipapps of several entry points concurrently '
+                                           '(0 means one per CPU)',
+                                   'opts': "Extra flags for 'shiv'",
+                                   'python': 'Custom shebang for the zipapp',
+                                   'upload': 'Upload the created archive to a WebDAV repository'},
+                          'incrementable': [],
+                          'iterable': [],
+                          'name': None,
+                          'optional': [],
+                          'params': [('upload', False), ('python', ''), ('opts', ''), ('jobs', 1)],
+                          'positional': []}]},
+ 'testing': {'configured': True,
+             'doc': ' Testing tasks.\n',
+             'name': 'test',
+             'tasks': [{'aliases': (),
+                        'auto_shortflags': True,
+                        'autoprint': False,
+                        'default': True,
+                        'doc': 'Perform standard unittests.',
+                        'func': 'pytest',
+                        'help': {'coverage': 'Open coverage report in browser tab',
+                                 'opts': 'Extra flags for test runner'},
+                        'incrementable': [],
+                        'iterable': [],
+                        'name': None,
+                        'optional': [],
+                        'params': [('coverage', False), ('opts', '')],
+                        'positional': []},
+                       {'aliases': (),
+                        'auto_shortflags': True,
+                        'autoprint': False,
+                        'default': False,
+                        'doc': 'Perform multi-environment tests.',
+                        'func': 'tox',
+                        'help': {'clean': "Remove '.tox' first",
+                                 'env-list': 'Override list of environments to use (e.g. '
+                                             "'py27,py34')",
+                                 'opts': 'Extra flags for tox',
+                                 'verbose': "Make 'tox' more talkative"},
+                        'incrementable': [],
+                        'iterable': [],
+                        'name': None,
+                        'optional': [],
+                        'params': [('verbose', False),
+                                   ('clean', False),
+                                   ('env_list', ''),
+                                   ('opts', '')],
+                        'positional': []}]}}
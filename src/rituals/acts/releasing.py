@@ -25,25 +25,49 @@ import io
 import os
 import re
 import sys
+import stat
+import glob
+import json
+import time
 import shlex
 import shutil
 import tarfile
 import zipfile
+import tempfile
 from .. import pathlib
-from contextlib import closing
+from contextlib import closing, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import HeaderParser
 
-import requests
 from munch import munchify, Munch as Bunch
+from invoke.context import Context
 
 from . import Collection, task
+from .executor import invoke_tasks
+from .cache import artifact_cache, artifact_key, wheelhouse, downloads
+from .uptodate import uptodate, file_hash
+from .basic import build_inputs
 from .. import config
-from ..util import notify, shell, buildsys
+from ..util import antglob, notify, shell, buildsys
 from ..util.scm import provider as scm_provider
-from ..util.filesys import url_as_file, pretty_path
+from ..util.artifacts import digest, interpreter_tag
+from ..util.filesys import url_as_file, pretty_path, append_file
 from ..util.which import which, WhichError
 from ..util._compat import parse_qsl
 
-PKG_INFO_MULTIKEYS = ('Classifier',)
+PKG_INFO_MULTIKEYS = (
+    'Classifier', 'Dynamic', 'License-File', 'Platform', 'Project-URL', 'Provides-Extra',
+    'Requires-Dist', 'Requires-External', 'Supported-Platform',
+)
+
+# Partial uploads of smaller files are not resumed
+UPLOAD_RESUME_MIN_BYTES = 1024 * 1024
+
+# Seconds to wait for a connection, and for the reply, when checking what the server holds
+UPLOAD_PROBE_TIMEOUT = (10, 30)
+
+# Requirements resolved into the wheelhouse are checked for new releases after this time
+WHEELHOUSE_REFRESH_SECS = 24 * 60 * 60
 
 INSTALLER_BASH = r"""#!/usr/bin/env bash
 set -e
@@ -84,48 +108,285 @@ cat <&0 >>"$pex_target" && "./$target" --version
 """
 
 
+def parse_pkg_info(pkg_info_file):
+    """ Parse a PKG-INFO file and return its fields.
+
+        Keys are lower-case with underscores (``author_email``), multi-key
+        fields like ``classifier`` are always lists. A description in the
+        message body is returned as ``description``.
+    """
+    with io.open(pkg_info_file, encoding='utf-8') as handle:
+        message = HeaderParser().parse(handle)
+
+    result = Bunch(__file__=pkg_info_file)
+    multikeys = set(i.lower() for i in PKG_INFO_MULTIKEYS)
+    for key in message.keys():
+        name = key.lower().replace('-', '_')
+        if name in result:
+            continue
+        values = message.get_all(key)
+        result[name] = values if key.lower() in multikeys or len(values) > 1 else values[0]
+    for multikey in multikeys:
+        result.setdefault(multikey.replace('-', '_'), [])
+
+    body = message.get_payload()
+    if body and body.strip() and 'description' not in result:
+        result.description = body
+    return result
+
+
+def find_pkg_info(cfg):
+    """Return path of the project's existing ``*.egg-info/PKG-INFO`` file, or ``None``."""
+    egg_name = re.sub(r'[^A-Za-z0-9.]+', '_', cfg.project.get('name', '*'))
+    egg_base = (cfg.project.get('package_dir') or {}).get('', '')
+    for candidate in (cfg.rootjoin(egg_base, egg_name + '.egg-info'), cfg.rootjoin(egg_name + '.egg-info')):
+        for pkg_info_file in glob.glob(os.path.join(candidate, 'PKG-INFO')):
+            return pkg_info_file
+    return None
+
+
 def get_egg_info(cfg, verbose=False):
-    """Call 'setup egg_info' and return the parsed meta-data."""
+    """ Call 'setup egg_info' and return the parsed meta-data.
+
+        The call is skipped when the existing PKG-INFO file is newer
+        than all files the project metadata is built from.
+    """
     result = Bunch()
     setup_py = cfg.rootjoin('setup.py')
     if not os.path.exists(setup_py):
         return result
 
+    pkg_info_file = find_pkg_info(cfg)
+    if pkg_info_file:
+        pkg_info_mtime = os.path.getmtime(pkg_info_file)
+        if all(os.path.getmtime(i) < pkg_info_mtime for i in buildsys.project_inputs(cfg.project_root)):
+            if verbose:
+                notify.info("Using up-to-date '{}'".format(pretty_path(pkg_info_file)))
+            return parse_pkg_info(pkg_info_file)
+
     egg_info = shell.capture("python {} egg_info".format(setup_py), echo=True if verbose else None)
     for info_line in egg_info.splitlines():
         if info_line.endswith('PKG-INFO'):
             pkg_info_file = info_line.split(None, 1)[1]
-            result['__file__'] = pkg_info_file
-            with io.open(pkg_info_file, encoding='utf-8') as handle:
-                lastkey = None
-                for line in handle:
-                    if line.lstrip() != line:
-                        assert lastkey, "Bad continuation in PKG-INFO file '{}': {}".format(pkg_info_file, line)
-                        result[lastkey] += '\n' + line
-                    else:
-                        lastkey, value = line.split(':', 1)
-                        lastkey = lastkey.strip().lower().replace('-', '_')
-                        value = value.strip()
-                        if lastkey in result:
-                            try:
-                                result[lastkey].append(value)
-                            except AttributeError:
-                                result[lastkey] = [result[lastkey], value]
-                        else:
-                            result[lastkey] = value
-
-    for multikey in PKG_INFO_MULTIKEYS:
-        if not isinstance(result.get(multikey, []), list):
-            result[multikey] = [result[multikey]]
+            result = parse_pkg_info(cfg.rootjoin(pkg_info_file))
 
     return result
 
 
-def build_zipapp(ctx, app_builder, opts=''):
+def dist_inputs(ctx, cfg, **_):
+    """Return patterns of all files a distribution depends on."""
+    return build_inputs(ctx, cfg, docs=True) + ['README*', 'LICENSE']
+
+
+def dist_formats(egg=False, wheel=False, auto=True):
+    """Return whether to create an EGG and a WHL, for the options of `dist`."""
+    if auto:
+        egg = sys.version_info.major == 2
+        try:
+            import wheel as _
+            wheel = True
+        except ImportError:
+            wheel = False
+    return egg, wheel
+
+
+def dist_outputs(_ctx, cfg, egg=False, wheel=False, auto=True, **_):
+    """Return patterns of the distribution files `dist` creates."""
+    # Either kind of separator, and any case, since tools normalize names differently
+    name = ''.join('[-_.]' if i in '-_.' else '[{}{}]'.format(i.lower(), i.upper()) if i.isalpha() else i
+                   for i in cfg.project.name)
+    egg, wheel = dist_formats(egg, wheel, auto)
+    return ['dist/{}-*.tar.gz'.format(name)] + (
+        ['dist/{}-*.egg'.format(name)] if egg else []) + (
+        ['dist/{}-*.whl'.format(name)] if wheel else [])
+
+
+def zipapp_inputs(ctx, cfg):
+    """Return patterns of all files a zipapp depends on (which excludes tests and docs)."""
+    return build_inputs(ctx, cfg) + [antglob.excludes(cfg.testdir.strip('/') + '/')]
+
+
+def extract_pyrun(tarball, cache_dir):
+    """ Return the path to the ``pyrun`` executable in the eGenix PyRun `tarball`.
+
+        It is extracted only once, into the download cache at `cache_dir`.
+    """
+    target_dir = os.path.join(cache_dir, 'pyrun', file_hash(tarball))
+    target = os.path.join(target_dir, 'pyrun')
+    if not os.path.exists(target):
+        if not os.path.isdir(target_dir):
+            os.makedirs(target_dir)
+        handle, tmpname = tempfile.mkstemp(prefix='.tmp-', dir=target_dir)
+        with tarfile.open(tarball, 'r:gz') as pyrun_tar, io.open(handle, 'wb') as out:
+            shutil.copyfileobj(pyrun_tar.extractfile('./bin/pyrun'), out)
+        os.chmod(tmpname, 0o555)
+        os.replace(tmpname, target)
+    return target
+
+
+def build_installer(pyrun_exe, pex_file, installer):
+    """ Write a self-installing `installer` script, from the installer shell header,
+        the `pyrun_exe` runtime, and the `pex_file`.
+    """
+    header = INSTALLER_BASH.encode('utf-8')
+    header = header.replace(b'00000', '{:<5d}'.format(len(header) + 1).encode('ascii'))
+    with io.open(installer, 'wb', buffering=0) as out:
+        out.write(header)
+        append_file(out.fileno(), pyrun_exe)
+        append_file(out.fileno(), pex_file)
+    shutil.copystat(pex_file, installer)
+    os.chmod(installer, os.stat(installer).st_mode | stat.S_IWUSR)
+    notify.info("Wrote PEX installer to '{}'".format(pretty_path(installer)))
+
+
+def rename_pex(pex_file, pex_ext):
+    """ Add the environment ID to the name of `pex_file`, and return the new path.
+
+        Warns about any non-pure or native wheels it contains.
+    """
+    # Warn about non-portable stuff
+    non_universal = set()
+    with closing(zipfile.ZipFile(pex_file, mode="r")) as pex_contents:
+        for pex_name in pex_contents.namelist():  # pylint: disable=no-member
+            if pex_name.endswith('WHEEL') and 'py3-none-any.whl' not in pex_name:
+                non_universal.add(pex_name.split('.whl')[0].split('/')[-1])
+    if non_universal:
+        notify.warning("Non-pure / native wheels in PEX '{}':\n    {}"
+                       .format(pex_file.replace(os.getcwd(), '.'), '\n    '.join(sorted(non_universal))))
+        envs = [i.split('-')[-3:] for i in non_universal]
+        envs = {i[0]: i[1:] for i in envs}
+        if len(envs) > 1:
+            envs = {k: v for k, v in envs.items()
+                    if not k.startswith('py')}
+        env_id = []
+        my_abi = 'abi{}'.format(sys.version_info.major)
+        for k, v in sorted(envs.items()):
+            if my_abi not in v:
+                env_id.append(k)
+                env_id.extend(v)
+        env_id = '-'.join(env_id)
+    else:
+        env_id = 'py2.py3-none-any'
+
+    new_pex_file = pex_file.replace(pex_ext, '-{}{}'.format(env_id, pex_ext))
+    notify.info("Renamed PEX to '{}'".format(os.path.basename(new_pex_file)))
+    os.rename(pex_file, new_pex_file)
+    return new_pex_file
+
+
+def rename_zipapp(artifact):
+    """ Add the environment ID to the name of the zipapp `artifact`, and return the new path.
+
+        Warns about any non-universal or native parts it contains.
+    """
+    # Warn about non-portable stuff; note that 'shiv' ships an already
+    # installed site-packages, not the wheels
+    non_pure = set()
+    with closing(zipfile.ZipFile(artifact, mode="r")) as pyz_contents:
+        for pyz_member in pyz_contents.namelist():  # pylint: disable=no-member
+            if pyz_member.endswith('WHEEL') and '-py2.py3-none-any.whl' not in pyz_member:
+                non_pure.add(pyz_member.split('.whl')[0].split('/')[-1])
+            elif pyz_member.endswith('.egg/EGG-INFO/native_libs.txt'):
+                non_pure.add(pyz_member.split('.egg')[0].split('/')[-1])
+            elif pyz_member.endswith('.so'):
+                non_pure.add('cpython-' + pyz_member.split('.cpython-')[1].split('.so')[0])
+    non_pure -= {'WHEEL'}
+    if non_pure:
+        notify.warning("Non-universal or native wheels in zipapp '{}':\n    {}"
+                       .format(artifact.replace(os.getcwd(), '.'), '\n    '.join(sorted(non_pure))))
+        #envs = [i.split('-')[-3:] for i in non_pure]
+        envs = [i.split('-') for i in non_pure]
+        envs = {i[0]: i[1:] for i in envs}
+        if len(envs) > 1:
+            envs = {k: v for k, v in envs.items() if not k.startswith('py')}
+        env_id = []
+        for k, v in sorted(envs.items()):
+            env_id.append(k)
+            env_id.extend(v)
+        env_id = '-'.join(env_id)  # .replace('cpython-', 'py{py.major}.{py.minor}-'.format(py=sys.version_info))
+    else:
+        env_id = 'py{py.major}.{py.minor}-none-any'.format(py=sys.version_info)
+
+    new_artifact = (artifact
+        .replace('.pex', '-{}.pex'.format(env_id))
+        .replace('.pyz', '-{}.pyz'.format(env_id))
+    )
+    notify.info("Renamed zipapp to '{}'".format(os.path.basename(new_artifact)))
+    os.rename(artifact, new_artifact)
+    return new_artifact
+
+
+def build_project_wheel(ctx, cfg, wheel_dir, find_links):
+    """Build a wheel of the project into `wheel_dir`, using only the packages in `find_links`."""
+    ctx.run(' '.join(shlex.quote(i) for i in [
+        sys.executable, '-m', 'pip', 'wheel', '--quiet', '--no-deps', '--no-index', '--find-links', find_links,
+        '--wheel-dir', wheel_dir, cfg.project_root,
+    ]))
+    return glob.glob(os.path.join(wheel_dir, '*.whl'))[0]
+
+
+@contextmanager
+def project_wheel(ctx, cfg, find_links):
+    """ Build a wheel of the project into a temporary directory, and provide its path.
+
+        Concurrent builds install that wheel, instead of each building the project in-tree.
+    """
+    wheel_dir = tempfile.mkdtemp(prefix='rituals-wheel-')
+    try:
+        yield build_project_wheel(ctx, cfg, wheel_dir, find_links)
+    finally:
+        shutil.rmtree(wheel_dir, ignore_errors=True)
+
+
+def run_concurrently(ctx, workers, func, calls):
+    """ Call ``func(ctx, *args)`` for each `args` tuple in `calls`, using `workers` threads.
+
+        Commands started via the given context do not read stdin then.
+    """
+    if hasattr(getattr(ctx, 'config', None), 'clone'):
+        cfg = ctx.config.clone()
+        cfg.run.in_stream = False  # concurrent commands must not compete for stdin
+        ctx = Context(config=cfg)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda args: func(ctx, *args), calls))
+
+
+def restore_artifacts(cfg, cache, entries, kind):
+    """ Restore the artifacts of `entries` from the artifact `cache` into ``dist``.
+
+        Each entry is a ``(cache_key, …)`` tuple. Returns the list of artifacts,
+        with ``None`` for the ones to build, and the build jobs, i.e. the entries
+        of those with their index in that list prepended.
+    """
+    artifacts, builds = [], []
+    for entry in entries:
+        restored = cache.restore(entry[0], cfg.rootjoin('dist'))
+        if restored:
+            notify.info("Restored {} '{}' from cache".format(kind, os.path.basename(restored[0])))
+            artifacts.extend(restored)
+        else:
+            artifacts.append(None)
+            builds.append((len(artifacts) - 1,) + tuple(entry))
+    return artifacts, builds
+
+
+def build_zipapp(ctx, app_builder, opts='', cache_opts=(), jobs=1):
     """ Build a zipapp for each entrypoint
         and return list of created artifacts.
+
+        Zipapps are taken from the artifact cache when possible,
+        `cache_opts` are any options of `app_builder` besides `opts`.
+        The builder is called as ``app_builder(ctx, cfg, out_base, script, entry_point, opts, source)``,
+        where `source` is what to install for the project.
+
+        With `jobs` other than 1 (0 means one per CPU), dependencies are put into the
+        shared wheelhouse and the project is built into a wheel, both just once.
+        The zipapps are then built concurrently, with pip options added to `opts`
+        that restrict installing to those wheels.
     """
     cfg = config.load()
+    cache = artifact_cache(ctx)
+    inputs = zipapp_inputs(ctx, cfg)
 
     # Build and check release
     ctx.run(": invoke clean --all build test check")
@@ -135,60 +396,204 @@ def build_zipapp(ctx, app_builder, opts=''):
     # from pprint import pprint; pprint(dict(pkg_info))
     version = pkg_info.version if pkg_info else cfg.project.version
 
-    # Build a PEX for each console entry-point
-    artifacts = []
+    # Find the entry-points that need a new zipapp
+    entries = []
     # from pprint import pprint; pprint(cfg.project.entry_points)
     for script in cfg.project.entry_points['console_scripts']:
         script, entry_point = script.split('=', 1)
         script, entry_point = script.strip().replace('-', '_'), entry_point.strip()
+        entries.append((artifact_key(cfg, inputs, app_builder.__name__, script, entry_point, version, opts, *cache_opts),
+                        script, entry_point))
+    artifacts, builds = restore_artifacts(cfg, cache, entries, 'zipapp')
+    if not builds:
+        return artifacts
+
+    def build(ctx, job, opts, source):
+        "Build and rename one zipapp."
+        index, cache_key, script, entry_point = job
         artifact = cfg.rootjoin('dist', '{}-{}'.format(script, version))
         pathlib.Path(artifact).parent.mkdir(exist_ok=True)
-        artifact = app_builder(ctx, cfg, artifact, script, entry_point, opts)
-
-        # Warn about non-portable stuff; note that 'shiv' ships an already
-        # installed site-packages, not the wheels
-        non_pure = set()
-        with closing(zipfile.ZipFile(artifact, mode="r")) as pyz_contents:
-            for pyz_member in pyz_contents.namelist():  # pylint: disable=no-member
-                if pyz_member.endswith('WHEEL') and '-py2.py3-none-any.whl' not in pyz_member:
-                    non_pure.add(pyz_member.split('.whl')[0].split('/')[-1])
-                elif pyz_member.endswith('.egg/EGG-INFO/native_libs.txt'):
-                    non_pure.add(pyz_member.split('.egg')[0].split('/')[-1])
-                elif pyz_member.endswith('.so'):
-                    print(pyz_member)
-                    non_pure.add('cpython-' + pyz_member.split('.cpython-')[1].split('.so')[0])
-        non_pure -= {'WHEEL'}
-        if non_pure:
-            notify.warning("Non-universal or native wheels in zipapp '{}':\n    {}"
-                           .format(artifact.replace(os.getcwd(), '.'), '\n    '.join(sorted(non_pure))))
-            #envs = [i.split('-')[-3:] for i in non_pure]
-            envs = [i.split('-') for i in non_pure]
-            envs = {i[0]: i[1:] for i in envs}
-            if len(envs) > 1:
-                envs = {k: v for k, v in envs.items() if not k.startswith('py')}
-            env_id = []
-            for k, v in sorted(envs.items()):
-                env_id.append(k)
-                env_id.extend(v)
-            env_id = '-'.join(env_id)  # .replace('cpython-', 'py{py.major}.{py.minor}-'.format(py=sys.version_info))
-        else:
-            env_id = 'py{py.major}.{py.minor}-none-any'.format(py=sys.version_info)
-
-        new_artifact = (artifact
-            .replace('.pex', '-{}.pex'.format(env_id))
-            .replace('.pyz', '-{}.pyz'.format(env_id))
-        )
-        notify.info("Renamed zipapp to '{}'".format(os.path.basename(new_artifact)))
-        os.rename(artifact, new_artifact)
-        artifact = new_artifact
-        artifacts.append(artifact)
+        artifact = rename_zipapp(app_builder(ctx, cfg, artifact, script, entry_point, opts, source))
+        artifacts[index] = artifact
+        cache.store(cache_key, [artifact], project=cfg.project.name, builder=app_builder.__name__)
+
+    jobs = min(jobs or os.cpu_count() or 1, len(builds))
+    if jobs == 1:
+        for job in builds:
+            build(ctx, job, opts, cfg.project_root)
+        return artifacts
+
+    # Resolve once, then build in parallel
+    wheel_dir = wheelhouse(ctx)
+    fill_wheelhouse(ctx, wheel_dir, [cfg.rootjoin('requirements.txt')], build_requirements(cfg))
+    build_opts = ' '.join([opts, '--find-links', shlex.quote(wheel_dir), '--no-index']).strip()
+    with project_wheel(ctx, cfg, wheel_dir) as source:
+        notify.info("Building {} zipapps with {} jobs...".format(len(builds), jobs))
+        run_concurrently(ctx, jobs, build, [(job, build_opts, source) for job in builds])
 
     return artifacts
 
 
-def upload_artifacts(ctx, artifacts):
+def build_requirements(cfg):
+    """Return the requirements for building the project (see PEP 518)."""
+    default = ['setuptools', 'wheel']
+    pyproject = cfg.rootjoin('pyproject.toml')
+    if not os.path.exists(pyproject):
+        return default
+    import toml
+
+    return toml.load(pyproject).get('build-system', {}).get('requires', default)
+
+
+def fill_wheelhouse(ctx, wheel_dir, requirement_files, requirements=()):
+    """ Make sure `wheel_dir` contains wheels for all requirements, and return their file names.
+
+        The wheels a set of requirements resolved to are recorded in ``.resolved/``.
+        While they're all present and younger than ``WHEELHOUSE_REFRESH_SECS``,
+        pip is not called at all. Otherwise, pip resolves the requirements again
+        using the package index, re-using wheels already in `wheel_dir`,
+        so unpinned requirements get new releases.
+        pip writes to a temporary directory, and finished wheels are then moved
+        into place, so concurrent builds reading the wheelhouse never see partial files.
+    """
+    key = digest(interpreter_tag(), [file_hash(i) if os.path.exists(i) else i for i in requirement_files],
+                 list(requirements))
+    pins_file = os.path.join(wheel_dir, '.resolved', key + '.json')
+    try:
+        fresh = time.time() - os.path.getmtime(pins_file) < WHEELHOUSE_REFRESH_SECS
+        with io.open(pins_file, 'r', encoding='utf-8') as handle:
+            wheels = json.load(handle)
+    except (EnvironmentError, ValueError):
+        fresh, wheels = False, []
+    if fresh and all(os.path.exists(os.path.join(wheel_dir, i)) for i in wheels):
+        return wheels
+
+    notify.info("Resolving requirements into '{}'...".format(pretty_path(wheel_dir)))
+    if not os.path.isdir(os.path.dirname(pins_file)):
+        os.makedirs(os.path.dirname(pins_file))
+    tmpdir = tempfile.mkdtemp(prefix='.tmp-', dir=wheel_dir)
+    try:
+        cmd = [sys.executable, '-m', 'pip', 'wheel', '--quiet', '--find-links', wheel_dir, '--wheel-dir', tmpdir]
+        for name in requirement_files:
+            cmd.extend(['-r', name])
+        ctx.run(' '.join(shlex.quote(i) for i in cmd + list(requirements)))
+
+        wheels = sorted(i for i in os.listdir(tmpdir) if i.endswith('.whl'))
+        for name in wheels:
+            if not os.path.exists(os.path.join(wheel_dir, name)):
+                os.replace(os.path.join(tmpdir, name), os.path.join(wheel_dir, name))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    with io.open(pins_file + '.tmp', 'w', encoding='utf-8') as handle:
+        json.dump(wheels, handle)
+    os.replace(pins_file + '.tmp', pins_file)
+    return wheels
+
+
+def pex_wheelhouse(ctx, cfg, windows=False):
+    """ Fill the shared wheelhouse for building PEX files, and return the related PEX options.
+
+        With all wheels present, PEX can resolve dependencies without any network access.
+        For Windows, binary wheels still come from PyPI, and a wheel of the project
+        itself is added to ``dist/wheels``.
+    """
+    wheel_dir = wheelhouse(ctx)
+    fill_wheelhouse(ctx, wheel_dir, [cfg.rootjoin('requirements.txt')], build_requirements(cfg))
+    if windows:
+        ctx.run(' '.join(shlex.quote(i) for i in [
+            sys.executable, '-m', 'pip', 'wheel', '--no-deps', '--find-links', wheel_dir,
+            '--wheel-dir', cfg.rootjoin('dist', 'wheels'), cfg.project_root,
+        ]))
+        return ['-f', shlex.quote(wheel_dir)]
+    return ['-f', shlex.quote(wheel_dir), '--no-index']
+
+
+def remote_state(session, url, filename, sha256):
+    """ Check what the server holds at `url`, compared to the local `filename` with hash `sha256`.
+
+        Returns ``(present, offset)``: whether the server has the very same file,
+        and how many bytes of a partial upload match the local file and can be kept.
+        This relies on an ``X-Checksum-Sha256`` header in the ``HEAD`` reply
+        (like Artifactory sends it). If the server does not reply in time
+        (see ``UPLOAD_PROBE_TIMEOUT``), the whole file is uploaded.
+    """
+    import requests
+
+    try:
+        reply = session.head(url, timeout=UPLOAD_PROBE_TIMEOUT)
+    except requests.Timeout as exc:
+        notify.warning("Cannot check for '{}' on the server, uploading it ({})".format(os.path.basename(filename), exc))
+        return False, 0
+    remote_sha256 = reply.headers.get('X-Checksum-Sha256', '').lower()
+    if reply.status_code != 200 or not remote_sha256:
+        return False, 0
+    if remote_sha256 == sha256:
+        return True, 0
+
+    size = os.path.getsize(filename)
+    remote_size = int(reply.headers.get('Content-Length', '0'))
+    if (size >= UPLOAD_RESUME_MIN_BYTES and 0 < remote_size < size
+            and reply.headers.get('Accept-Ranges') == 'bytes'
+            and file_hash(filename, remote_size) == remote_sha256):
+        return False, remote_size
+    return False, 0
+
+
+def upload_file(session, url, filename):
+    """ Upload `filename` to `url` with a PUT request, streaming it from disk.
+
+        Files the server already holds are skipped. A partial upload of a large file
+        is resumed with a ranged PUT, if its content matches the local file.
+        Returns a ``Bunch`` with the reply's status, and the upload's size and duration.
+    """
+    size = os.path.getsize(filename)
+    sha256 = file_hash(filename)
+    present, offset = remote_state(session, url, filename, sha256)
+    if present:
+        notify.info("'{}' is already stored at '{}'".format(os.path.basename(filename), url))
+        return Bunch(url=url, filename=filename, bytes=0, secs=0.0, ok=True, skipped=True,
+                     status_code=200, reason='OK')
+
+    notify.info("Uploading {:.1f} MiB to '{}'{}...".format(
+                (size - offset) / 1024.0 / 1024.0, url, ' (resuming at byte {})'.format(offset) if offset else ''))
+    started = time.time()
+    headers = {'X-Checksum-Sha256': sha256}
+    with io.open(filename, 'rb') as handle:
+        if offset:
+            handle.seek(offset)
+            # The checksum is of the whole file, so it cannot go with a part of it
+            reply = session.put(url, data=handle, headers={
+                'Content-Range': 'bytes {}-{}/{}'.format(offset, size - 1, size)})
+            if reply.status_code not in range(200, 300):
+                notify.warning("{status_code} {reason} for resumed upload, sending the whole file".format(**vars(reply)))
+                offset = 0
+                handle.seek(0)
+                reply = session.put(url, data=handle, headers=headers)
+        else:
+            reply = session.put(url, data=handle, headers=headers)
+
+    size -= offset
+    result = Bunch(
+        url=url, filename=filename, bytes=size, secs=time.time() - started, skipped=False,
+        ok=reply.status_code in range(200, 300), status_code=reply.status_code, reason=reply.reason,
+    )
+    (notify.info if result.ok else notify.warning)(
+        "{status_code} {reason} for '{name}', {mib:.1f} MiB in {secs:.1f} secs ({rate:.1f} MiB/s)".format(
+            name=os.path.basename(filename), mib=size / 1024.0 / 1024.0,
+            rate=size / 1024.0 / 1024.0 / max(result.secs, 1e-6), **result))
+    return result
+
+
+def upload_artifacts(ctx, artifacts, workers=None):
     """ Upload built artifact(s) to repository.
+
+        Up to `workers` files are uploaded concurrently, over a shared
+        connection pool. Returns a list of ``upload_file`` results.
     """
+    import requests
+    from requests.adapters import HTTPAdapter
+
     # Check the envvars explicitly, so this can be called from outside a task
     try:
         upload = ctx.rituals.release.upload
@@ -196,23 +601,32 @@ def upload_artifacts(ctx, artifacts):
         upload = munchify(namespace.configuration()).rituals.release.upload
     base_url = os.environ.get('INVOKE_RITUALS_RELEASE_UPLOAD_BASE_URL', upload.base_url).rstrip('/')
     url_path = os.environ.get('INVOKE_RITUALS_RELEASE_UPLOAD_PATH', upload.path).rstrip('/')
+    workers = int(workers or os.environ.get('INVOKE_RITUALS_RELEASE_UPLOAD_WORKERS', upload.workers))
     if not base_url:
         notify.failure("No base URL provided for uploading!")
     cfg = config.load()
 
-    for artifact in artifacts:
-        url = base_url + '/' + url_path.format(
+    def url_for(artifact):
+        "Helper"
+        return base_url + '/' + url_path.format(
             name=cfg.project.name,
             version=cfg.project.version,
             fullversion=os.path.basename(artifact).split('-')[1],
             filename=os.path.basename(artifact))
-        notify.info("Uploading to '{}'...".format(url))
-        with io.open(artifact, 'rb') as handle:
-            reply = requests.put(url, data=handle.read())
-            if reply.status_code in range(200, 300):
-                notify.info("{status_code} {reason}".format(**vars(reply)))
-            else:
-                notify.warning("{status_code} {reason}".format(**vars(reply)))
+
+    started = time.time()
+    workers = max(1, min(workers, len(artifacts)))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        results = list(pool.map(lambda artifact: upload_file(session, url_for(artifact), artifact), artifacts))
+
+    notify.info("Uploaded {} of {} file(s) with {:.1f} MiB in {:.1f} secs, {} already present.".format(
+                sum(i.ok and not i.skipped for i in results), len(results),
+                sum(i.bytes for i in results if i.ok) / 1024.0 / 1024.0, time.time() - started,
+                sum(i.skipped for i in results)))
+    return results
 
 
 @task(help=dict(
@@ -272,27 +686,36 @@ def bump(ctx, verbose=False, pypi=False):
     wheel="Also create a WHL",
     auto="Create EGG for Python2, and WHL whenever possible",
 ))
+@uptodate(inputs=dist_inputs, outputs=dist_outputs, when=lambda devpi, **_: not devpi)
 def dist(ctx, devpi=False, egg=False, wheel=False, auto=True):
     """Distribute the project."""
-    config.load()
+    cfg = config.load()
     cmd = ["python", "setup.py", "sdist"]
 
     # Automatically create wheels if possible
-    if auto:
-        egg = sys.version_info.major == 2
-        try:
-            import wheel as _
-            wheel = True
-        except ImportError:
-            wheel = False
+    egg, wheel = dist_formats(egg, wheel, auto)
 
     if egg:
         cmd.append("bdist_egg")
     if wheel:
         cmd.append("bdist_wheel")
 
-    ctx.run("invoke clean --all build --docs test check")
-    ctx.run(' '.join(cmd))
+    # Re-use a cached distribution of the very same sources, which passed all checks already
+    cache = artifact_cache(ctx)
+    pkg_info = get_egg_info(cfg)
+    cache_key = artifact_key(cfg, dist_inputs(ctx, cfg), 'dist', cmd,
+                             pkg_info.version if pkg_info else cfg.project.version)
+    if cache_key in cache:
+        invoke_tasks(ctx, "clean --dist")
+    restored = cache.restore(cache_key, cfg.rootjoin('dist'))
+    if restored:
+        notify.info("Restored {} from cache".format(', '.join(os.path.basename(i) for i in restored)))
+    else:
+        invoke_tasks(ctx, "clean --all build --docs test check")
+        ctx.run(' '.join(cmd))
+        cache.store(cache_key, sorted(i for i in glob.glob(cfg.rootjoin('dist', '*')) if os.path.isfile(i)),
+                    project=cfg.project.name, builder='dist')
+
     if devpi:
         ctx.run("devpi upload dist/*")
 
@@ -302,8 +725,9 @@ def dist(ctx, devpi=False, egg=False, wheel=False, auto=True):
     upload="Upload the created archive to a WebDAV repository",
     opts="Extra flags for PEX",
     windows="Build for Windows platform",
+    jobs="Build the PEX files of several entry points concurrently (0 means one per CPU)",
 ))
-def pex(ctx, pyrun='', upload=False, opts='', windows=False):
+def pex(ctx, pyrun='', upload=False, opts='', windows=False, jobs=1): # pylint: disable=too-many-locals
     """Package the project with PEX."""
     cfg = config.load()
 
@@ -329,54 +753,46 @@ def pex(ctx, pyrun='', upload=False, opts='', windows=False):
         opts += ' --platform=win_amd64-cp-{py.major}{py.minor}-cp{py.major}{py.minor}{flags}'.format(
             py=sys.version_info, flags='m' if sys.version_info < (3, 8) else '')
         pex_ext = '.pyz'
-        ctx.run(sys.executable + " -m pip wheel -w dist/wheels -r requirements.txt .")
 
     # Build a PEX for each console entry-point
-    pex_files = []
+    entries = []
+    cache = artifact_cache(ctx)
+    inputs = zipapp_inputs(ctx, cfg)
     # from pprint import pprint; pprint(cfg.project.entry_points)
     for script in cfg.project.entry_points['console_scripts']:
         script, entry_point = script.split('=', 1)
         script, entry_point = script.strip(), entry_point.strip()
+        entries.append((artifact_key(cfg, inputs, 'pex', script, entry_point, version, opts, windows), script))
+    pex_files, builds = restore_artifacts(cfg, cache, entries, 'PEX')
+
+    def build(ctx, job, wheel_opts, source):
+        "Build and rename one PEX."
+        index, cache_key, script = job
         pex_file = cfg.rootjoin('dist', '{}-{}{}'.format(script, version, pex_ext))
         cmd = [sys.executable, '-m', 'pex',
                '-r', cfg.rootjoin('requirements.txt'),
                '-c', script,
                '-o', pex_file,
-        ]
+        ] + wheel_opts
         if opts:
             cmd.extend(shlex.split(opts))
-        cmd.append(cfg.project_root)
+        cmd.append(source)
         ctx.run(' '.join(cmd))
 
-        # Warn about non-portable stuff
-        non_universal = set()
-        with closing(zipfile.ZipFile(pex_file, mode="r")) as pex_contents:
-            for pex_name in pex_contents.namelist():  # pylint: disable=no-member
-                if pex_name.endswith('WHEEL') and 'py3-none-any.whl' not in pex_name:
-                    non_universal.add(pex_name.split('.whl')[0].split('/')[-1])
-        if non_universal:
-            notify.warning("Non-pure / native wheels in PEX '{}':\n    {}"
-                           .format(pex_file.replace(os.getcwd(), '.'), '\n    '.join(sorted(non_universal))))
-            envs = [i.split('-')[-3:] for i in non_universal]
-            envs = {i[0]: i[1:] for i in envs}
-            if len(envs) > 1:
-                envs = {k: v for k, v in envs.items()
-                        if not k.startswith('py')}
-            env_id = []
-            my_abi = 'abi{}'.format(sys.version_info.major)
-            for k, v in sorted(envs.items()):
-                if my_abi not in v:
-                    env_id.append(k)
-                    env_id.extend(v)
-            env_id = '-'.join(env_id)
-        else:
-            env_id = 'py2.py3-none-any'
+        pex_file = rename_pex(pex_file, pex_ext)
+        pex_files[index] = pex_file
+        cache.store(cache_key, [pex_file], project=cfg.project.name, builder='pex')
 
-        new_pex_file = pex_file.replace(pex_ext, '-{}{}'.format(env_id, pex_ext))
-        notify.info("Renamed PEX to '{}'".format(os.path.basename(new_pex_file)))
-        os.rename(pex_file, new_pex_file)
-        pex_file = new_pex_file
-        pex_files.append(pex_file)
+    if builds:
+        wheel_opts = pex_wheelhouse(ctx, cfg, windows=windows)
+        jobs = min(int(jobs) or os.cpu_count() or 1, len(builds))
+        if jobs == 1:
+            for job in builds:
+                build(ctx, job, wheel_opts, cfg.project_root)
+        else:
+            with project_wheel(ctx, cfg, wheelhouse(ctx)) as source:
+                notify.info("Building {} PEX files with {} jobs...".format(len(builds), jobs))
+                run_concurrently(ctx, jobs, build, [(job, wheel_opts, source) for job in builds])
 
     if not pex_files:
         notify.warning("No entry points found in project configuration!")
@@ -391,20 +807,14 @@ def pex(ctx, pyrun='', upload=False, opts='', windows=False):
                              pyrun_cfg['archive']).format(**pyrun_cfg)
 
             notify.info("Getting PyRun from '{}'...".format(pyrun_url))
-            with url_as_file(pyrun_url, ext='tgz') as pyrun_tarball:
-                pyrun_tar = tarfile.TarFile.gzopen(pyrun_tarball)
-                for pex_file in pex_files[:]:
-                    pyrun_exe = pyrun_tar.extractfile('./bin/pyrun')
-                    with open(pex_file, 'rb') as pex_handle:
-                        pyrun_pex_file = '{}{}-installer.sh'.format(
-                            pex_file[:-4], pyrun_url.rsplit('/egenix')[-1][:-4])
-                        with open(pyrun_pex_file, 'wb') as pyrun_pex:
-                            pyrun_pex.write(INSTALLER_BASH.replace('00000', '{:<5d}'.format(len(INSTALLER_BASH) + 1)))
-                            shutil.copyfileobj(pyrun_exe, pyrun_pex)
-                            shutil.copyfileobj(pex_handle, pyrun_pex)
-                        shutil.copystat(pex_file, pyrun_pex_file)
-                        notify.info("Wrote PEX installer to '{}'".format(pretty_path(pyrun_pex_file)))
-                        pex_files.append(pyrun_pex_file)
+            with url_as_file(pyrun_url, ext='tgz', cache_dir=downloads(ctx)) as pyrun_tarball:
+                pyrun_exe = extract_pyrun(pyrun_tarball, downloads(ctx))
+            installers = ['{}{}-installer.sh'.format(pex_file[:-4], pyrun_url.rsplit('/egenix')[-1][:-4])
+                          for pex_file in pex_files]
+            with ThreadPoolExecutor(max_workers=min(len(pex_files), os.cpu_count() or 1)) as pool:
+                list(pool.map(lambda pex_file, installer: build_installer(pyrun_exe, pex_file, installer),
+                              pex_files, installers))
+            pex_files.extend(installers)
 
         if upload:
             upload_artifacts(ctx, pex_files)
@@ -414,10 +824,11 @@ def pex(ctx, pyrun='', upload=False, opts='', windows=False):
     upload="Upload the created archive to a WebDAV repository",
     python="Custom shebang for the zipapp",
     opts="Extra flags for 'shiv'",
+    jobs="Build the zipapps of several entry points concurrently (0 means one per CPU)",
 ))
-def shiv(ctx, upload=False, python='', opts=''):
+def shiv(ctx, upload=False, python='', opts='', jobs=1):
     """Package the project to a zipapp with 'shiv'."""
-    def shiv(ctx, cfg, out_base, script, entry_point, opts):
+    def shiv(ctx, cfg, out_base, script, entry_point, opts, source):
         """Helper for shiv packaging."""
         out_name = out_base + '.pyz'
         cmd = [sys.executable, '-m', 'shiv.cli',
@@ -425,7 +836,7 @@ def shiv(ctx, upload=False, python='', opts=''):
                '-e', entry_point,
                '-p', shlex.quote(shebang),
                '-o', out_name,
-               cfg.project_root,
+               source,
                '-r', cfg.rootjoin('requirements.txt'),
         ]
         if opts:
@@ -440,7 +851,7 @@ def shiv(ctx, upload=False, python='', opts=''):
                        "{sys.executable} -m pip install shiv".format(sys=sys))
 
     shebang = python or '/usr/bin/env python{py.major}.{py.minor}'.format(py=sys.version_info)
-    artifacts = build_zipapp(ctx, shiv, opts)
+    artifacts = build_zipapp(ctx, shiv, opts, cache_opts=[shebang], jobs=int(jobs))
     if not artifacts:
         notify.warning("No entry points found in project configuration!")
     else:
@@ -498,7 +909,7 @@ def prep(ctx, commit=True):
 
     # Build a clean dist and check version number
     version = buildsys.project_version()
-    ctx.run('invoke clean --all build --docs release.dist')
+    invoke_tasks(ctx, 'clean --all build --docs release.dist')
     for distfile in os.listdir('dist'):
         trailer = distfile.split('-' + version)[1]
         trailer, _ = os.path.splitext(trailer)
@@ -516,7 +927,7 @@ namespace = Collection.from_module(sys.modules[__name__], name='release', config
     release = dict(
         commit = dict(message = ':package: Release v{version}'),
         tag = dict(name = 'v{version}', message = 'Release v{version}'),
-        upload = dict(base_url = '', path='{name}/{fullversion}/{filename}'),
+        upload = dict(base_url = '', path='{name}/{fullversion}/{filename}', workers = 4),
     ),
     pyrun = dict(
         version = '2.1.0',
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+""" Make-style up-to-date checks for tasks.
+
+    A task decorated with :func:`uptodate` declares its input files
+    (as ``antglob`` patterns) and its outputs. When all outputs exist and
+    the inputs did not change since the last successful run with the same
+    arguments, the task is skipped.
+
+    Inputs are compared by content hashes; hashing is skipped for files
+    whose size and modification time are unchanged. Fingerprints are
+    taken before the task runs, so inputs edited meanwhile cause another
+    run next time; thus, input patterns must exclude any files the task
+    generates. They're kept in ``build/.rituals/``, and thus are removed
+    by ``clean``. Set ``INVOKE_RITUALS_FORCE=1`` to run all tasks regardless.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import io
+import os
+import glob
+import json
+import hashlib
+import inspect
+import functools
+
+from .. import config
+from ..util import antglob, notify
+
+STAMP_DIR = 'uptodate'
+
+
+def file_hash(filename, size=None):
+    """Return the SHA-256 hex digest of a file's content, or of its first `size` bytes."""
+    digest = hashlib.sha256()
+    remaining = float('inf') if size is None else size
+    with io.open(filename, 'rb') as handle:
+        while remaining > 0:
+            chunk = handle.read(int(min(1 << 16, remaining)))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(root, patterns, recorded=None):
+    """ Return ``{path: [mtime_ns, size, sha256]}`` for the files matching `patterns`.
+
+        Hashes of files with the same size and modification time
+        as in the `recorded` fingerprint are taken from there.
+    """
+    recorded = recorded or {}
+    result = {}
+    for path in antglob.FileSet(root, patterns):
+        try:
+            info = os.stat(os.path.join(root, path))
+        except OSError:
+            continue
+        stamp = [info.st_mtime_ns, info.st_size]
+        old = recorded.get(path)
+        result[path] = stamp + [old[2] if old and old[:2] == stamp else file_hash(os.path.join(root, path))]
+    return result
+
+
+def same_content(fingerprint_a, fingerprint_b):
+    """Check if two fingerprints describe the same set of files and contents."""
+    return fingerprint_a.keys() == fingerprint_b.keys() and all(
+        fingerprint_a[i][2] == fingerprint_b[i][2] for i in fingerprint_a
+    )
+
+
+def uptodate(inputs, outputs, when=None):
+    """ Decorator for task functions, to skip them when their outputs are current.
+
+        `inputs` is a list of ``antglob`` patterns (relative to the project root),
+        `outputs` a list of glob patterns that each must match an existing path.
+        Both can also be callables, taking the task's context, the ``config.load()``
+        result, and the task arguments as keywords, and returning such a list.
+        The optional `when` predicate gets the task arguments as keywords,
+        and decides whether a call can be skipped at all.
+
+        Use it below ``@task``::
+
+            @task
+            @uptodate(inputs=['setup.py', 'src/**/*.py'], outputs=['build/lib*'])
+            def build(ctx):
+                ...
+    """
+    def decorator(func):
+        "Wrap `func` in up-to-date checks."
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(ctx, *args, **kwargs):
+            "Run the task if its outputs are outdated."
+            bound = signature.bind(ctx, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(list(bound.arguments.items())[1:])
+            if (when and not when(**params)) or os.environ.get('INVOKE_RITUALS_FORCE', '0') not in ('', '0'):
+                return func(ctx, *args, **kwargs)
+
+            cfg = config.load()
+            patterns = inputs(ctx, cfg, **params) if callable(inputs) else inputs
+            targets = outputs(ctx, cfg, **params) if callable(outputs) else outputs
+            key = hashlib.sha256(json.dumps(
+                [func.__module__, func.__name__, params], sort_keys=True, default=str,
+            ).encode('utf-8')).hexdigest()[:16]
+            stamp_file = cfg.cachejoin(STAMP_DIR, '{}-{}.json'.format(func.__name__, key))
+
+            try:
+                with io.open(stamp_file, 'r', encoding='utf-8') as handle:
+                    recorded = json.load(handle)
+            except (EnvironmentError, ValueError):
+                recorded = None
+
+            current = fingerprint(cfg.project_root, patterns, recorded)
+            if recorded and all(glob.glob(os.path.join(cfg.project_root, i)) for i in targets):
+                if same_content(current, recorded):
+                    if current != recorded:
+                        save_fingerprint(stamp_file, current)  # only timestamps changed
+                    notify.info("'{}' is up-to-date.".format(func.__name__))
+                    return None
+
+            result = func(ctx, *args, **kwargs)
+            save_fingerprint(stamp_file, current)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def save_fingerprint(filename, data):
+    """Atomically write a fingerprint to `filename`."""
+    if not os.path.isdir(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    with io.open(filename + '.tmp', 'w', encoding='utf-8') as handle:
+        json.dump(data, handle, separators=(',', ':'))
+    os.replace(filename + '.tmp', filename)
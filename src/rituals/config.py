@@ -31,12 +31,14 @@ from munch import Munch as Bunch
 DEFAULTS = dict(
     srcdir = 'src',
     testdir = 'src/tests',
+    cachedir = 'build/.rituals',
     project_root = None,
     project = {},
     cwd = None,
     rootjoin = None,
     srcjoin = None,
     testjoin = None,
+    cachejoin = None,
 )
 
 
@@ -67,6 +69,7 @@ def load():
     cfg.rootjoin = lambda *names: os.path.join(cfg.project_root, *names)
     cfg.srcjoin = lambda *names: cfg.rootjoin(cfg.srcdir, *names)
     cfg.testjoin = lambda *names: cfg.rootjoin(cfg.testdir, *names)
+    cfg.cachejoin = lambda *names: cfg.rootjoin(cfg.cachedir, *names)
     cfg.cwd = os.getcwd()
     os.chdir(cfg.project_root)
     cfg.project = buildsys.project_meta()
@@ -25,6 +25,7 @@ import os
 import sys
 
 from .acts import Collection, task
+from .acts.executor import parallel
 from .util.filesys import pushd
 
 # Project layout detection
@@ -34,36 +35,24 @@ if config.is_flat_layout(os.getcwd()):
 elif config.is_maven_layout(os.getcwd()):
     config.set_maven_layout()
 
-# Build root namespace
-from .acts import basic
-namespace = Collection.from_module(basic, name='')  # pylint: disable=invalid-name
+# Build root namespace, acts are imported when their tasks are called
+from .acts.lazy import lazy_collection, find_task
+namespace = lazy_collection('basic')  # pylint: disable=invalid-name
 
-from .acts.testing import namespace as _
-namespace.add_collection(_)
-
-from .acts.documentation import namespace as _
-namespace.add_collection(_)
-
-from .acts.inspection import namespace as _
-namespace.add_collection(_)
-
-from .acts.releasing import namespace as _
-namespace.add_collection(_)
+for _ in ('testing', 'documentation', 'inspection', 'releasing', 'cache'):
+    namespace.add_collection(lazy_collection(_))
 
 # Activate Jekins tasks?
 if os.environ.get('JENKINS_URL'):
-    from .acts.jenkins import namespace as _
-    namespace.add_collection(_)
+    namespace.add_collection(lazy_collection('jenkins'))
 
 # Activate devpi tasks by default?
 if os.path.exists(os.path.expanduser('~/.devpi/client/current.json')):
-    from .acts.devpi import namespace as _
-    namespace.add_collection(_)
+    namespace.add_collection(lazy_collection('devpi'))
 
 # Activate dpkg tasks?
 if os.path.exists('debian/rules'):
-    from .acts.pkgdeb import namespace as _
-    namespace.add_collection(_)
+    namespace.add_collection(lazy_collection('pkgdeb'))
 
 
 def fail(message, exitcode=1):
@@ -73,9 +62,9 @@ def fail(message, exitcode=1):
     sys.exit(exitcode)
 
 
-__all__ = ['Collection', 'task', 'namespace', 'pushd', 'fail']
+__all__ = ['Collection', 'task', 'parallel', 'namespace', 'pushd', 'fail']
 
 for _ in namespace.task_names:
     _name = _.replace('-', '_').replace('.', '_')
     __all__.append(_name)
-    globals()[_name] = namespace.task_with_config(_)[0]
+    globals()[_name] = find_task(namespace, _)
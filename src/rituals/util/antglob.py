@@ -32,21 +32,82 @@ from __future__ import absolute_import, unicode_literals, print_function
 
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from ._compat import string_types
 
-# TODO: allow '?'
 # TODO: matching for Windows? (need to canonize to forward slashes in 'root')
 
 __all__ = ['FileSet', 'includes', 'excludes']
 
+GLOB_CHARS = '*?[{'
+
+
+def _split_braces(text, sep):
+    """Split `text` at each `sep` character that is not within curly braces."""
+    parts, depth, start = [], 0, 0
+    for idx, char in enumerate(text):
+        if char == '{':
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+        elif char == sep and not depth:
+            parts.append(text[start:idx])
+            start = idx + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _closing_brace(text, start):
+    """Return index of the brace closing the one at `start`, or -1."""
+    depth = 0
+    for idx in range(start, len(text)):
+        if text[idx] == '{':
+            depth += 1
+        elif text[idx] == '}':
+            depth -= 1
+            if not depth:
+                return idx
+    return -1
+
 
 def glob2re(part):
     """Convert a path part to regex syntax."""
-    return "[^/]*".join(
-        re.escape(bit).replace(r'\[\^', '[^').replace(r'\[', '[').replace(r'\]', ']')
-        for bit in part.split("*")
-    )
+    result = []
+    idx = 0
+    while idx < len(part):
+        char = part[idx]
+        idx += 1
+        if char == '*':
+            result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        elif char == '[':
+            # Character set, possibly inverted by '^' or '!', and ']' is literal when first
+            end = idx + 1 if part[idx:idx + 1] in ('^', '!') else idx
+            end = part.find(']', end + 1 if part[end:end + 1] == ']' else end)
+            if end < 0:
+                result.append(re.escape(char))
+            else:
+                charset = part[idx:end].replace('\\', '\\\\').replace('[', '\\[')
+                if charset.startswith('!'):
+                    charset = '^' + charset[1:]
+                result.append('[' + charset + ']')
+                idx = end + 1
+        elif char == '{':
+            # Alternation, with glob syntax in each of the alternatives
+            end = _closing_brace(part, idx - 1)
+            if end < 0:
+                result.append(re.escape(char))
+            else:
+                result.append('(?:{0})'.format('|'.join(
+                    glob2re(i) for i in _split_braces(part[idx:end], ',')
+                )))
+                idx = end + 1
+        else:
+            result.append(re.escape(char))
+
+    return ''.join(result)
 
 
 def parse_glob(pattern):
@@ -54,7 +115,7 @@ def parse_glob(pattern):
     if not pattern:
         return
 
-    bits = pattern.split("/")
+    bits = _split_braces(pattern, "/")
     dirs, filename = bits[:-1], bits[-1]
 
     for dirname in dirs:
@@ -63,7 +124,30 @@ def parse_glob(pattern):
         else:
             yield glob2re(dirname) + "/"
 
-    yield glob2re(filename)
+    if filename == "**":
+        yield ".+"
+    else:
+        yield glob2re(filename)
+
+
+def scan_entries(path):
+    """ Read a directory, and return a list of ``(name, is_dir, is_link)`` tuples.
+
+        Entry types come from the cached data of `os.scandir`, where available.
+    """
+    result = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            try:
+                is_link = is_dir and entry.is_symlink()
+            except OSError:
+                is_link = False
+            result.append((entry.name, is_dir, is_link))
+    return result
 
 
 def compile_glob(spec):
@@ -78,9 +162,17 @@ class Pattern():
 
     def __init__(self, spec, inclusive):
         """Create regex-based pattern matcher from glob `spec`."""
-        self.compiled = compile_glob(spec.rstrip('/'))
+        self.regex = "".join(parse_glob(spec.rstrip('/')))
+        self.compiled = re.compile("^{0}$".format(self.regex))
         self.inclusive = inclusive
         self.is_dir = spec.endswith('/')
+        self.spec = spec
+
+        # Literal leading part, all matching paths start with it
+        stem = spec.rstrip('/')
+        wildcard = min([stem.index(i) for i in GLOB_CHARS if i in stem] or [len(stem)])
+        self.prefix = stem[:wildcard]
+        self.literal = wildcard == len(stem)
 
     def __str__(self):
         """Return inclusiveness indicator and original glob pattern."""
@@ -97,16 +189,20 @@ class FileSet():
         Produces an iterator of all of the files that match the provided patterns.
         Note that directory matches must end with a slash, and if they're exclusions,
         they won't be scanned (which prunes anything in that directory that would
-        otherwise match).
+        otherwise match). Likewise, sub-trees outside of the literal leading parts
+        of all inclusive patterns (like ``docs/`` in ``docs/**/*.rst``) are skipped.
 
         Directory specifiers:
-            **              matches zero or more directories.
+            **              matches zero or more directories
+                            (or anything below, when used as the last part).
             /               path separator.
 
         File specifiers:
             *               glob style wildcard.
+            ?               any single character (except a slash).
             [chars]         inclusive character sets.
-            [^chars]        exclusive character sets.
+            [^chars]        exclusive character sets (also '[!chars]').
+            {a,b,...}       alternatives, each one can contain other specifiers.
 
         Examples:
             **/*.py         recursively match all python files.
@@ -119,6 +215,10 @@ class FileSet():
             **/foo/         any directory named 'foo'.
             **/.*           hidden files.
             **/.*/          hidden directories.
+            **/*.py[co]     compiled python files.
+            **/*.{pyc,pyo}  the same, using alternatives.
+            {docs,doc}/_build/  both documentation build directories.
+            foo/**/         all directories below 'foo', at any depth.
     """
 
     def __init__(self, root, patterns):
@@ -126,20 +226,68 @@ class FileSet():
             patterns = [patterns]
 
         self.root = root
+        self.index = None
         self.patterns = [i if hasattr(i, 'inclusive') else includes(i) for i in patterns]
+        self._matchers = {
+            is_dir: self._combine([(idx, i) for idx, i in enumerate(self.patterns) if i.is_dir == is_dir])
+            for is_dir in (False, True)
+        }
+
+        # Literal prefixes of inclusive patterns, for pruning subtrees (`None` means no pruning)
+        self._prefixes = [(i.prefix, i.literal) for i in self.patterns if i.inclusive]
+        if any(not prefix and not literal for prefix, literal in self._prefixes):
+            self._prefixes = None
+
+    @classmethod
+    def from_index(cls, index, patterns):
+        """ Create a fileset that reads directories via a `treeindex.TreeIndex`.
+
+            Listings of directories whose modification time did not change
+            since the index was last saved are taken from the index.
+        """
+        fileset = cls(index.root, patterns)
+        fileset.index = index
+        return fileset
 
     def __repr__(self):
         return "<FileSet at {0} {1}>".format(repr(self.root), ' '.join(str(i) for i in self. patterns))
 
+    @staticmethod
+    def _combine(patterns):
+        """ Compile indexed `patterns` into a single alternation regex.
+
+            Alternatives are tried left to right, so they're added in reverse
+            order to keep the "last match wins" semantics; the named group of the
+            successful alternative carries the index of the deciding pattern.
+        """
+        if not patterns:
+            return None
+        return re.compile("^(?:{0})$".format('|'.join(
+            "(?P<p{0}>{1})".format(idx, pattern.regex) for idx, pattern in reversed(patterns)
+        )))
+
+    def matching(self, path, is_dir=False):
+        """Return the pattern that decides about `path`, or `None` on undecided."""
+        matcher = self._matchers[is_dir]
+        match = matcher.match(path) if matcher else None
+        return self.patterns[int(match.lastgroup[1:])] if match else None
+
+    def reachable(self, dirpath):
+        """ Check whether any inclusive pattern can match something below `dirpath`.
+
+            `dirpath` is relative to the root and must end with a slash.
+        """
+        if self._prefixes is None:
+            return True
+        for prefix, literal in self._prefixes:
+            if prefix.startswith(dirpath) or (not literal and dirpath.startswith(prefix)):
+                return True
+        return False
+
     def included(self, path, is_dir=False):
         """Check patterns in order, last match that includes or excludes `path` wins. Return `None` on undecided."""
-        inclusive = None
-        for pattern in self.patterns:
-            if pattern.is_dir == is_dir and pattern.matches(path):
-                inclusive = pattern.inclusive
-
-        #print('+++' if inclusive else '---', path, pattern)
-        return inclusive
+        pattern = self.matching(path, is_dir)
+        return None if pattern is None else pattern.inclusive
 
     def __iter__(self):
         for path in self.walk():
@@ -157,34 +305,134 @@ class FileSet():
     def __rand__(self, other):
         return self & other
 
+    def _scan(self, path, prefix, followlinks=False, onerror=None, prune_matches=False):
+        """ Scan a single directory, `prefix` is its path relative to the root.
+
+            Returns the matched relative paths, and a list of ``(path, prefix)``
+            tuples for the sub-directories that need to be descended into.
+        """
+        hits, files, subdirs = [], [], []
+        try:
+            entries = self.index.listdir(path, prefix) if self.index is not None else scan_entries(path)
+        except OSError as exc:
+            if onerror is not None:
+                onerror(exc)
+            entries = []
+
+        for name, is_dir, is_link in entries:
+            if not is_dir:
+                files.append(name)
+                continue
+
+            relpath = prefix + name
+            inclusive = self.included(relpath, is_dir=True)
+            if inclusive:
+                hits.append(relpath + '/')
+            if inclusive is False or (inclusive and prune_matches):
+                continue
+            if self.reachable(relpath + '/') and (followlinks or not is_link):
+                subdirs.append((os.path.join(path, name), relpath + '/'))
+
+        hits.extend(prefix + i for i in files if self.included(prefix + i))
+        return hits, subdirs
+
+    def _walk_parallel(self, workers, ordered=False, **kwargs):
+        """ Scan directories on a pool of `workers` threads, generating relative paths.
+
+            At most ``2 * workers`` directory scans are in flight or waiting to be
+            consumed, so memory use stays flat. Exclusions are applied by each scan,
+            before any sub-directory is queued. When `ordered` is true, paths are
+            generated in the same order as a serial walk, else as scans complete.
+        """
+        window = 2 * workers
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if ordered:
+                # Depth-first stack of [path, prefix, future], prefetching from the top
+                stack = [[self.root, '', None]]
+                submitted = 0
+                try:
+                    while stack:
+                        for entry in reversed(stack[-window:]):
+                            if submitted >= window:
+                                break
+                            if entry[2] is None:
+                                entry[2] = pool.submit(self._scan, entry[0], entry[1], **kwargs)
+                                submitted += 1
+
+                        _, _, future = stack.pop()
+                        submitted -= 1
+                        hits, subdirs = future.result()
+                        stack.extend([i, j, None] for i, j in reversed(subdirs))
+                        for hit in hits:
+                            yield hit
+                finally:
+                    for entry in stack:
+                        if entry[2] is not None:
+                            entry[2].cancel()
+            else:
+                pending = [(self.root, '')]
+                running = set()
+                try:
+                    while pending or running:
+                        while pending and len(running) < window:
+                            path, prefix = pending.pop()
+                            running.add(pool.submit(self._scan, path, prefix, **kwargs))
+
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            hits, subdirs = future.result()
+                            pending.extend(reversed(subdirs))
+                            for hit in hits:
+                                yield hit
+                finally:
+                    for future in running:
+                        future.cancel()
+
     def walk(self, **kwargs):
         """ Like `os.walk` and taking the same keyword arguments,
             but generating paths relative to the root.
 
             Starts in the fileset's root and filters based on its patterns.
             If ``with_root=True`` is passed in, the generated paths include
-            the root path.
+            the root path. With ``prune_matches=True``, matched directories
+            are not descended into (e.g. when they're removed anyway).
+
+            Directories are read via `os.scandir`, so their entry types
+            come from the cached directory listing instead of extra `stat` calls.
+
+            Passing ``parallel=N`` scans sibling directories on `N` threads,
+            which helps with wide trees on high-latency file systems. The order
+            of results then depends on timing, unless ``ordered=True`` is also
+            given. Parallel walks are always top-down.
         """
         lead = ''
         if 'with_root' in kwargs and kwargs.pop('with_root'):
             lead = self.root.rstrip(os.sep) + os.sep
-
-        for base, dirs, files in os.walk(self.root, **kwargs):
-            prefix = base[len(self.root):].lstrip(os.sep)
-            bits = prefix.split(os.sep) if prefix else []
-
-            for dirname in dirs[:]:
-                path = '/'.join(bits + [dirname])
-                inclusive = self.included(path, is_dir=True)
-                if inclusive:
-                    yield lead + path + '/'
-                elif inclusive is False:
-                    dirs.remove(dirname)
-
-            for filename in files:
-                path = '/'.join(bits + [filename])
-                if self.included(path):
-                    yield lead + path
+        topdown = kwargs.pop('topdown', True)
+        parallel = kwargs.pop('parallel', 0)
+        ordered = kwargs.pop('ordered', False)
+
+        if parallel:
+            if not topdown:
+                raise ValueError("Parallel walks are always top-down")
+            for hit in self._walk_parallel(parallel, ordered=ordered, **kwargs):
+                yield lead + hit
+            return
+
+        stack = [(self.root, '', None)]
+        while stack:
+            path, prefix, hits = stack.pop()
+            if hits is None:
+                hits, subdirs = self._scan(path, prefix, **kwargs)
+                if not topdown:
+                    # Report this directory's matches after all of its children
+                    stack.append((path, prefix, hits))
+                stack.extend((i, j, None) for i, j in reversed(subdirs))
+                if not topdown:
+                    continue
+
+            for hit in hits:
+                yield lead + hit
 
 
 def includes(pattern):
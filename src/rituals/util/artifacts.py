@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+""" Content-addressed cache for build artifacts.
+
+    Artifacts are stored under a key that is a hash of everything they're
+    built from, in a cache shared by all projects of the current user
+    (``~/.cache/rituals/artifacts``, or below ``$XDG_CACHE_HOME``).
+    Cached files are made read-only, and restored by reflink, hardlink,
+    or copy (in that order of preference). The least recently used
+    entries are removed when the cache grows beyond its size budget.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import io
+import os
+import sys
+import json
+import stat
+import time
+import shutil
+import hashlib
+import tempfile
+import sysconfig
+
+from munch import Munch as Bunch
+
+CACHE_VERSION = 1
+
+# Linux 'ioctl' to create a copy-on-write clone of a file
+FICLONE = 0x40049409
+
+
+def cache_home():
+    """Return the base directory of caches shared by all projects."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'rituals')
+
+
+def digest(*parts):
+    """Return a SHA-256 hex digest of `parts`, which must be serializable as JSON."""
+    data = json.dumps([CACHE_VERSION] + list(parts), sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def interpreter_tag():
+    """Return a string identifying the running interpreter's version, ABI, and platform."""
+    return '{}-{}-{}'.format(sys.implementation.cache_tag, getattr(sys, 'abiflags', ''), sysconfig.get_platform())
+
+
+def reflink(source, target):
+    """Create `target` as a copy-on-write clone of `source`, raising ``OSError`` if that's not supported."""
+    import fcntl
+
+    with io.open(source, 'rb') as src, io.open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def place_file(source, target, link=True):
+    """ Put a copy of the `source` file at `target`, replacing any existing file.
+
+        Uses a reflink if possible, else (with `link`) a hardlink, else a plain copy.
+    """
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        reflink(source, target)
+    except (OSError, ImportError):
+        if link:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(source, target)
+    shutil.copystat(source, target)
+
+
+class ArtifactCache():
+    """ Cache of artifact files in `root`, limited to `max_bytes` in total.
+
+        Each entry is a directory named after its key, holding the
+        artifact files and a ``meta.json``. The modification time of
+        that file records when the entry was last used.
+        A budget of zero disables the cache.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        """Whether artifacts are stored and restored at all."""
+        return self.max_bytes > 0
+
+    def path(self, key):
+        """Return the entry directory for `key`."""
+        return os.path.join(self.root, key[:2], key)
+
+    def meta(self, key):
+        """Return the metadata of the entry for `key`, or ``None`` if there is no complete entry."""
+        entry = self.path(key)
+        try:
+            with io.open(os.path.join(entry, 'meta.json'), 'r', encoding='utf-8') as handle:
+                meta = json.load(handle)
+        except (EnvironmentError, ValueError):
+            return None
+        if not all(os.path.isfile(os.path.join(entry, i)) for i in meta['files']):
+            return None
+        return meta
+
+    def __contains__(self, key):
+        return self.enabled and self.meta(key) is not None
+
+    def restore(self, key, target_dir):
+        """ Place the files cached under `key` into `target_dir`.
+
+            Returns the list of restored paths, or ``None`` on a cache miss.
+        """
+        if not self.enabled:
+            return None
+        meta = self.meta(key)
+        self.count('hits' if meta else 'misses')
+        if not meta:
+            return None
+
+        entry = self.path(key)
+        if not os.path.isdir(target_dir):
+            os.makedirs(target_dir)
+        result = []
+        for name in meta['files']:
+            result.append(os.path.join(target_dir, name))
+            place_file(os.path.join(entry, name), result[-1])
+        os.utime(os.path.join(entry, 'meta.json'))
+        return result
+
+    def store(self, key, paths, **info):
+        """ Cache copies of the files in `paths` under `key`.
+
+            Any keyword arguments are recorded in the entry's metadata.
+            Afterwards, the least recently used entries beyond the budget are removed.
+        """
+        if not self.enabled:
+            return
+        entry = self.path(key)
+        if not os.path.isdir(os.path.dirname(entry)):
+            os.makedirs(os.path.dirname(entry))
+
+        tmpdir = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(entry))
+        try:
+            names = []
+            for path in paths:
+                names.append(os.path.basename(path))
+                place_file(path, os.path.join(tmpdir, names[-1]), link=False)
+                os.chmod(os.path.join(tmpdir, names[-1]),
+                         os.stat(path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+            meta = dict(files=names, bytes=sum(os.path.getsize(i) for i in paths), created=time.time(), info=info)
+            with io.open(os.path.join(tmpdir, 'meta.json'), 'w', encoding='utf-8') as handle:
+                json.dump(meta, handle, indent=2, sort_keys=True)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry)
+            os.rename(tmpdir, entry)
+        except OSError:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+
+        self.evict()
+
+    def entries(self):
+        """Return a list of ``(last_used, size, key)`` tuples for all entries."""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for prefix in os.listdir(self.root):
+            if len(prefix) != 2 or not os.path.isdir(os.path.join(self.root, prefix)):
+                continue
+            for key in os.listdir(os.path.join(self.root, prefix)):
+                try:
+                    with io.open(os.path.join(self.root, prefix, key, 'meta.json'), 'r', encoding='utf-8') as handle:
+                        size = json.load(handle)['bytes']
+                    last_used = os.stat(os.path.join(self.root, prefix, key, 'meta.json')).st_mtime
+                except (EnvironmentError, ValueError, KeyError):
+                    continue  # incomplete entry, or one being replaced
+                result.append((last_used, size, key))
+        return result
+
+    def evict(self, max_bytes=None):
+        """Remove the least recently used entries beyond `max_bytes`, and return how many were removed."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total, removed = 0, 0
+        for _, size, key in sorted(self.entries(), reverse=True):
+            total += size
+            if total > max_bytes:
+                shutil.rmtree(self.path(key), ignore_errors=True)
+                removed += 1
+        return removed
+
+    def count(self, name):
+        """Increment the counter `name` in the cache statistics (races with other processes may lose counts)."""
+        counters = self.counters()
+        counters[name] = counters.get(name, 0) + 1
+        try:
+            if not os.path.isdir(self.root):
+                os.makedirs(self.root)
+            handle, tmpname = tempfile.mkstemp(prefix='.stats-', dir=self.root)
+            with io.open(handle, 'w', encoding='utf-8') as out:
+                json.dump(counters, out)
+            os.replace(tmpname, os.path.join(self.root, 'stats.json'))
+        except OSError:
+            pass  # statistics are nice to have, but not essential
+
+    def counters(self):
+        """Return the recorded hit and miss counters."""
+        try:
+            with io.open(os.path.join(self.root, 'stats.json'), 'r', encoding='utf-8') as handle:
+                return json.load(handle)
+        except (EnvironmentError, ValueError):
+            return {}
+
+    def stats(self):
+        """Return a ``Bunch`` with entry count, disk use, budget, hits, misses, and hit rate."""
+        entries = self.entries()
+        counters = self.counters()
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return Bunch(
+            root=self.root,
+            entries=len(entries),
+            bytes=sum(i[1] for i in entries),
+            max_bytes=self.max_bytes,
+            hits=hits,
+            misses=misses,
+            hit_rate=hits / float(hits + misses) if hits + misses else 0.0,
+        )
@@ -22,9 +22,17 @@
 #
 # The full LICENSE file and source are available at
 #    https://github.com/jhermann/rituals
+import io
+import os
 import re
+import ast
 import sys
+import copy
+import json
+import hashlib
+import importlib
 import subprocess
+import configparser
 from pathlib import Path
 from collections import defaultdict
 
@@ -33,15 +41,165 @@ from munch import Munch as Bunch
 from . import notify, shell
 from .. import config
 
+# Files the project metadata is built from
+META_INPUTS = ('setup.py', 'setup.cfg', 'pyproject.toml', 'LICENSE')
+META_EXTRA_INPUTS = (
+    'README.md', 'README.rst', 'requirements.txt', 'setup-requirements.txt', 'test-requirements.txt',
+    'classifiers.txt', 'project.d/classifiers.txt',
+)
+META_CACHE_NAME = 'project-meta.json'
+META_CACHE_VERSION = 1
+
+# Loaded metadata caches, by project root
+_META_MEMO = {}
+
+# Resolved versions and the timestamps of their inputs, by project root
+_VERSION_MEMO = {}
+
+
+def _fingerprint(path):
+    """Return ``[mtime_ns, size]`` of `path`, or ``None`` if it does not exist."""
+    try:
+        info = os.stat(str(path))
+    except OSError:
+        return None
+    return [info.st_mtime_ns, info.st_size]
+
+
+def _content_hash(path):
+    """Return a hash of the file content, or of the listing for a directory."""
+    try:
+        if path.is_dir():
+            names = sorted(i for i in os.listdir(str(path)) if not i.startswith('.') and i != '__pycache__')
+            data = '\0'.join(names).encode('utf-8')
+        else:
+            data = path.read_bytes()
+    except OSError:
+        return None
+    return hashlib.sha256(data).hexdigest()
+
+
+def _meta_inputs(root_dir, project):
+    """ Return relative paths of all files and directories that `project` is built from.
+
+        Besides the fixed candidates, this adds the package directories and
+        their ``__init__.py`` files, which ``setup.py`` often parses for metadata.
+    """
+    names = set(META_INPUTS + META_EXTRA_INPUTS)
+    base = (project.get('package_dir') or {}).get('', '')
+    if base:
+        names.add(base)
+    for package in project.get('packages', []):
+        if '.' not in package:
+            package = '/'.join(i for i in (base, package) if i)
+            names.update([package, package + '/__init__.py'])
+    for module in project.get('py_modules', []):
+        names.add('/'.join(i for i in (base, module + '.py') if i))
+    return {name: [_fingerprint(root_dir / name), _content_hash(root_dir / name)] for name in sorted(names)}
+
+
+def _meta_uptodate(root_dir, inputs):
+    """ Check the recorded `inputs`, with one ``stat`` call per unchanged file.
+
+        Files with a new timestamp but same content get their timestamp updated.
+        Returns a ``(uptodate, touched)`` tuple.
+    """
+    touched = False
+    for name, (stamp, digest) in inputs.items():
+        current = _fingerprint(root_dir / name)
+        if current == stamp:
+            continue
+        if current is None or stamp is None or _content_hash(root_dir / name) != digest:
+            return False, touched
+        inputs[name][0] = current
+        touched = True
+    return True, touched
+
+
+def _jsonable(project):
+    """Return a copy of `project` without values that cannot be stored as JSON (like ``cmdclass``)."""
+    def to_list(obj):
+        "Helper"
+        if isinstance(obj, type):
+            raise TypeError("Cannot serialize {!r}".format(obj))
+        return list(obj)
+
+    result = {}
+    for key, value in project.items():
+        try:
+            result[key] = json.loads(json.dumps(value, default=to_list))
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+def _save_meta_cache(cache_file, cached):
+    """Atomically write the metadata cache, ignoring read-only trees."""
+    try:
+        if not cache_file.parent.is_dir():
+            cache_file.parent.mkdir(parents=True)
+        with io.open(str(cache_file) + '.tmp', 'w', encoding='utf-8') as handle:
+            json.dump(cached, handle)
+        os.replace(str(cache_file) + '.tmp', str(cache_file))
+    except OSError as exc:
+        notify.warning("Cannot write project metadata cache: {}".format(exc))
+
 
 def project_meta(project_root=None):
     """ Read and return all project metadata.
+
+        Results are kept in memory, and in ``build/.rituals/project-meta.json``.
+        They are re-used as long as the input files (``setup.py``, ``LICENSE``,
+        package ``__init__.py`` files, and so on) are unchanged.
+        Values that cannot be stored as JSON (like ``cmdclass``) are left out.
+    """
+    root_dir = Path(project_root or config.get_project_root() or '.').resolve()
+    cache_file = root_dir / config.DEFAULTS['cachedir'] / META_CACHE_NAME
+
+    cached = _META_MEMO.get(str(root_dir))
+    if cached is None:
+        try:
+            with io.open(str(cache_file), 'r', encoding='utf-8') as handle:
+                cached = json.load(handle)
+        except (EnvironmentError, ValueError):
+            pass
+        else:
+            if cached.get('version') != META_CACHE_VERSION:
+                cached = None
+
+    uptodate = False
+    if cached:
+        uptodate, touched = _meta_uptodate(root_dir, cached['inputs'])
+        if touched:
+            _save_meta_cache(cache_file, cached)
+    if not uptodate:
+        project = _jsonable(_load_project_meta(root_dir, reload=cached is not None))
+        cached = dict(version=META_CACHE_VERSION, inputs=_meta_inputs(root_dir, project), project=project)
+        _save_meta_cache(cache_file, cached)
+
+    _META_MEMO[str(root_dir)] = cached
+    return Bunch(copy.deepcopy(cached['project']))
+
+
+def project_inputs(project_root=None):
+    """Return the paths of all existing files the project metadata is built from."""
+    root_dir = Path(project_root or config.get_project_root() or '.').resolve()
+    project_meta(str(root_dir))
+    inputs = _META_MEMO[str(root_dir)]['inputs']
+    return [str(root_dir / name) for name, (stamp, _) in sorted(inputs.items()) if stamp is not None]
+
+
+def _load_project_meta(root_dir, reload=False):
+    """ Read and return all project metadata from the build configuration.
+
+        With `reload`, an already imported ``setup`` module is executed again.
     """
-    root_dir = Path(project_root or config.get_project_root() or '.')
     if (root_dir / 'setup.py').exists():
         # this assumes an importable setup.py
-        if root_dir not in sys.path:
-            sys.path.append(root_dir)
+        if str(root_dir) not in sys.path:
+            sys.path.append(str(root_dir))
+        if reload and 'setup' in sys.modules:
+            importlib.reload(sys.modules['setup'])
         try:
             from setup import project # pylint: disable=no-name-in-module
         except ImportError:
@@ -88,15 +246,125 @@ def project_meta(project_root=None):
     return project
 
 
-def project_version():
-    """ Determine project version.
+def _ast_version(filename):
+    """Return the string assigned to ``__version__`` in `filename`, or ``None``."""
+    try:
+        tree = ast.parse(Path(filename).read_bytes(), str(filename))
+    except (OSError, SyntaxError, ValueError):
+        return None
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(i, 'id', None) == '__version__' for i in node.targets):
+            try:
+                return str(ast.literal_eval(node.value))
+            except ValueError:
+                return None
+    return None
+
+
+def _module_file(root_dir, module):
+    """Find the source file of a dotted `module` name in the project."""
+    parts = module.split('.')
+    for base in (root_dir / 'src', root_dir):
+        for path in (base.joinpath(*parts) / '__init__.py', base.joinpath(*parts[:-1]) / (parts[-1] + '.py')):
+            if path.exists():
+                return path
+    return None
+
+
+def _static_version(root_dir):
+    """ Find the version in static project files, without running any code
+        except an importable ``setup.py`` (via the cached project metadata).
+
+        Returns the version (or ``None``) and the list of files it depends on.
     """
-    root_dir = Path(config.get_project_root() or '.')
+    inputs = ['setup.cfg', 'pyproject.toml', 'setup.py']
+
+    setup_cfg = configparser.ConfigParser()
+    try:
+        setup_cfg.read(str(root_dir / 'setup.cfg'), encoding='utf-8')
+    except configparser.Error:
+        pass
+    version = setup_cfg.get('metadata', 'version', fallback='').strip()
+    if version.startswith('attr:'):
+        module, _, attr = version[5:].strip().rpartition('.')
+        filename = _module_file(root_dir, module) if attr == '__version__' else None
+        version = None
+        if filename:
+            version = _ast_version(filename)
+            inputs.append(str(filename.relative_to(root_dir)))
+    elif version.startswith('file:'):
+        filename = version[5:].split(',')[0].strip()
+        inputs.append(filename)
+        try:
+            version = (root_dir / filename).read_text(encoding='utf-8').strip()
+        except OSError:
+            version = None
+    if version:
+        return version, inputs
+
+    if (root_dir / 'pyproject.toml').exists():
+        import toml
+
+        pyproject = toml.load(str(root_dir / 'pyproject.toml'))
+        version = pyproject.get('project', {}).get('version') or pyproject.get('tool', {}).get('poetry', {}).get('version')
+        if version:
+            return version, inputs
+
     if (root_dir / 'setup.py').exists():
-        return shell.capture('python setup.py --version')
+        try:
+            version = project_meta(str(root_dir)).get('version')
+        except Exception as exc:  # pylint: disable=broad-except
+            notify.warning("Cannot load project metadata: {}".format(exc))
+        else:
+            inputs.extend(_META_MEMO[str(root_dir)]['inputs'])
+            if version:
+                return version, inputs
+
+    for init_py in sorted(root_dir.glob('src/*/__init__.py')) + sorted(root_dir.glob('*/__init__.py')):
+        version = _ast_version(init_py)
+        if version:
+            inputs.append(str(init_py.relative_to(root_dir)))
+            return version, inputs
+
+    return None, inputs
+
+
+def _normalized_version(version):
+    """Normalize `version` like setuptools does, if ``packaging`` is available."""
+    try:
+        from packaging.version import Version, InvalidVersion
+    except ImportError:
+        return version
+    try:
+        return str(Version(version))
+    except InvalidVersion:
+        return version
+
+
+def project_version(project_root=None):
+    """ Determine project version.
+
+        The version is read from ``setup.cfg``, ``pyproject.toml``,
+        the project metadata, or a ``__version__`` assignment in a package.
+        ``setup.py --version`` is only called if all of that fails.
+        Results are memoized until one of the files they depend on changes.
+    """
+    root_dir = Path(project_root or config.get_project_root() or '.').resolve()
+    memo = _VERSION_MEMO.get(str(root_dir))
+    if memo and all(_fingerprint(root_dir / name) == stamp for name, stamp in memo[0].items()):
+        return memo[1]
+
+    version, inputs = _static_version(root_dir)
+    if version:
+        version = _normalized_version(version)
+    elif (root_dir / 'setup.py').exists():
+        version = shell.capture('python setup.py --version')
     else:
         raise NotImplementedError()
 
+    _VERSION_MEMO[str(root_dir)] = ({name: _fingerprint(root_dir / name) for name in inputs}, version)
+    return version
+
 
 def build(run=subprocess.check_call):
     """ Build a project.
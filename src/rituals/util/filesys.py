@@ -21,15 +21,43 @@
 #    https://github.com/jhermann/rituals
 from __future__ import absolute_import, unicode_literals, print_function
 
+import io
 import os
 import re
+import sys
+import json
+import stat
+import time
+import shutil
+import hashlib
 import tempfile
-from contextlib import contextmanager
-
-import requests
+import subprocess
+from contextlib import contextmanager, closing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
+from . import notify
 from ._compat import urlparse, decode_filename
+from .artifacts import cache_home
+
+# Directory below a project root holding things to be removed in the background
+TRASH_DIR = '.rituals-trash'
+
+# Seconds to wait for a connection, and for data, when downloading
+DOWNLOAD_TIMEOUT = (10, 60)
+
+# Background removal of trash batches
+PURGE_SCRIPT = """
+import sys, shutil
+for path in sys.argv[1:]:
+    shutil.rmtree(path, ignore_errors=True)
+"""
 
+# Can removals be done relative to open directory handles?
+FD_REMOVAL = (
+    {os.open, os.stat, os.unlink, os.rmdir} <= os.supports_dir_fd
+    and os.scandir in os.supports_fd
+)
 
 
 def pretty_path(path, _home_re=re.compile('^' + re.escape(os.path.expanduser('~') + os.sep))):
@@ -53,15 +81,305 @@ def pushd(path):
         os.chdir(saved)
 
 
+def _remove_tree(path, dir_fd=None):
+    """ Recursively remove directory `path` (relative to `dir_fd`, if given).
+
+        Returns the number of removed files and their total size.
+    """
+    count = size = 0
+    handle = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=dir_fd) if FD_REMOVAL else path
+    try:
+        with os.scandir(handle) as listing:
+            entries = list(listing)
+        for entry in entries:
+            name = entry.name if FD_REMOVAL else entry.path
+            parent_fd = handle if FD_REMOVAL else None
+            if entry.is_dir(follow_symlinks=False):
+                subcount, subsize = _remove_tree(name, parent_fd)
+                count, size = count + subcount, size + subsize
+            else:
+                size += entry.stat(follow_symlinks=False).st_size
+                os.unlink(name, dir_fd=parent_fd)
+                count += 1
+    finally:
+        if FD_REMOVAL:
+            os.close(handle)
+    os.rmdir(path, dir_fd=dir_fd)
+
+    return count, size
+
+
+def _remove_batch(dirpath, names):
+    """ Remove the given `names` (files or directories) from `dirpath`.
+
+        Returns the number of removed files and their total size.
+    """
+    count = size = 0
+    dir_fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY) if FD_REMOVAL else None
+    try:
+        for name in names:
+            path = name if FD_REMOVAL else os.path.join(dirpath, name)
+            try:
+                info = os.stat(path, dir_fd=dir_fd, follow_symlinks=False)
+                if stat.S_ISDIR(info.st_mode):
+                    subcount, subsize = _remove_tree(path, dir_fd)
+                    count, size = count + subcount, size + subsize
+                else:
+                    os.unlink(path, dir_fd=dir_fd)
+                    count, size = count + 1, size + info.st_size
+            except FileNotFoundError:
+                pass  # gone already
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+
+    return count, size
+
+
+def remove_files(root, names, workers=None):
+    """ Remove files and directories given relative to `root`.
+
+        Directory names may carry a trailing slash, and are removed recursively.
+        The names are grouped by their parent directory, and those batches are
+        processed on a pool of `workers` threads (by default, as many as
+        `ThreadPoolExecutor` chooses).
+
+        Returns a ``(count, size)`` tuple of removed files and freed bytes.
+    """
+    batches = defaultdict(list)
+    for name in names:
+        parent, _, basename = name.rstrip('/').rpartition('/')
+        batches[os.path.join(root, parent) if parent else root].append(basename)
+
+    count = size = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for subcount, subsize in pool.map(lambda batch: _remove_batch(*batch), batches.items()):
+            count, size = count + subcount, size + subsize
+
+    return count, size
+
+
+def _usage(path):
+    """Return number of files and their total size for the given file or directory."""
+    try:
+        info = os.stat(path, follow_symlinks=False)
+    except FileNotFoundError:
+        return 0, 0
+    if not stat.S_ISDIR(info.st_mode):
+        return 1, info.st_size
+
+    count = size = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        count, size = count + 1, size + entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass  # unreadable or vanished
+    return count, size
+
+
+def disk_usage(root, names, workers=None):
+    """ Determine file counts and sizes for files and directories given relative to `root`.
+
+        Every file is looked at exactly once, using the `stat` data of a
+        directory scan where possible, on a pool of `workers` threads.
+
+        Returns a list of ``(count, size)`` tuples, in the order of `names`.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda name: _usage(os.path.join(root, name.rstrip('/'))), names))
+
+
+def move_to_trash(root, names, trash=TRASH_DIR):
+    """ Move the given directories (relative to `root`) into a new trash batch.
+
+        A rename within the same file system is atomic and costs the same for
+        any tree size, the real removal is done later by `purge_trash`.
+
+        Returns the names that could *not* be moved (e.g. mount points).
+    """
+    trash_root = os.path.join(root, trash)
+    os.makedirs(trash_root, exist_ok=True)
+    batch = tempfile.mkdtemp(prefix='{}-'.format(os.getpid()), dir=trash_root)
+
+    failed = []
+    for idx, name in enumerate(names):
+        target = os.path.join(batch, '{:05d}-{}'.format(idx, os.path.basename(name.rstrip('/'))))
+        try:
+            os.rename(os.path.join(root, name.rstrip('/')), target)
+        except OSError:
+            failed.append(name)
+
+    return failed
+
+
+def purge_trash(root, trash=TRASH_DIR):
+    """ Remove all trash batches below `root` in a detached background process.
+
+        This includes stale batches left over by interrupted purges.
+        Returns the number of batches handed over for removal.
+    """
+    trash_root = os.path.join(root, trash)
+    try:
+        batches = [os.path.join(trash_root, i) for i in sorted(os.listdir(trash_root))]
+    except FileNotFoundError:
+        batches = []
+
+    if batches:
+        subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, '-c', PURGE_SCRIPT] + batches,
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            close_fds=True, start_new_session=True,
+        )
+
+    return len(batches)
+
+
+def append_file(out_fd, filename):
+    """ Append the content of `filename` to the file opened as `out_fd`, returning the number of bytes copied.
+
+        The data is copied within the kernel, using ``os.copy_file_range`` or
+        ``os.sendfile``. If neither works for the given files, a buffered copy is made.
+    """
+    with io.open(filename, 'rb') as handle:
+        in_fd = handle.fileno()
+        size = os.fstat(in_fd).st_size
+        offset = 0
+        for method in ('copy_file_range', 'sendfile'):
+            if not hasattr(os, method):
+                continue
+            try:
+                while offset < size:
+                    if method == 'copy_file_range':
+                        copied = os.copy_file_range(in_fd, out_fd, size - offset, offset)
+                    else:
+                        copied = os.sendfile(out_fd, in_fd, offset, size - offset)
+                    if not copied:
+                        break  # file was truncated meanwhile
+                    offset += copied
+                return offset
+            except OSError:
+                continue  # not supported for these files, go on with the next method
+
+        handle.seek(offset)
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(out_fd, view):]
+            offset += len(chunk)
+        return offset
+
+
+def download_cache_dir():
+    """ Return the default directory of the persistent download cache.
+
+        That is ``downloads`` below ``$INVOKE_RITUALS_CACHE_DIR``,
+        or else below ``~/.cache/rituals`` (respecting ``$XDG_CACHE_HOME``).
+        Tasks use :func:`rituals.acts.cache.downloads` instead,
+        which also honours the ``rituals.cache.dir`` setting.
+    """
+    return os.path.join(os.path.expanduser(os.environ.get('INVOKE_RITUALS_CACHE_DIR') or cache_home()), 'downloads')
+
+
+def cached_download(url, sha256=None, cache_dir=None):
+    """ Download `url` into the persistent download cache, and return the cached file's path.
+
+        Cached files are revalidated using their ``ETag`` and ``Last-Modified``
+        headers, and only downloaded again when they changed on the server.
+        Given an expected `sha256` hex digest, downloads are verified, and a
+        matching cached file is used without asking the server at all.
+        If the server cannot be reached or does not respond in time
+        (see ``DOWNLOAD_TIMEOUT``), a cached file is used as-is.
+
+        Cached files are read-only, and must not be changed.
+
+        Raises:
+            requests.RequestException: Base exception of ``requests``, see its
+                docs for more detailed ones.
+            ValueError: If the content does not match `sha256`.
+    """
+    import requests
+
+    entry = os.path.join(cache_dir or download_cache_dir(), hashlib.sha256(url.encode('utf-8')).hexdigest())
+    data_file = os.path.join(entry, 'data')
+    meta_file = os.path.join(entry, 'meta.json')
+    try:
+        with io.open(meta_file, 'r', encoding='utf-8') as handle:
+            meta = json.load(handle)
+    except (EnvironmentError, ValueError):
+        meta = None
+    if meta and not os.path.exists(data_file):
+        meta = None
+    sha256 = sha256.lower() if sha256 else None
+    if meta and sha256 and meta['sha256'] == sha256:
+        return data_file
+
+    headers = {}
+    if meta and meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta and meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        reply = requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+    except (requests.ConnectionError, requests.Timeout) as exc:
+        if not meta:
+            raise
+        notify.warning("Using cached download of '{}', since the server is not responding ({})".format(url, exc))
+        reply = None
+
+    if reply is None or reply.status_code == 304:
+        if reply is not None:
+            reply.close()
+        if sha256 and meta['sha256'] != sha256:
+            raise ValueError("SHA-256 of '{}' is {}, expected {}".format(url, meta['sha256'], sha256))
+        return data_file
+
+    with closing(reply):
+        reply.raise_for_status()
+        if not os.path.isdir(entry):
+            os.makedirs(entry)
+        digest = hashlib.sha256()
+        handle, tmpname = tempfile.mkstemp(prefix='.tmp-', dir=entry)
+        try:
+            with io.open(handle, 'wb') as out:
+                for chunk in reply.iter_content(1 << 16):
+                    digest.update(chunk)
+                    out.write(chunk)
+            if sha256 and digest.hexdigest() != sha256:
+                raise ValueError("SHA-256 of '{}' is {}, expected {}".format(url, digest.hexdigest(), sha256))
+            os.chmod(tmpname, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmpname, data_file)
+        except BaseException:
+            os.remove(tmpname)
+            raise
+
+    meta = dict(url=url, etag=reply.headers.get('ETag'), last_modified=reply.headers.get('Last-Modified'),
+                sha256=digest.hexdigest(), fetched=time.time())
+    handle, tmpname = tempfile.mkstemp(prefix='.tmp-', dir=entry)
+    with io.open(handle, 'w', encoding='utf-8') as out:
+        json.dump(meta, out)
+    os.replace(tmpname, meta_file)
+    return data_file
+
+
 # Copied from "rudiments.www"
 @contextmanager
-def url_as_file(url, ext=None):
+def url_as_file(url, ext=None, sha256=None, cache_dir=None):
     """
         Context manager that GETs a given `url` and provides it as a local file.
 
         The file is in a closed state upon entering the context,
         and removed when leaving it, if still there.
 
+        Remote URLs are fetched via :func:`cached_download`, and the file
+        then is a read-only hardlink to the cached copy, in a temporary
+        directory within `cache_dir`.
+
         To give the file name a specific extension, use `ext`;
         the extension can optionally include a separating dot,
         otherwise it will be added.
@@ -69,6 +387,9 @@ def url_as_file(url, ext=None):
         Parameters:
             url (str): URL to retrieve.
             ext (str, optional): Extension for the generated filename.
+            sha256 (str, optional): Expected SHA-256 hex digest of a remote file.
+            cache_dir (str, optional): Download cache directory, default
+                is :func:`download_cache_dir`.
 
         Yields:
             str: The path to a temporary file with the content of the URL.
@@ -81,25 +402,41 @@ def url_as_file(url, ext=None):
             >>> import io, re, json
             >>> with url_as_file('https://api.github.com/meta', ext='json') as meta:
             ...     meta, json.load(io.open(meta, encoding='ascii'))['hooks']
-            (u'/tmp/www-api.github.com-Ba5OhD.json', [u'192.30.252.0/22'])
+            (u'/home/me/.cache/rituals/downloads/.tmp-Ba5OhD/www-api.github.com.json', [u'192.30.252.0/22'])
     """
     if ext:
         ext = '.' + ext.strip('.')  # normalize extension
     url_hint = 'www-{}-'.format(urlparse(url).hostname or 'any')
 
+    link_dir = None
     if url.startswith('file://'):
         url = os.path.abspath(url[len('file://'):])
     if os.path.isabs(url):
         with open(url, 'rb') as handle:
             content = handle.read()
+        with tempfile.NamedTemporaryFile(suffix=ext or '', prefix=url_hint, delete=False) as handle:
+            handle.write(content)
+        filename = handle.name
     else:
-        content = requests.get(url).content
-
-    with tempfile.NamedTemporaryFile(suffix=ext or '', prefix=url_hint, delete=False) as handle:
-        handle.write(content)
+        cache_dir = cache_dir or download_cache_dir()
+        cached = cached_download(url, sha256=sha256, cache_dir=cache_dir)
+        # Linked in a private directory next to the cache entries, so it's on the same file system
+        link_dir = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+        filename = os.path.join(link_dir, url_hint.rstrip('-') + (ext or ''))
+        try:
+            os.link(cached, filename)
+        except OSError:
+            os.rmdir(link_dir)
+            link_dir = None
+            with tempfile.NamedTemporaryFile(suffix=ext or '', prefix=url_hint, delete=False) as handle:
+                with io.open(cached, 'rb') as data:
+                    shutil.copyfileobj(data, handle)
+            filename = handle.name
 
     try:
-        yield handle.name
+        yield filename
     finally:
-        if os.path.exists(handle.name):
-            os.remove(handle.name)
+        if os.path.exists(filename):
+            os.remove(filename)
+        if link_dir:
+            os.rmdir(link_dir)
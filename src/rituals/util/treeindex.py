@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+""" Persistent snapshots of a project's file tree.
+
+    A snapshot records the listing and modification time of each directory,
+    plus modification time, size, and inode of each file. Listings of
+    directories with an unchanged modification time are taken from the
+    snapshot, so added and removed files are found without reading them
+    again. See also ``antglob.FileSet.from_index``.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+import io
+import json
+import time
+import threading
+
+from munch import Munch as Bunch
+
+from .antglob import scan_entries
+
+SNAPSHOT_VERSION = 1
+
+# Directories never indexed
+SKIP_DIRS = {'.git', '.hg', '.svn'}
+
+
+class TreeIndex():
+    """ File tree snapshot below `root`, stored in `filename`.
+
+        The built-in tasks do not use an index yet; a project's own tasks
+        can keep one in the cache directory, e.g. at ``cfg.cachejoin('treeindex.json')``,
+        and pass it to `antglob.FileSet.from_index`.
+    """
+
+    # Directories modified less than this many seconds before they were read
+    # are not trusted, since later changes might not advance the timestamp
+    racy_secs = 2
+
+    def __init__(self, root, filename):
+        self.root = root
+        self.filename = filename
+        self.dirs = {}   # relative dir path with trailing slash ('' for root) → [mtime_ns, entries]
+        self.files = {}  # relative file path → [mtime_ns, size, inode]
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Read the snapshot file, if there is a valid one."""
+        try:
+            with io.open(self.filename, 'r', encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (EnvironmentError, ValueError):
+            return False
+
+        if data.get('version') != SNAPSHOT_VERSION or data.get('root') != self.root:
+            return False
+        self.dirs = data['dirs']
+        self.files = data['files']
+        return True
+
+    def save(self):
+        """Atomically write the snapshot file."""
+        dirname = os.path.dirname(self.filename)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with self._lock:
+            data = dict(version=SNAPSHOT_VERSION, root=self.root, dirs=self.dirs, files=self.files)
+            with io.open(self.filename + '.tmp', 'w', encoding='utf-8') as handle:
+                json.dump(data, handle, separators=(',', ':'))
+        os.replace(self.filename + '.tmp', self.filename)
+
+    def listdir(self, path, prefix):
+        """ Return ``(name, is_dir, is_link)`` tuples for directory `path`.
+
+            `prefix` is the path relative to the root, with a trailing slash.
+            The recorded listing is used if the directory is unchanged.
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self.dirs.pop(prefix, None)
+            raise
+
+        cached = self.dirs.get(prefix)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        entries = scan_entries(path)
+        if time.time() - mtime / 1e9 < self.racy_secs:
+            mtime = None  # read again next time
+        with self._lock:
+            self.dirs[prefix] = [mtime, entries]
+        return entries
+
+    def refresh(self, check_files=True):
+        """ Update the snapshot to the current state of the tree.
+
+            Only directories with a changed modification time are read. If
+            `check_files` is false, no `stat` calls are made for files already
+            recorded, so only additions and removals are detected.
+
+            Returns a ``Bunch`` with sorted lists of ``added``, ``changed``
+            and ``removed`` file paths.
+        """
+        old_files, files, dirs = self.files, {}, set()
+        added, changed = [], []
+        stack = ['']
+        while stack:
+            prefix = stack.pop()
+            try:
+                entries = self.listdir(os.path.join(self.root, prefix), prefix)
+            except OSError:
+                continue
+            dirs.add(prefix)
+
+            for name, is_dir, is_link in entries:
+                relpath = prefix + name
+                if is_dir and not is_link:
+                    if name not in SKIP_DIRS:
+                        stack.append(relpath + '/')
+                    continue
+
+                record = old_files.get(relpath)
+                if record is None or check_files:
+                    try:
+                        info = os.lstat(os.path.join(self.root, relpath))
+                    except OSError:
+                        continue
+                    current = [info.st_mtime_ns, info.st_size, info.st_ino]
+                    if record is None:
+                        added.append(relpath)
+                    elif current != record:
+                        changed.append(relpath)
+                    record = current
+                files[relpath] = record
+
+        with self._lock:
+            self.files = files
+            self.dirs = {k: v for k, v in self.dirs.items() if k in dirs}
+
+        return Bunch(
+            added=sorted(added),
+            changed=sorted(changed),
+            removed=sorted(set(old_files) - set(files)),
+        )
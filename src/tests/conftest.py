@@ -25,14 +25,54 @@
 #    https://github.com/jhermann/rituals
 from __future__ import absolute_import, unicode_literals, print_function
 
+import os
 import logging
+import threading
+from http.server import ThreadingHTTPServer
 
 import pytest
 
 
+def pytest_configure(config):
+    """Register custom markers."""
+    config.addinivalue_line('markers', "benchmark: timing test, only run with RITUALS_BENCHMARK=1 in the environment")
+
+
+def pytest_collection_modifyitems(config, items):  # pylint: disable=unused-argument
+    """Skip benchmarks, unless requested."""
+    if os.environ.get('RITUALS_BENCHMARK', '0') not in ('', '0'):
+        return
+    skip = pytest.mark.skip(reason="benchmark, set RITUALS_BENCHMARK=1 to run it")
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
 # Globally available fixtures
 @pytest.fixture(scope='session')
 def logger():
     """Test logger instance as a fixture."""
     logging.basicConfig(level=logging.DEBUG)
     return logging.getLogger('tests')
+
+
+@pytest.fixture
+def http_server():
+    """ Factory for local HTTP servers, running in a background thread.
+
+        Call it with a request handler class, to get the base URL of a new server.
+        Logging of requests is disabled, and all servers are shut down after the test.
+    """
+    servers = []
+
+    def serve(handler):
+        "Start a server for `handler`."
+        quiet = type(handler.__name__, (handler,), dict(log_message=lambda *_: None))
+        servers.append(ThreadingHTTPServer(('127.0.0.1', 0), quiet))
+        threading.Thread(target=servers[-1].serve_forever, daemon=True).start()
+        return 'http://127.0.0.1:{}'.format(servers[-1].server_port)
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -22,9 +22,39 @@
 #    https://github.com/jhermann/rituals
 from __future__ import absolute_import, unicode_literals, print_function
 
+import os
+import json
 #import unittest
 
 #import pytest
+from munch import Munch as Bunch
 
 import tasks  # pylint: disable=unused-import
 from rituals.acts import basic
+from rituals.util.antglob import FileSet
+
+
+def test_clean_report_aggregates_by_deciding_pattern():
+    fileset = FileSet('/tmp', ['build/', '**/*.pyc', 'dist/'])
+    names = ['build/', 'a/x.pyc', 'b/y.pyc']
+    summary = basic.clean_report(fileset, names, [(3, 300), (1, 10), (1, 20)], dry_run=True)
+
+    assert summary['dry_run'] is True
+    assert (summary['files'], summary['bytes']) == (5, 330)
+    assert [i['pattern'] for i in summary['patterns']] == ['build/', '**/*.pyc']
+    assert summary['patterns'][1]['files'] == 2
+    assert summary['patterns'][1]['bytes'] == 30
+    assert [i['path'] for i in summary['patterns'][1]['paths']] == ['a/x.pyc', 'b/y.pyc']
+
+
+def test_clean_json_implies_dry_run(tmpdir, monkeypatch, capsys):
+    root = str(tmpdir)
+    tmpdir.mkdir('build').join('out.txt').write('x' * 42)
+    monkeypatch.setattr(basic.config, 'load', lambda: Bunch(
+        project_root=root, srcjoin=lambda *names: os.path.join(root, 'src', *names)))
+    basic.clean.body(None, json_=True)
+
+    summary = json.loads(capsys.readouterr().out)
+    assert summary['dry_run'] is True
+    assert (summary['files'], summary['bytes']) == (1, 42)
+    assert os.path.exists(os.path.join(root, 'build', 'out.txt'))
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wildcard-import, missing-docstring, redefined-outer-name, invalid-name, no-self-use
+""" Tests for `rituals.acts.executor`.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+
+import pytest
+from invoke.config import Config
+from invoke.context import Context
+
+from rituals.acts import Collection, task, executor
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    monkeypatch.setattr(executor, 'CALLED', [])
+    calls = []
+
+    @task
+    def clean(_, all=False):  # pylint: disable=redefined-builtin
+        calls.append(('clean', all))
+
+    @task
+    def build(_, docs=False):
+        calls.append(('build', docs))
+
+    @task(pre=[clean])
+    def test(_):
+        calls.append(('test',))
+
+    @task
+    def dist(ctx):
+        executor.invoke_tasks(ctx, 'clean --all build test', collection=namespace)
+        calls.append(('dist',))
+
+    @task
+    def prep(ctx):
+        executor.invoke_tasks(ctx, 'clean --all build dist', collection=namespace)
+
+    namespace = Collection(clean, build, test, dist, prep)
+    return namespace, calls
+
+
+def test_task_chain_runs_in_process(chain):
+    namespace, calls = chain
+    results = executor.invoke_tasks(Context(config=Config()), 'clean build --docs', collection=namespace)
+    assert calls == [('clean', False), ('build', True)]
+    assert set(results) == {namespace['clean'], namespace['build']}
+
+
+def test_task_chain_runs_each_call_once(chain):
+    namespace, calls = chain
+    executor.invoke_tasks(Context(config=Config()), 'prep', collection=namespace)
+    assert calls == [('clean', True), ('build', False), ('clean', False), ('test',), ('dist',)], \
+        "nested calls with the same arguments are skipped, pre-tasks are expanded"
+
+
+def test_task_chain_fills_in_defaults_before_comparing(chain):
+    namespace, calls = chain
+    executor.invoke_tasks(Context(config=Config()), 'clean test', collection=namespace)
+    assert calls == [('clean', False), ('test',)], "pre-task call equals the parsed one"
+
+
+def test_task_chain_dedupe_is_limited_to_one_dag(chain):
+    namespace, calls = chain
+    executor.mark_called(namespace['build'], {})  # from the command line
+    executor.invoke_tasks(Context(config=Config()), 'clean build', collection=namespace)
+    executor.invoke_tasks(Context(config=Config()), 'clean', collection=namespace)
+    assert calls == [('clean', False), ('clean', False)]
+    assert not executor.was_called(namespace['clean'], {}), "DAG calls are forgotten afterwards"
+
+
+def test_lazy_tasks_are_marked_as_called(monkeypatch):
+    from rituals.acts import lazy, basic
+
+    monkeypatch.setattr(executor, 'CALLED', [])
+    monkeypatch.setattr(basic.shell, 'run', lambda *_, **__: None)
+    lazy_help = lazy.lazy_collection('basic').tasks['help']
+    lazy_help(Context(config=Config()))
+    assert executor.was_called(lazy_help, {})
+    assert executor.was_called(basic.help, {}), "real and lazy task are the same"
+
+
+def test_parallel_commands_fail_fast():
+    import io
+    import sys
+
+    output = io.StringIO()
+    results = executor.run_parallel(dict(
+        ok=[sys.executable, '-c', 'print("one"); print("two")'],
+        bad=[sys.executable, '-c', 'import time, sys; time.sleep(0.2); sys.exit(3)'],
+        slow=[sys.executable, '-c', 'import time; time.sleep(30)'],
+    ), output=output)
+    assert list(results)[-2:] == ['bad', 'slow'], "failure comes before the terminated command"
+    assert results['ok'] == 0 and results['bad'] == 3 and results['slow'] < 0
+    assert '[ok] one\n[ok] two\n' in output.getvalue()
+
+
+def test_parallel_task_runs_named_tasks(chain, monkeypatch):
+    namespace, _ = chain
+    commands = []
+    monkeypatch.setattr(executor, 'get_namespace', lambda: namespace)
+    monkeypatch.setattr(executor, 'run_parallel', lambda cmds: commands.append(cmds) or {i: 0 for i in cmds})
+
+    both = executor.parallel(namespace['clean'], namespace['test'])
+    both(Context(config=Config()))
+    assert sorted(commands[0]) == ['clean', 'test']
+    assert commands[0]['test'][-2:] == ['invoke', 'test']
+
+    monkeypatch.setattr(executor, 'run_parallel', lambda cmds: dict(test=2, clean=-15))
+    with pytest.raises(executor.exceptions.Exit) as exc:
+        both(Context(config=Config()))
+    assert exc.value.code == 2
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason="needs procfs")
+def test_parallel_commands_stop_child_processes():
+    import io
+    import sys
+    import time
+
+    started = time.time()
+    output = io.StringIO()
+    results = executor.run_parallel(dict(
+        bad=[sys.executable, '-c', 'import time, sys; time.sleep(0.5); sys.exit(1)'],
+        nested=[sys.executable, '-c', 'import subprocess, sys; child = subprocess.Popen([sys.executable, "-c",'
+                ' "import time; time.sleep(8)"]); print(child.pid); child.wait()'],
+    ), output=output)
+    assert time.time() - started < 5, "output pipe held by grandchild is not waited for"
+    assert results['bad'] == 1 and results['nested'] < 0
+
+    def alive(pid):
+        try:
+            with open('/proc/{}/stat'.format(pid)) as handle:
+                return handle.read().rsplit(')', 1)[1].split()[0] != 'Z'  # zombies are dead, but not reaped
+        except IOError:
+            return False
+
+    grandchild = int(output.getvalue().split('[nested] ')[1].split()[0])
+    for _ in range(20):
+        if not alive(grandchild):
+            break
+        time.sleep(0.1)
+    assert not alive(grandchild), "grandchild is killed too"
+
+
+# Ignores SIGTERM, and fills its output pipe once the other command failed
+SPAMMER = ('import signal, sys, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(1)\n'
+           'for _ in range({}): sys.stdout.write("x" * 1000 + "\\n")\n'
+           'sys.exit(3)')
+
+
+def test_stopped_parallel_commands_are_drained():
+    import io
+    import sys
+
+    results = executor.run_parallel(dict(
+        bad=[sys.executable, '-c', 'import time, sys; time.sleep(0.5); sys.exit(1)'],
+        spammer=[sys.executable, '-c', SPAMMER.format(2000)],
+    ), output=io.StringIO())
+    assert results == dict(bad=1, spammer=3), "stopped command that ignores SIGTERM can still finish"
+
+
+def test_stopped_parallel_commands_are_killed_after_grace_period(monkeypatch):
+    import io
+    import sys
+    import time
+
+    monkeypatch.setattr(executor, 'STOP_GRACE_SECS', 0.5)
+    started = time.time()
+    results = executor.run_parallel(dict(
+        bad=[sys.executable, '-c', 'import time, sys; time.sleep(0.5); sys.exit(1)'],
+        spammer=[sys.executable, '-c', SPAMMER.format(10 ** 9)],
+    ), output=io.StringIO())
+    assert results == dict(bad=1, spammer=-9)
+    assert time.time() - started < 5
@@ -22,11 +22,14 @@
 #    https://github.com/jhermann/rituals
 from __future__ import absolute_import, unicode_literals, print_function
 
+import os
+import json
 import unittest
 
-#import pytest
+import pytest
 from munch import Munch as Bunch
 from invoke.context import Context
+from invoke.runners import Result
 
 import tasks  # pylint: disable=unused-import
 from rituals.acts import inspection
@@ -71,3 +74,114 @@ class PylintTest(unittest.TestCase):
     def test_pylint_report_can_be_activated(self):
         parts = self.call_pylint(reports=True)
         assert '--reports=y' in parts, "no pylint reports by default"
+
+
+class PylintRunner(object):
+    """Fake runner returning canned JSON messages for the checked files."""
+
+    def __init__(self, messages, exits=None):
+        self.messages = messages
+        self.exits = exits or {}
+        self.checked = []
+
+    def __call__(self, command, **kwargs):
+        files = [i.strip('"') for i in command.split() if i.endswith('.py"')]
+        self.checked.append(sorted(files))
+        reported = [i for i in self.messages if i['path'] in files]
+        exited = 0
+        for filename in files:
+            exited |= self.exits.get(filename, 0)
+        return Result(command=command, stdout=json.dumps(reported), exited=exited)
+
+
+@pytest.fixture
+def project(tmpdir):
+    tmpdir.mkdir('src').mkdir('pkg')
+    tmpdir.join('src', 'pkg', '__init__.py').write('')
+    tmpdir.join('src', 'pkg', 'base.py').write('X = 1\n')
+    tmpdir.join('src', 'pkg', 'user.py').write('from . import base\n')
+    tmpdir.join('src', 'pkg', 'other.py').write('Y = 2\n')
+    with tmpdir.as_cwd():
+        yield Bunch(
+            srcdir='src', testdir='src/tests',
+            cachejoin=lambda *names: os.path.join('build', '.rituals', *names),
+        )
+
+
+def test_pylint_module_imports_are_resolved():
+    names = inspection.module_names(Bunch(srcdir='src', testdir='src/tests'), [
+        'src/pkg/__init__.py', 'src/pkg/user.py', 'setup.py',
+    ])
+    assert names == {'pkg': 'src/pkg/__init__.py', 'pkg.user': 'src/pkg/user.py', 'setup': 'setup.py'}
+
+
+def test_pylint_incremental_only_checks_changed_modules(project):
+    message = {
+        'type': 'warning', 'module': 'pkg.other', 'obj': '', 'line': 1, 'column': 0,
+        'path': 'src/pkg/other.py', 'symbol': 'fake-warning', 'message': 'Fake', 'message-id': 'W0001',
+    }
+    runner = PylintRunner([message])
+    ctx = Bunch(run=runner)
+
+    rc, output = inspection.pylint_incremental(ctx, project, ['src/pkg'], '--reports=n')
+    assert runner.checked == [['src/pkg/__init__.py', 'src/pkg/base.py', 'src/pkg/other.py', 'src/pkg/user.py']]
+    assert rc == 4, "warning bit is set"
+    assert output.splitlines() == [
+        '************* Module pkg.other',
+        'src/pkg/other.py:1:0: W0001: Fake (fake-warning)',
+    ]
+
+    # Nothing changed, so messages are replayed from the cache
+    assert inspection.pylint_incremental(ctx, project, ['src/pkg'], '--reports=n') == (rc, output)
+    assert len(runner.checked) == 1, "no pylint call for unchanged modules"
+
+    # A changed module is checked again, together with its importers
+    with open('src/pkg/base.py', 'a') as handle:
+        handle.write('Z = 3\n')
+    inspection.pylint_incremental(ctx, project, ['src/pkg'], '--reports=n')
+    assert runner.checked[-1] == ['src/pkg/base.py', 'src/pkg/user.py']
+
+    # Changed options invalidate everything
+    inspection.pylint_incremental(ctx, project, ['src/pkg'], '--reports=n --jobs=2')
+    assert len(runner.checked[-1]) == 4
+
+
+def test_pylint_incremental_follows_indirect_imports(project):
+    with open('src/pkg/top.py', 'w') as handle:
+        handle.write('from pkg import user\n')
+    runner = PylintRunner([])
+    inspection.pylint_incremental(Bunch(run=runner), project, ['src/pkg'], '--reports=n')
+    with open('src/pkg/base.py', 'a') as handle:
+        handle.write('Z = 3\n')
+    inspection.pylint_incremental(Bunch(run=runner), project, ['src/pkg'], '--reports=n')
+    assert runner.checked[-1] == ['src/pkg/base.py', 'src/pkg/top.py', 'src/pkg/user.py']
+
+
+def test_pylint_incremental_does_not_cache_crashes(project):
+    runner = PylintRunner([], exits={'src/pkg/other.py': 32})
+    rc, _ = inspection.pylint_incremental(Bunch(run=runner), project, ['src/pkg'], '--reports=n')
+    assert rc == 32
+    assert not os.path.exists(project.cachejoin('pylint.json'))
+
+    runner.exits = {}
+    rc, _ = inspection.pylint_incremental(Bunch(run=runner), project, ['src/pkg'], '--reports=n')
+    assert rc == 0
+    assert len(runner.checked) == 2, "modules are checked again after a crash"
+
+
+def test_pylint_shards_are_balanced_by_size(project):
+    with open('src/pkg/big.py', 'w') as handle:
+        handle.write('#' * 1000)
+    shards = inspection.shard_files(inspection.python_files(['src/pkg']), 2)
+    assert shards == [['src/pkg/big.py'], ['src/pkg/__init__.py', 'src/pkg/base.py', 'src/pkg/other.py', 'src/pkg/user.py']]
+    assert len(inspection.shard_files(['a.py'], 4)) == 1, "no empty shards"
+
+
+def test_pylint_sharded_run_merges_exit_bits(project):
+    filenames = inspection.python_files(['src/pkg'])
+    runner = PylintRunner([], exits={'src/pkg/base.py': 4, 'src/pkg/other.py': 16})
+    rc, messages = inspection.pylint_json(Bunch(run=runner), '--reports=n', filenames, shards=4)
+    assert len(runner.checked) == 4, "one pylint process per shard"
+    assert sorted(sum(runner.checked, [])) == filenames
+    assert rc == 4 | 16
+    assert messages == []
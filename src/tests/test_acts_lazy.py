@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wildcard-import, missing-docstring, redefined-outer-name, invalid-name, no-self-use
+""" Tests for `rituals.acts.lazy`.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import io
+import os
+import re
+import sys
+import subprocess
+
+import pytest
+
+import rituals
+from rituals.acts import lazy, Collection
+
+def test_manifest_is_current():
+    with io.open(lazy.manifest_filename(), encoding='utf-8') as handle:
+        assert handle.read() == lazy.render_manifest(), \
+            "manifest is outdated, call 'python -m rituals.acts.lazy'"
+
+
+def test_lazy_tasks_match_real_ones():
+    from rituals.acts import inspection
+
+    real = Collection.from_module(inspection)
+    collection = lazy.lazy_collection('inspection')
+    assert collection.name == real.name
+    assert collection.default == real.default
+    task = collection.tasks['pylint']
+    assert task == inspection.pylint
+    assert task.load() is inspection.pylint
+    assert [(i.name, i.default, i.kind) for i in task.get_arguments()] == \
+        [(i.name, i.default, i.kind) for i in inspection.pylint.get_arguments()]
+
+
+def test_lazy_collection_loads_configuration_on_demand():
+    collection = lazy.lazy_collection('testing')
+    collection.configure({'rituals': dict(extra=1)})
+    config = collection.configuration()
+    assert config['rituals']['snakepits'], "config from the act module"
+    assert config['rituals']['extra'] == 1, "explicit config is kept"
+
+
+def test_find_task_resolves_default_tasks():
+    collection = lazy.lazy_collection('basic')
+    collection.add_collection(lazy.lazy_collection('testing'))
+    assert lazy.find_task(collection, 'test').name == 'pytest'
+    assert lazy.find_task(collection, 'test.tox').name == 'tox'
+    assert lazy.find_task(collection, 'clean').name == 'clean'
+
+
+def import_times(code):
+    """Return cumulative import times in microseconds, by module name, for running `code`."""
+    cmd = [sys.executable, '-X', 'importtime', '-c', code]
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(rituals.__file__)))
+    result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time: +(\d+) \| +(\d+) \| +(\S+)$', line.rstrip())
+        if match:
+            imported[match.group(3).strip()] = int(match.group(2))
+    return imported
+
+
+def test_rituals_easy_imports_no_acts():
+    imported = import_times('import invoke; import rituals.easy')
+    acts = sorted(i for i in imported if i.split('.')[:2] == ['rituals', 'acts'] and i.split('.')[-1] in lazy.ACT_MODULES)
+    assert acts == [], "no act module is imported"
+    assert 'rituals.acts.manifest' in imported
+    assert 'requests' not in imported
+
+
+@pytest.mark.benchmark
+def test_benchmark_rituals_easy_import_time(capsys):
+    eager_modules = ['rituals.acts.' + i for i in lazy.ACT_MODULES]
+    lazy_secs, eager_secs = [], []
+    for _ in range(3):
+        imported = import_times('import invoke; import rituals.easy')
+        lazy_secs.append(imported['rituals.easy'] / 1e6)
+        imported = import_times('import invoke; import rituals.easy; import {}'.format(', '.join(eager_modules)))
+        eager_secs.append((imported['rituals.easy'] + sum(imported.get(i, 0) for i in eager_modules)) / 1e6)
+
+    with capsys.disabled():
+        print("\nimporting 'rituals.easy': lazy {:.3f}s, eager {:.3f}s".format(min(lazy_secs), min(eager_secs)))
+    assert min(lazy_secs) < min(eager_secs)
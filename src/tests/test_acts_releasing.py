@@ -23,8 +23,385 @@
 from __future__ import absolute_import, unicode_literals, print_function
 
 #import unittest
+import os
+import sys
+import glob
+import hashlib
+import time
+import tarfile
+import zipfile
+import threading
+from http.server import BaseHTTPRequestHandler
 
-#import pytest
+import pytest
+from munch import Munch as Bunch
+from invoke.context import Context
 
 import tasks  # pylint: disable=unused-import
 from rituals.acts import releasing
+from rituals.util import buildsys
+
+
+PKG_INFO = """\
+Metadata-Version: 2.1
+Name: foo-bar
+Version: 1.0.dev0
+Author-email: jane@example.com
+Classifier: Topic :: Utilities
+Requires-Dist: requests
+Requires-Dist: munch
+
+The long description,
+spanning two lines.
+"""
+
+
+@pytest.fixture
+def egg_project(tmpdir, monkeypatch):
+    tmpdir.join('setup.py').write('')
+    tmpdir.mkdir('src').mkdir('foo_bar.egg-info').join('PKG-INFO').write(PKG_INFO)
+    inputs = [str(tmpdir.join('setup.py'))]
+    monkeypatch.setattr(buildsys, 'project_inputs', lambda *_: inputs)
+    root = str(tmpdir)
+    return Bunch(
+        project_root=root, project=dict(name='foo-bar', package_dir={'': 'src'}),
+        rootjoin=lambda *names: os.path.join(root, *names), inputs=inputs,
+    )
+
+
+def test_pkg_info_is_parsed(egg_project):
+    pkg_info = releasing.parse_pkg_info(releasing.find_pkg_info(egg_project))
+    assert pkg_info.name == 'foo-bar'
+    assert pkg_info.author_email == 'jane@example.com'
+    assert pkg_info.classifier == ['Topic :: Utilities'], "multi-key with one value is a list"
+    assert pkg_info.requires_dist == ['requests', 'munch']
+    assert pkg_info.platform == []
+    assert pkg_info.description.splitlines() == ['The long description,', 'spanning two lines.']
+
+
+def test_egg_info_is_only_created_when_outdated(egg_project, monkeypatch):
+    calls = []
+    monkeypatch.setattr(releasing.shell, 'capture', lambda cmd, **_: calls.append(cmd) or
+                        'writing src/foo_bar.egg-info/PKG-INFO')
+    stamp = time.time() - 10
+    os.utime(egg_project.inputs[0], (stamp, stamp))
+    assert releasing.get_egg_info(egg_project).version == '1.0.dev0'
+    assert not calls, "PKG-INFO is up-to-date"
+
+    os.utime(egg_project.inputs[0], (stamp + 20, stamp + 20))
+    assert releasing.get_egg_info(egg_project).version == '1.0.dev0'
+    assert len(calls) == 1 and calls[0].endswith('setup.py egg_info')
+
+
+@pytest.fixture
+def zipapp_project(tmpdir, monkeypatch):
+    tmpdir.join('setup.py').write('')
+    tmpdir.mkdir('src').mkdir('foo').join('__init__.py').write('X = 1\n')
+    tmpdir.join('src').mkdir('tests').join('test_foo.py').write('')
+    root = str(tmpdir)
+    monkeypatch.setattr(releasing.config, 'load', lambda: Bunch(
+        project_root=root, srcdir='src', testdir='src/tests',
+        project=Bunch(name='foo', version='1.0', entry_points={'console_scripts': ['foo = foo:main']}),
+        rootjoin=lambda *names: os.path.join(root, *names),
+    ))
+    monkeypatch.setattr(releasing, 'get_egg_info', lambda *_: None)
+    monkeypatch.delenv('INVOKE_RITUALS_CACHE_DIR', raising=False)
+    monkeypatch.delenv('INVOKE_RITUALS_CACHE_SIZE_MIB', raising=False)
+    return tmpdir
+
+
+def test_dist_outputs_match_only_distribution_files(tmpdir):
+    cfg = Bunch(project=Bunch(name='My-Project'))
+    patterns = releasing.dist_outputs(None, cfg, wheel=True, auto=False)
+    tmpdir.mkdir('dist').join('tool-1.0.pex').write('')
+    with tmpdir.as_cwd():
+        assert not any(glob.glob(i) for i in patterns), "other files in 'dist' do not count"
+        tmpdir.join('dist', 'my_project-1.0.tar.gz').write('')
+        tmpdir.join('dist', 'My_Project-1.0-py3-none-any.whl').write('')
+        assert all(glob.glob(i) for i in patterns)
+        assert not all(glob.glob(i) for i in releasing.dist_outputs(None, cfg, egg=True, auto=False))
+
+
+def test_zipapps_are_restored_from_cache(zipapp_project):
+    builds = []
+
+    def builder(_ctx, _cfg, out_base, _script, _entry_point, _opts, _source):
+        builds.append(out_base)
+        with zipfile.ZipFile(out_base + '.pyz', 'w') as pyz:
+            pyz.writestr('foo/__init__.py', zipapp_project.join('src', 'foo', '__init__.py').read())
+        return out_base + '.pyz'
+
+    ctx = Bunch(run=lambda *_, **__: None,
+                rituals=Bunch(cache=Bunch(dir=str(zipapp_project.join('cache')), size_mib=1)))
+    artifacts = releasing.build_zipapp(ctx, builder)
+    assert [os.path.basename(i) for i in artifacts] == [
+        'foo-1.0-py{0.major}.{0.minor}-none-any.pyz'.format(sys.version_info)]
+
+    zipapp_project.join('dist').remove()
+    zipapp_project.join('src', 'tests', 'test_foo.py').write('assert True\n')
+    assert releasing.build_zipapp(ctx, builder) == artifacts
+    assert len(builds) == 1, "changed tests do not invalidate the cached zipapp"
+    assert os.path.exists(artifacts[0])
+
+    zipapp_project.join('src', 'foo', '__init__.py').write('X = 2\n')
+    releasing.build_zipapp(ctx, builder)
+    releasing.build_zipapp(ctx, builder, opts='--compressed')
+    assert len(builds) == 3, "changed sources or options need a new build"
+
+
+def test_zipapps_of_entry_points_are_built_concurrently(zipapp_project, monkeypatch):
+    cfg = releasing.config.load()
+    cfg.project.entry_points['console_scripts'] = ['foo{0} = foo:main{0}'.format(i) for i in range(4)]
+    monkeypatch.setattr(releasing.config, 'load', lambda: cfg)
+    resolved = []
+    monkeypatch.setattr(releasing, 'fill_wheelhouse', lambda *args: resolved.append(args[1]))
+    monkeypatch.setattr(releasing, 'build_project_wheel',
+                        lambda _ctx, _cfg, wheel_dir, _: os.path.join(wheel_dir, 'foo-1.0-py3-none-any.whl'))
+    calls, lock = [], threading.Lock()
+    running = Bunch(now=0, most=0)
+
+    def builder(_ctx, _cfg, out_base, script, _entry_point, opts, source):
+        with lock:
+            calls.append((script, opts, os.path.basename(source)))
+            running.now += 1
+            running.most = max(running.most, running.now)
+        time.sleep(0.1)
+        with zipfile.ZipFile(out_base + '.pyz', 'w') as pyz:
+            pyz.writestr('{}/__init__.py'.format(script), '')
+        with lock:
+            running.now -= 1
+        return out_base + '.pyz'
+
+    ctx = Bunch(run=lambda *_, **__: None,
+                rituals=Bunch(cache=Bunch(dir=str(zipapp_project.join('cache')), size_mib=1)))
+    artifacts = releasing.build_zipapp(ctx, builder, opts='--compressed', jobs=2)
+    assert [os.path.basename(i) for i in artifacts] == [
+        'foo{}-1.0-py{v.major}.{v.minor}-none-any.pyz'.format(i, v=sys.version_info) for i in range(4)]
+    assert running.most == 2
+    assert len(resolved) == 1, "dependencies are resolved once"
+    wheel_dir = str(zipapp_project.join('cache', 'wheelhouse'))
+    assert {i[1:] for i in calls} == {('--compressed --find-links {} --no-index'.format(wheel_dir),
+                                       'foo-1.0-py3-none-any.whl')}
+
+    zipapp_project.join('dist').remove()
+    assert releasing.build_zipapp(ctx, builder, opts='--compressed', jobs=2) == artifacts
+    assert len(calls) == 4 and len(resolved) == 1, "cached zipapps need no resolving"
+
+
+def test_concurrent_commands_do_not_read_stdin():
+    ctx = Context()
+
+    def echo(worker_ctx, num):
+        return worker_ctx.config.run.in_stream, worker_ctx.run('echo {}'.format(num), hide=True).stdout.strip()
+
+    results = releasing.run_concurrently(ctx, 2, echo, [(i,) for i in range(4)])
+    assert results == [(False, str(i)) for i in range(4)]
+    assert ctx.config.run.in_stream is None, "caller's context is left alone"
+
+
+def test_pex_files_of_entry_points_are_built_concurrently(zipapp_project, monkeypatch):
+    cfg = releasing.config.load()
+    cfg.project.entry_points['console_scripts'] = ['foo{0} = foo:main{0}'.format(i) for i in range(3)]
+    monkeypatch.setattr(releasing.config, 'load', lambda: cfg)
+    monkeypatch.setattr(releasing, 'which', lambda _: 'pex')
+    monkeypatch.setattr(releasing, 'fill_wheelhouse', lambda *_: [])
+    monkeypatch.setattr(releasing, 'build_project_wheel',
+                        lambda _ctx, _cfg, wheel_dir, _: os.path.join(wheel_dir, 'foo-1.0-py3-none-any.whl'))
+    commands, lock = [], threading.Lock()
+    running = Bunch(now=0, most=0)
+
+    def run(cmd, **_):
+        if ' -m pex ' not in cmd:
+            return Bunch(ok=True)
+        with lock:
+            commands.append(cmd)
+            running.now += 1
+            running.most = max(running.most, running.now)
+        time.sleep(0.1)
+        with zipfile.ZipFile(cmd.split(' -o ')[1].split()[0], 'w') as pex:
+            pex.writestr('__main__.py', '')
+        with lock:
+            running.now -= 1
+        return Bunch(ok=True)
+
+    ctx = Bunch(run=run, rituals=Bunch(cache=Bunch(dir=str(zipapp_project.join('cache')), size_mib=1)))
+    zipapp_project.mkdir('dist')
+    releasing.pex.body(ctx, jobs=3)
+    assert running.most == 3
+    assert sorted(os.path.basename(i) for i in zipapp_project.join('dist').listdir()) == [
+        'foo{}-1.0-py2.py3-none-any.pex'.format(i) for i in range(3)]
+    assert all(i.split()[-1].endswith('/foo-1.0-py3-none-any.whl') for i in commands), "project wheel is installed"
+    assert all('--no-index' in i.split() for i in commands)
+
+
+def test_wheelhouse_is_resolved_again_only_when_stale(tmpdir, monkeypatch):
+    commands = []
+
+    def run(cmd, **_):
+        commands.append(cmd)
+        wheel_dir = cmd.split('--wheel-dir ')[1].split()[0]
+        assert os.path.dirname(wheel_dir) == str(tmpdir.join('wheelhouse')), "pip writes to a temp dir"
+        for name in ('foo-{}-py3-none-any.whl'.format(len(commands)), 'setuptools-1-py3-none-any.whl'):
+            with open(os.path.join(wheel_dir, name), 'w') as handle:
+                handle.write(name)
+        return Bunch(ok=True)
+
+    monkeypatch.setenv('INVOKE_RITUALS_CACHE_DIR', str(tmpdir))
+    ctx = Bunch(run=run)
+    cfg = Bunch(project_root=str(tmpdir), rootjoin=lambda *names: os.path.join(str(tmpdir), *names))
+    assert releasing.pex_wheelhouse(ctx, cfg) == ['-f', str(tmpdir.join('wheelhouse')), '--no-index']
+    assert commands[0].endswith('requirements.txt setuptools wheel')
+    assert '--find-links {} --wheel-dir'.format(tmpdir.join('wheelhouse')) in commands[0]
+    assert sorted(tmpdir.join('wheelhouse').listdir('*.whl')) == [
+        tmpdir.join('wheelhouse', 'foo-1-py3-none-any.whl'), tmpdir.join('wheelhouse', 'setuptools-1-py3-none-any.whl')]
+    assert not tmpdir.join('wheelhouse').listdir('.tmp-*')
+
+    releasing.pex_wheelhouse(ctx, cfg)
+    assert len(commands) == 1, "freshly resolved wheelhouse is used offline"
+
+    monkeypatch.setattr(releasing, 'WHEELHOUSE_REFRESH_SECS', 0)
+    wheels = releasing.fill_wheelhouse(ctx, str(tmpdir.join('wheelhouse')), [cfg.rootjoin('requirements.txt')],
+                                       ['setuptools', 'wheel'])
+    assert len(commands) == 2, "stale resolution is refreshed"
+    assert wheels == ['foo-2-py3-none-any.whl', 'setuptools-1-py3-none-any.whl']
+
+
+@pytest.fixture
+def upload_server(http_server):
+    received = Bunch(files={}, puts=[], clients=set(), active=0, max_active=0, head_delay=0, checksums=[])
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_HEAD(self):
+            time.sleep(received.head_delay)
+            body = received.files.get(self.path)
+            self.send_response(404 if body is None else 200)
+            self.send_header('Content-Length', '0' if body is None else str(len(body)))
+            if body is not None:
+                self.send_header('X-Checksum-Sha256', hashlib.sha256(body).hexdigest())
+                self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+
+        def do_PUT(self):
+            with lock:
+                received.active += 1
+                received.max_active = max(received.max_active, received.active)
+                received.clients.add(self.client_address)
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            content_range = self.headers.get('Content-Range')
+            time.sleep(0.1)
+            with lock:
+                received.puts.append((self.path, content_range, len(body)))
+                received.checksums.append(self.headers.get('X-Checksum-Sha256'))
+                if content_range:
+                    body = received.files[self.path][:int(content_range.split()[1].split('-')[0])] + body
+                received.files[self.path] = body
+                received.active -= 1
+            self.send_response(201 if not self.path.endswith('.bad') else 403)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    received.url = http_server(Handler) + '/repo'
+    return received
+
+
+@pytest.fixture
+def upload_ctx(tmpdir, upload_server, monkeypatch):
+    monkeypatch.setattr(releasing.config, 'load', lambda: Bunch(project=Bunch(name='foo', version='1.0')))
+    monkeypatch.delenv('INVOKE_RITUALS_RELEASE_UPLOAD_WORKERS', raising=False)
+    monkeypatch.setenv('INVOKE_RITUALS_RELEASE_UPLOAD_BASE_URL', upload_server.url)
+    monkeypatch.setenv('INVOKE_RITUALS_RELEASE_UPLOAD_PATH', '{name}/{fullversion}/{filename}')
+    ctx = Bunch(rituals=Bunch(release=Bunch(upload=Bunch(base_url='', path='', workers=3))))
+    artifacts = []
+    for i in range(3):
+        artifacts.append(str(tmpdir.join('foo-1.0.{}-py3-none-any.pyz'.format(i))))
+        with open(artifacts[-1], 'wb') as handle:
+            handle.write(os.urandom(100000 * (i + 1)))
+    return ctx, artifacts
+
+
+def test_artifacts_are_uploaded_concurrently(upload_server, upload_ctx):
+    ctx, artifacts = upload_ctx
+    results = releasing.upload_artifacts(ctx, artifacts)
+
+    assert [i.status_code for i in results] == [201, 201, 201]
+    assert results[2].bytes == 300000
+    for artifact in artifacts:
+        name = os.path.basename(artifact)
+        with open(artifact, 'rb') as handle:
+            assert upload_server.files['/repo/foo/{}/{}'.format(name.split('-')[1], name)] == handle.read()
+    assert upload_server.max_active > 1
+
+
+def test_uploads_share_connections(upload_server, upload_ctx):
+    ctx, artifacts = upload_ctx
+    rejected = artifacts[0].replace('.pyz', '.bad')
+    os.link(artifacts[0], rejected)
+    results = releasing.upload_artifacts(ctx, artifacts + [rejected], workers=1)
+    assert [i.ok for i in results] == [True, True, True, False]
+    assert results[-1].status_code == 403
+    assert len(upload_server.clients) == 1, "one keep-alive connection for all files"
+    assert upload_server.max_active == 1
+
+
+def test_stored_artifacts_are_skipped(upload_server, upload_ctx):
+    ctx, artifacts = upload_ctx
+    releasing.upload_artifacts(ctx, artifacts)
+    results = releasing.upload_artifacts(ctx, artifacts)
+    assert all(i.ok and i.skipped for i in results)
+    assert len(upload_server.puts) == 3
+
+
+def test_stalled_upload_checks_are_given_up(upload_server, upload_ctx, monkeypatch):
+    ctx, artifacts = upload_ctx
+    monkeypatch.setattr(releasing, 'UPLOAD_PROBE_TIMEOUT', (1, 0.1))
+    upload_server.head_delay = 0.5
+    results = releasing.upload_artifacts(ctx, artifacts[:1])
+    assert results[0].ok and not results[0].skipped
+    assert len(upload_server.puts) == 1
+
+
+def test_partial_uploads_are_resumed(upload_server, upload_ctx):
+    ctx, artifacts = upload_ctx
+    with open(artifacts[0], 'wb') as handle:
+        handle.write(os.urandom(releasing.UPLOAD_RESUME_MIN_BYTES + 1000))
+    with open(artifacts[0], 'rb') as handle:
+        data = handle.read()
+    path = '/repo/foo/1.0.0/' + os.path.basename(artifacts[0])
+
+    upload_server.files[path] = data[:5000]
+    result = releasing.upload_artifacts(ctx, artifacts[:1])[0]
+    assert upload_server.puts[-1] == (path, 'bytes 5000-{0}/{1}'.format(len(data) - 1, len(data)), len(data) - 5000)
+    assert upload_server.checksums[-1] is None, "whole-file checksum is not sent with a part"
+    assert upload_server.files[path] == data
+    assert result.ok and result.bytes == len(data) - 5000
+
+    upload_server.files[path] = b'x' * 5000
+    releasing.upload_artifacts(ctx, artifacts[:1])
+    assert upload_server.puts[-1] == (path, None, len(data)), "partial content that doesn't match is replaced"
+    assert upload_server.files[path] == data
+
+
+def test_pex_installers_include_pyrun(tmpdir, monkeypatch):
+    monkeypatch.delenv('INVOKE_RITUALS_CACHE_DIR', raising=False)
+    cache_dir = releasing.downloads(Bunch(rituals=Bunch(cache=Bunch(dir=str(tmpdir.join('cache')), size_mib=1))))
+    assert cache_dir == str(tmpdir.join('cache', 'downloads')), "configured cache dir is used"
+    tmpdir.mkdir('bin').join('pyrun').write_binary(b'\x7fELF pyrun')
+    with tarfile.open(str(tmpdir.join('pyrun.tgz')), 'w:gz') as tar:
+        tar.add(str(tmpdir.join('bin')), arcname='./bin')
+    tmpdir.join('app.pex').write_binary(b'PK pex')
+
+    pyrun_exe = releasing.extract_pyrun(str(tmpdir.join('pyrun.tgz')), cache_dir)
+    assert pyrun_exe.startswith(cache_dir)
+    monkeypatch.setattr(releasing.tarfile, 'open', None)
+    assert releasing.extract_pyrun(str(tmpdir.join('pyrun.tgz')), cache_dir) == pyrun_exe, "pyrun is extracted once"
+
+    installer = str(tmpdir.join('app-installer.sh'))
+    releasing.build_installer(pyrun_exe, str(tmpdir.join('app.pex')), installer)
+    with open(installer, 'rb') as handle:
+        content = handle.read()
+    offset = int(content.split(b'tail -c +')[1].split()[0]) - 1
+    assert content.startswith(b'#!/usr/bin/env bash')
+    assert content[offset:] == b'\x7fELF pyrun' + b'PK pex'
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wildcard-import, missing-docstring, redefined-outer-name, invalid-name, no-self-use
+""" Tests for `rituals.acts.uptodate`.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+
+import pytest
+from munch import Munch as Bunch
+
+from rituals.acts import uptodate
+
+
+@pytest.fixture
+def project(tmpdir, monkeypatch):
+    tmpdir.mkdir('src').join('mod.py').write('X = 1\n')
+    root = str(tmpdir)
+    monkeypatch.delenv('INVOKE_RITUALS_FORCE', raising=False)
+    monkeypatch.setattr(uptodate.config, 'load', lambda: Bunch(
+        project_root=root,
+        cachejoin=lambda *names: os.path.join(root, 'build', '.rituals', *names),
+    ))
+    return tmpdir
+
+
+@pytest.fixture
+def compile_task(project):
+    calls = []
+
+    @uptodate.uptodate(inputs=['src/**/*.py'], outputs=['build/out*'], when=lambda verbose=False, **_: not verbose)
+    def compile_it(_, verbose=False):
+        calls.append(verbose)
+        project.ensure('build', 'out.txt').write(project.join('src', 'mod.py').read())
+
+    return compile_it, calls
+
+
+def test_uptodate_task_is_skipped_when_unchanged(compile_task):
+    compile_it, calls = compile_task
+    compile_it(None)
+    compile_it(None)
+    assert calls == [False]
+
+
+def test_uptodate_task_ignores_touched_inputs(project, compile_task):
+    compile_it, calls = compile_task
+    compile_it(None)
+    mod_py = project.join('src', 'mod.py')
+    mod_py.setmtime(mod_py.mtime() + 10)
+    compile_it(None)
+    assert calls == [False]
+
+
+def test_uptodate_task_runs_after_changes(project, compile_task):
+    compile_it, calls = compile_task
+    compile_it(None)
+    project.join('src', 'mod.py').write('X = 2\n')
+    compile_it(None)
+    project.join('src', 'new.py').write('')
+    compile_it(None)
+    compile_it(None)
+    assert calls == [False, False, False]
+    assert project.join('build', 'out.txt').read() == 'X = 2\n'
+
+
+def test_uptodate_task_runs_after_inputs_changed_while_running(project):
+    calls = []
+
+    @uptodate.uptodate(inputs=['src/**/*.py'], outputs=['build/out*'])
+    def compile_it(_):
+        calls.append(project.join('src', 'mod.py').read())
+        project.ensure('build', 'out.txt').write('')
+        if len(calls) == 1:
+            project.join('src', 'mod.py').write('X = 2\n')  # edited during the build
+
+    compile_it(None)
+    compile_it(None)
+    compile_it(None)
+    assert calls == ['X = 1\n', 'X = 2\n']
+
+
+def test_uptodate_task_runs_when_outputs_are_missing(project, compile_task):
+    compile_it, calls = compile_task
+    compile_it(None)
+    project.join('build', 'out.txt').remove()
+    compile_it(None)
+    assert calls == [False, False]
+
+
+def test_uptodate_task_keeps_stamps_per_arguments(project, compile_task):
+    compile_it, calls = compile_task
+    compile_it(None)
+    compile_it(None, verbose=True)
+    compile_it(None, verbose=True)
+    assert calls == [False, True, True], "'when' predicate disables the check"
+
+
+def test_uptodate_task_can_be_forced(monkeypatch, compile_task):
+    compile_it, calls = compile_task
+    compile_it(None)
+    monkeypatch.setenv('INVOKE_RITUALS_FORCE', '1')
+    compile_it(None)
+    assert calls == [False, False]
+    assert compile_it.__name__ == 'compile_it'
@@ -32,6 +32,7 @@
 from __future__ import absolute_import, unicode_literals, print_function
 
 import os
+import time
 import shutil
 import tempfile
 import unittest
@@ -59,6 +60,25 @@ class Glob2reTest(unittest.TestCase):
         assert antglob.glob2re('\\') == r'\\'
         assert antglob.glob2re('+') == r'\+'
 
+    def test_question_mark_converts_to_a_single_non_slash(self):
+        assert antglob.glob2re('a?c') == 'a[^/]c'
+
+    def test_charsets_can_be_inverted_with_an_exclamation_mark(self):
+        assert antglob.glob2re('[!abc]') == '[^abc]'
+        assert antglob.glob2re('[^abc]') == '[^abc]'
+
+    def test_charsets_keep_ranges_and_leading_closing_bracket(self):
+        assert antglob.glob2re('[a-z]') == '[a-z]'
+        assert antglob.glob2re('[]a]') == '[]a]'
+
+    def test_unclosed_brackets_and_braces_are_literal(self):
+        assert antglob.glob2re('a[b') == r'a\[b'
+        assert antglob.glob2re('a{b') == r'a\{b'
+
+    def test_braces_convert_to_an_alternation(self):
+        assert antglob.glob2re('*.{py,pyc}') == r'[^/]*\.(?:py|pyc)'
+        assert antglob.glob2re('{a,{b,c}d}') == '(?:a|(?:b|c)d)'
+
 
 class ParseGlobTest(unittest.TestCase):
 
@@ -81,6 +101,12 @@ class ParseGlobTest(unittest.TestCase):
     def test_absolute_paths_emit_a_starting_slash(self):
         assert list(antglob.parse_glob('/root')) == ['/', 'root']
 
+    def test_twin_star_as_last_part_matches_anything_below(self):
+        assert list(antglob.parse_glob('a/**')) == ['a/', '.+']
+
+    def test_slashes_in_braces_do_not_split_parts(self):
+        assert list(antglob.parse_glob('{a,b/c}/d')) == ['(?:a|b/c)/', 'd']
+
 
 @pytest.fixture(scope='module')
 def root(request):
@@ -285,6 +311,23 @@ def test_glob_patterns_with_inverted_char_sets(root):
     assert_sets_equal(antglob.FileSet(root, "**/baz/[^t]*"), ["foo/bar/baz/..."])
 
 
+def test_glob_patterns_with_single_character_wildcards(root):
+    assert_sets_equal(antglob.FileSet(root, "**/t??.py"), ["foo/bar/two.py"])
+    assert_sets_equal(antglob.FileSet(root, "???/"), ["foo/"])
+
+
+def test_glob_patterns_with_alternatives(root):
+    assert_sets_equal(antglob.FileSet(root, "**/{one,two}.py"), ["foo/one.py", "foo/bar/two.py"])
+    assert_sets_equal(antglob.FileSet(root, "{zero,foo/one}"), ["zero", "foo/one"])
+    assert_sets_equal(antglob.FileSet(root, "**/*.{py,txt}"), ALL_THE_PIES)
+
+
+def test_glob_patterns_with_trailing_twin_star(root):
+    assert_sets_equal(antglob.FileSet(root, "foo/bar/**"),
+                      ["foo/bar/two", "foo/bar/two.py", "foo/bar/baz/three", "foo/bar/baz/three.py", "foo/bar/baz/..."])
+    assert_sets_equal(antglob.FileSet(root, "foo/**/"), ["foo/bar/", "foo/bar/baz/", "foo/bar/.hidden/"])
+
+
 def test_string_patterns_are_inclusive_by_default(root):
     assert list(antglob.FileSet(root, "*.py")) == ["zero.py"]
 
@@ -293,3 +336,197 @@ def test_lists_of_string_patterns_are_combined(root):
     patterns = ["*.py", "foo/bar/tw*", "foo/bar/*.py"]
     assert set(antglob.FileSet(root, patterns[:1])) == set(["zero.py"])
     assert set(antglob.FileSet(root, patterns)) == set(["zero.py", "foo/bar/two", "foo/bar/two.py"])
+
+
+def _legacy_walk(fileset):
+    """Reference walker, based on `os.walk`."""
+    for base, dirs, files in os.walk(fileset.root):
+        prefix = base[len(fileset.root):].lstrip(os.sep)
+        bits = prefix.split(os.sep) if prefix else []
+        for dirname in dirs[:]:
+            path = '/'.join(bits + [dirname])
+            inclusive = fileset.included(path, is_dir=True)
+            if inclusive:
+                yield path + '/'
+            elif inclusive is False:
+                dirs.remove(dirname)
+        for filename in files:
+            path = '/'.join(bits + [filename])
+            if fileset.included(path):
+                yield path
+
+
+def test_scandir_walk_generates_the_same_output_as_os_walk(root):
+    for patterns in (["**/*"], ["**/*.py", "**/*/"], ["**/*", "**/b*/", excludes("**/baz/")], ["*/", "**/.*"]):
+        fileset = FileSet(root, patterns)
+        assert list(fileset.walk()) == list(_legacy_walk(fileset)), repr(fileset)
+
+
+def test_walk_with_root_prepends_the_root_path(root):
+    assert list(antglob.FileSet(root, "*.py").walk(with_root=True)) == [join(root, "zero.py")]
+
+
+def test_bottom_up_walk_reports_children_first(root):
+    result = list(antglob.FileSet(root, ["**/*/", "**/one.py", "**/three.py"]).walk(topdown=False))
+    assert_sets_equal(result, ["foo/", "foo/bar/", "foo/bar/baz/", "foo/bar/.hidden/", "foo/one.py", "foo/bar/baz/three.py"])
+    assert result.index("foo/bar/baz/three.py") < result.index("foo/one.py") < result.index("foo/")
+
+
+@pytest.fixture(scope='module')
+def wide_root(request):
+    """A wider tree with 20 x 10 directories of 5 files each."""
+    rootpath = tempfile.mkdtemp()
+    request.addfinalizer(lambda: shutil.rmtree(rootpath))
+    for i in range(20):
+        for j in range(10):
+            dirname = join(rootpath, "d{0}".format(i), "s{0}".format(j))
+            os.makedirs(dirname)
+            for k in range(5):
+                open(join(dirname, "f{0}.{1}".format(k, "py" if k % 2 else "txt")), "a").close()
+    return rootpath
+
+
+def test_ordered_parallel_walk_generates_the_same_output_as_a_serial_walk(root, wide_root):
+    for base in (root, wide_root):
+        for patterns in (["**/*"], ["**/*.py", "**/*/"], ["**/*", excludes("**/s3/"), excludes("**/baz/")]):
+            fileset = FileSet(base, patterns)
+            assert list(fileset.walk(parallel=4, ordered=True)) == list(fileset.walk()), repr(fileset)
+
+
+def test_unordered_parallel_walk_finds_the_same_paths(wide_root):
+    fileset = FileSet(wide_root, ["**/*.py", excludes("d1*/")])
+    serial = list(fileset.walk())
+    assert len(serial) == 9 * 10 * 2
+    assert_sets_equal(fileset.walk(parallel=4), serial)
+    assert_sets_equal(fileset.walk(parallel=1, with_root=True), [join(wide_root, i) for i in serial])
+
+
+def test_parallel_walk_can_be_abandoned_early(wide_root):
+    walker = FileSet(wide_root, "**/*").walk(parallel=3)
+    assert next(walker)
+    walker.close()
+
+
+def test_walk_can_skip_the_contents_of_matched_directories(root):
+    fileset = FileSet(root, ["foo/bar/", "**/*.py"])
+    assert "foo/bar/two.py" in list(fileset.walk())
+    assert_sets_equal(fileset.walk(prune_matches=True), ["zero.py", "foo/one.py", "foo/bar/"])
+
+
+def test_parallel_walk_rejects_bottom_up_order(root):
+    with pytest.raises(ValueError):
+        list(FileSet(root, "**/*").walk(parallel=2, topdown=False))
+
+
+class ScanRecorder(FileSet):
+    """FileSet that remembers all scanned directories."""
+
+    def _scan(self, path, prefix, **kwargs):
+        self.scanned.append(prefix)
+        return FileSet._scan(self, path, prefix, **kwargs)
+
+
+def scanned_dirs(root, patterns):
+    fileset = ScanRecorder(root, patterns)
+    fileset.scanned = []
+    result = list(fileset)
+    return result, sorted(fileset.scanned)
+
+
+def test_patterns_record_their_literal_prefix():
+    assert includes("docs/_build/").prefix == "docs/_build"
+    assert includes("docs/_build/").literal
+    assert includes("src/**/*.py").prefix == "src/"
+    assert not includes("src/**/*.py").literal
+    assert includes("**/*.py").prefix == ""
+
+
+def test_walk_prunes_subtrees_outside_of_literal_prefixes(root):
+    result, scanned = scanned_dirs(root, ["foo/bar/baz/*.py"])
+    assert result == ["foo/bar/baz/three.py"]
+    assert scanned == ["", "foo/", "foo/bar/", "foo/bar/baz/"]
+
+    result, scanned = scanned_dirs(root, ["foo/bar/"])
+    assert result == ["foo/bar/"]
+    assert scanned == ["", "foo/"]
+
+
+def test_walk_without_literal_prefix_scans_everything(root):
+    _, scanned = scanned_dirs(root, ["foo/*.py", "**/*.py"])
+    assert scanned == ["", "foo/", "foo/bar/", "foo/bar/.hidden/", "foo/bar/baz/"]
+
+
+def test_exclusive_patterns_do_not_widen_the_scan(root):
+    result, scanned = scanned_dirs(root, [includes("foo/bar/*.py"), excludes("**/baz/")])
+    assert result == ["foo/bar/two.py"]
+    assert scanned == ["", "foo/", "foo/bar/", "foo/bar/.hidden/"]
+
+
+def _legacy_included(fileset, path, is_dir=False):
+    """Reference matcher, checking each pattern in turn."""
+    inclusive = None
+    for pattern in fileset.patterns:
+        if pattern.is_dir == is_dir and pattern.matches(path):
+            inclusive = pattern.inclusive
+    return inclusive
+
+
+def test_combined_matcher_agrees_with_pattern_by_pattern_matching():
+    fileset = FileSet('.', [
+        includes("**/*.py"),
+        excludes("**/foo/**/*"),
+        includes("**/baz/**/*.py"),
+        includes("**/b*/"),
+        excludes("**/.*/"),
+    ])
+    for path in ALL_THE_PIES + ["zero", "foo/one", "foo/bar/two"]:
+        assert fileset.included(path) == _legacy_included(fileset, path), path
+    for path in ["foo", "foo/bar", "foo/bar/baz", "foo/bar/.hidden", "x/.bak"]:
+        assert fileset.included(path, is_dir=True) == _legacy_included(fileset, path, is_dir=True), path
+
+
+def test_matching_returns_the_deciding_pattern():
+    fileset = FileSet('.', [includes("**/*.py"), excludes("**/two.py")])
+    assert fileset.matching("zero.py") is fileset.patterns[0]
+    assert fileset.matching("foo/bar/two.py") is fileset.patterns[1]
+    assert fileset.matching("zero") is None
+    assert fileset.matching("zero.py", is_dir=True) is None
+
+
+def _matcher_workload():
+    """Return 100k paths, and a fileset with the patterns of 'clean --all'."""
+    paths = [
+        "pkg{0}/sub{1}/{2}{3}.{4}".format(i % 97, i % 13, 'test_' if i % 5 else '', i, ('py', 'pyc', 'txt', 'so', 'rst')[i % 5])
+        for i in range(100000)
+    ]
+    fileset = FileSet('.', [includes(i) for i in (
+        'build/', 'pip-selfcheck.json', 'docs/_build/', 'doc/_build/', 'dist/',
+        '**/*~', '**/*.py[co]', '**/__pycache__/', '*.egg-info/', 'src/*.egg-info/',
+        '**/*.orig', '**/*.rej', '**/*.bak', '**/*.swp', '**/.coverage', '**/*.so',
+    )] + [excludes(i) for i in ('.git/', '.hg/', '.svn/', 'debian/*/', '.tox/', '**/pkg7/**/*')])
+    return paths, fileset
+
+
+def test_combined_matcher_agrees_with_legacy_on_100k_paths():
+    paths, fileset = _matcher_workload()
+    legacy = [_legacy_included(fileset, i) for i in paths]
+    combined = [fileset.included(i) for i in paths]
+    assert combined == legacy
+
+
+@pytest.mark.benchmark
+def test_benchmark_combined_matcher_on_100k_paths(capsys):
+    paths, fileset = _matcher_workload()
+    started = time.time()
+    for path in paths:
+        _legacy_included(fileset, path)
+    legacy_secs = time.time() - started
+
+    started = time.time()
+    for path in paths:
+        fileset.included(path)
+    combined_secs = time.time() - started
+
+    with capsys.disabled():
+        print("\n{0} paths x {1} patterns: legacy {2:.3f}s, combined {3:.3f}s ({4:.1f}x)".format(
+              len(paths), len(fileset.patterns), legacy_secs, combined_secs, legacy_secs / max(combined_secs, 1e-6)))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wildcard-import, missing-docstring, redefined-outer-name, invalid-name, no-self-use
+""" Tests for `rituals.util.artifacts`.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+
+import pytest
+
+from rituals.util import artifacts
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return artifacts.ArtifactCache(str(tmpdir.join('cache')), max_bytes=1024)
+
+
+@pytest.fixture
+def artifact(tmpdir):
+    path = tmpdir.mkdir('dist').join('app-1.0.pyz')
+    path.write_binary(b'x' * 100)
+    return str(path)
+
+
+def test_cache_home_respects_xdg(monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', '/var/cache/me')
+    assert artifacts.cache_home() == '/var/cache/me/rituals'
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    assert artifacts.cache_home() == os.path.expanduser('~/.cache/rituals')
+
+
+def test_cached_artifact_is_restored(tmpdir, cache, artifact):
+    key = artifacts.digest('app', 1)
+    assert cache.restore(key, str(tmpdir.join('out'))) is None
+    cache.store(key, [artifact], builder='test')
+    assert key in cache
+
+    restored = cache.restore(key, str(tmpdir.join('out')))
+    assert restored == [str(tmpdir.join('out', 'app-1.0.pyz'))]
+    assert tmpdir.join('out', 'app-1.0.pyz').read_binary() == b'x' * 100
+    assert not os.access(restored[0], os.W_OK) or os.geteuid() == 0, "cached files are read-only"
+    assert (cache.stats().hits, cache.stats().misses) == (1, 1)
+    assert cache.stats().hit_rate == 0.5
+
+
+def test_least_recently_used_entries_are_evicted(cache, artifact):
+    keys = [artifacts.digest('app', i) for i in range(12)]
+    for i, key in enumerate(keys):
+        cache.store(key, [artifact])
+        os.utime(os.path.join(cache.path(key), 'meta.json'), (1000 + i, 1000 + i))
+        if i == 5:
+            cache.restore(keys[0], os.path.dirname(artifact))  # used recently
+    assert cache.stats().entries == 10
+    assert cache.stats().bytes == 1000
+    assert keys[0] in cache and keys[6] in cache
+    assert keys[1] not in cache and keys[2] not in cache
+
+
+def test_disabled_cache_stores_nothing(tmpdir, artifact):
+    cache = artifacts.ArtifactCache(str(tmpdir.join('cache')), max_bytes=0)
+    cache.store('00ff', [artifact])
+    assert cache.restore('00ff', str(tmpdir)) is None
+    assert not tmpdir.join('cache').check()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wildcard-import, missing-docstring, redefined-outer-name, invalid-name, no-self-use
+""" Tests for `rituals.util.buildsys`.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+import json
+
+import pytest
+
+from rituals.util import buildsys
+
+
+PYPROJECT = """\
+[build-system]
+build-backend = "poetry.core.masonry.api"
+
+[tool.poetry]
+name = "foo-bar"
+version = "{}"
+authors = ["Jane Doe <jane@example.com>"]
+"""
+
+
+@pytest.fixture
+def poetry_project(tmpdir, monkeypatch):
+    tmpdir.join('pyproject.toml').write(PYPROJECT.format('1.0'))
+    tmpdir.join('LICENSE').write('Copyright 2020 Jane Doe\n')
+    loads = []
+    load_project_meta = buildsys._load_project_meta  # pylint: disable=protected-access
+    monkeypatch.setattr(buildsys, '_load_project_meta', lambda *a, **kw: loads.append(a) or load_project_meta(*a, **kw))
+    monkeypatch.setattr(buildsys, '_META_MEMO', {})
+    tmpdir.loads = loads
+    return tmpdir
+
+
+def test_project_meta_is_cached(poetry_project):
+    meta = buildsys.project_meta(str(poetry_project))
+    assert meta.name == 'foo-bar'
+    assert meta.author_email == 'jane@example.com'
+    assert meta.copyright == '2020 Jane Doe'
+    assert buildsys.project_meta(str(poetry_project)) == meta
+    assert len(poetry_project.loads) == 1, "metadata is loaded once"
+
+    cache_file = poetry_project.join('build', '.rituals', buildsys.META_CACHE_NAME)
+    assert json.loads(cache_file.read())['project']['name'] == 'foo-bar'
+    buildsys._META_MEMO.clear()  # pylint: disable=protected-access
+    assert buildsys.project_meta(str(poetry_project)) == meta
+    assert len(poetry_project.loads) == 1, "metadata is read from the cache file"
+
+
+def test_project_meta_is_reloaded_on_changes(poetry_project):
+    buildsys.project_meta(str(poetry_project))
+
+    # A new timestamp with the same content is not a change
+    stamp = os.path.getmtime(str(poetry_project.join('LICENSE'))) + 10
+    os.utime(str(poetry_project.join('LICENSE')), (stamp, stamp))
+    buildsys.project_meta(str(poetry_project))
+    assert len(poetry_project.loads) == 1
+
+    poetry_project.join('pyproject.toml').write(PYPROJECT.format('1.1'))
+    assert buildsys.project_meta(str(poetry_project)).version == '1.1'
+    assert len(poetry_project.loads) == 2
+
+
+def test_project_meta_drops_values_unfit_for_json():
+    # pylint: disable=protected-access
+    result = buildsys._jsonable(dict(name='x', cmdclass=dict(test=object), data_files={'a': ['b']}.items()))
+    assert result == dict(name='x', data_files=[['a', ['b']]])
+
+
+@pytest.fixture
+def version_memo(monkeypatch):
+    monkeypatch.setattr(buildsys, '_VERSION_MEMO', {})
+    monkeypatch.setattr(buildsys.shell, 'capture', lambda *a, **kw: pytest.fail("no subprocess expected"))
+
+
+def test_project_version_from_setup_cfg(tmpdir, version_memo):
+    tmpdir.join('setup.cfg').write('[metadata]\nversion = 1.2.0-dev\n')
+    assert buildsys.project_version(str(tmpdir)) == '1.2.0.dev0', "version is normalized"
+
+    tmpdir.mkdir('src').mkdir('foo').join('__init__.py').write('"""Foo."""\n__version__ = "2.0"\n')
+    tmpdir.join('setup.cfg').write('[metadata]\nversion = attr: foo.__version__\n')
+    assert buildsys.project_version(str(tmpdir)) == '2.0'
+
+    tmpdir.join('src', 'foo', '__init__.py').write('__version__ = "2.1"\n')
+    assert buildsys.project_version(str(tmpdir)) == '2.1', "memo depends on the attr: module"
+
+
+def test_project_version_from_pyproject(tmpdir, version_memo):
+    tmpdir.join('pyproject.toml').write('[project]\nname = "foo"\nversion = "3.0"\n')
+    assert buildsys.project_version(str(tmpdir)) == '3.0'
+    tmpdir.join('pyproject.toml').write(PYPROJECT.format('3.1'))
+    assert buildsys.project_version(str(tmpdir)) == '3.1'
+
+
+def test_project_version_from_package(tmpdir, version_memo):
+    tmpdir.mkdir('foo').join('__init__.py').write('__version__ = "4.0"\n')
+    assert buildsys.project_version(str(tmpdir)) == '4.0'
+
+
+def test_project_version_of_this_project(tmpdir, monkeypatch, version_memo):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    monkeypatch.setitem(buildsys.config.DEFAULTS, 'cachedir', str(tmpdir))  # keep the checkout clean
+    assert buildsys.project_version(root) == buildsys.project_meta(root).version
@@ -22,12 +22,19 @@
 from __future__ import absolute_import, unicode_literals, print_function
 
 import os
+import shutil
+import hashlib
 import tempfile
+import time
 #import unittest
+from http.server import BaseHTTPRequestHandler
 
 import pytest
+import requests
 
-from rituals.util.filesys import pushd
+from rituals.util import filesys
+from rituals.util.filesys import pushd, remove_files, move_to_trash, purge_trash, disk_usage, TRASH_DIR
+from rituals.util.filesys import cached_download, url_as_file, append_file
 
 
 @pytest.fixture(scope='module')
@@ -51,3 +58,143 @@ def test_pushd_restores_old_cwd(tmpdir):
     with pushd(tmpdir):
         assert os.getcwd() != cwd
     assert os.getcwd() == cwd
+
+
+@pytest.fixture
+def tree():
+    rootpath = tempfile.mkdtemp()
+    os.makedirs(os.path.join(rootpath, 'a', 'b', 'c'))
+    os.makedirs(os.path.join(rootpath, 'keep'))
+    for name, size in (('one', 10), ('a/two', 20), ('a/b/three', 30), ('a/b/c/four', 40), ('keep/five', 50)):
+        with open(os.path.join(rootpath, name), 'wb') as handle:
+            handle.write(b'x' * size)
+    os.symlink(os.path.join(rootpath, 'keep'), os.path.join(rootpath, 'a', 'link'))
+    yield rootpath
+    shutil.rmtree(rootpath)
+
+
+def test_remove_files_handles_files_and_directories(tree):
+    count, size = remove_files(tree, ['one', 'a/b/', 'a/link/', 'missing'], workers=2)
+    assert sorted(os.listdir(tree)) == ['a', 'keep']
+    assert os.listdir(os.path.join(tree, 'a')) == ['two']
+    assert count == 4  # one, three, four, the symlink
+    assert size >= 10 + 30 + 40
+
+
+def test_remove_files_does_not_follow_symlinks(tree):
+    remove_files(tree, ['a/'])
+    assert sorted(os.listdir(tree)) == ['keep', 'one']
+    assert os.listdir(os.path.join(tree, 'keep')) == ['five']
+
+
+def test_disk_usage_counts_files_and_bytes_without_following_symlinks(tree):
+    usage = disk_usage(tree, ['one', 'a/', 'keep/', 'missing'])
+    assert usage[0] == (1, 10)
+    assert usage[1][0] == 4 and usage[1][1] >= 20 + 30 + 40
+    assert usage[2:] == [(1, 50), (0, 0)]
+
+
+def test_move_to_trash_renames_directories_into_a_batch(tree):
+    assert move_to_trash(tree, ['a/b/', 'keep/', 'missing/']) == ['missing/']
+    assert sorted(os.listdir(tree)) == sorted(['a', 'one', TRASH_DIR])
+    batches = os.listdir(os.path.join(tree, TRASH_DIR))
+    assert len(batches) == 1
+    assert sorted(os.listdir(os.path.join(tree, TRASH_DIR, batches[0]))) == ['00000-b', '00001-keep']
+
+
+def test_purge_trash_removes_all_batches_in_the_background(tree):
+    move_to_trash(tree, ['a/'])
+    move_to_trash(tree, ['keep/'])
+    assert purge_trash(tree) == 2
+    for _ in range(100):
+        if not os.listdir(os.path.join(tree, TRASH_DIR)):
+            break
+        time.sleep(.05)
+    assert os.listdir(os.path.join(tree, TRASH_DIR)) == []
+    assert purge_trash(tree) == 0
+
+
+def test_purge_trash_without_any_trash_does_nothing(tree):
+    assert purge_trash(tree) == 0
+
+
+@pytest.fixture
+def web_server(http_server):
+    served = dict(content=b'PyRun' * 1000, requests=[], delay=0)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            etag = '"{}"'.format(hashlib.sha256(served['content']).hexdigest()[:16])
+            served['requests'].append(self.headers.get('If-None-Match'))
+            time.sleep(served['delay'])
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(served['content'])))
+            self.end_headers()
+            self.wfile.write(served['content'])
+
+    served['url'] = http_server(Handler) + '/pyrun.tgz'
+    return served
+
+
+def test_cached_download_is_revalidated(tmp_path, web_server):
+    cached = cached_download(web_server['url'], cache_dir=str(tmp_path))
+    assert cached_download(web_server['url'], cache_dir=str(tmp_path)) == cached
+    assert web_server['requests'][0] is None
+    assert web_server['requests'][1] is not None, "ETag is sent for revalidation"
+    assert open(cached, 'rb').read() == web_server['content']
+    assert not os.access(cached, os.W_OK) or os.geteuid() == 0
+
+    web_server['content'] = b'changed'
+    assert open(cached_download(web_server['url'], cache_dir=str(tmp_path)), 'rb').read() == b'changed'
+
+
+def test_cached_download_with_known_hash_needs_no_request(tmp_path, web_server):
+    sha256 = hashlib.sha256(web_server['content']).hexdigest()
+    cached_download(web_server['url'], sha256=sha256, cache_dir=str(tmp_path))
+    cached_download(web_server['url'], sha256=sha256.upper(), cache_dir=str(tmp_path))
+    assert len(web_server['requests']) == 1
+
+    with pytest.raises(ValueError):
+        cached_download(web_server['url'], sha256='0' * 64, cache_dir=str(tmp_path))
+
+
+def test_cached_download_is_used_when_server_stalls(tmp_path, web_server, monkeypatch):
+    cached = cached_download(web_server['url'], cache_dir=str(tmp_path))
+    monkeypatch.setattr(filesys, 'DOWNLOAD_TIMEOUT', (1, 0.1))
+    web_server['delay'] = 0.5
+    assert cached_download(web_server['url'], cache_dir=str(tmp_path)) == cached
+
+    with pytest.raises(requests.Timeout):
+        cached_download(web_server['url'], cache_dir=str(tmp_path / 'empty'))
+
+
+def test_url_as_file_links_cached_download(tmp_path, web_server):
+    with url_as_file(web_server['url'], ext='tgz', cache_dir=str(tmp_path)) as filename:
+        assert filename.endswith('.tgz')
+        assert os.path.dirname(os.path.dirname(filename)) == str(tmp_path)
+        assert os.path.samefile(filename, cached_download(web_server['url'], cache_dir=str(tmp_path)))
+        assert open(filename, 'rb').read() == web_server['content']
+    assert not os.path.exists(filename)
+    entries = os.listdir(str(tmp_path))
+    assert len(entries) == 1, "link directory is removed"
+    assert sorted(os.listdir(str(tmp_path / entries[0]))) == ['data', 'meta.json']
+
+
+@pytest.mark.parametrize('unsupported', [(), ('copy_file_range',), ('copy_file_range', 'sendfile')])
+def test_append_file_concatenates_files(tmp_path, monkeypatch, unsupported):
+    def fail(*_):
+        raise OSError("not supported")
+
+    for name in unsupported:
+        monkeypatch.setattr(os, name, fail, raising=False)
+    (tmp_path / 'part').write_bytes(os.urandom(300000))
+    with open(str(tmp_path / 'out'), 'wb', buffering=0) as out:
+        out.write(b'header')
+        assert append_file(out.fileno(), str(tmp_path / 'part')) == 300000
+        assert append_file(out.fileno(), str(tmp_path / 'part')) == 300000
+    assert (tmp_path / 'out').read_bytes() == b'header' + (tmp_path / 'part').read_bytes() * 2
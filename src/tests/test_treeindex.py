@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=wildcard-import, missing-docstring, redefined-outer-name, invalid-name, no-self-use
+""" Tests for `rituals.util.treeindex`.
+"""
+# Copyright ⓒ  2015 Jürgen Hermann
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# The full LICENSE file and source are available at
+#    https://github.com/jhermann/rituals
+from __future__ import absolute_import, unicode_literals, print_function
+
+import os
+import time
+import shutil
+import tempfile
+
+import pytest
+
+from rituals.util import treeindex
+from rituals.util.antglob import FileSet
+from rituals.util.treeindex import TreeIndex
+
+
+def age(path, secs=60):
+    """Move the modification time of `path` into the past."""
+    stamp = time.time() - secs
+    os.utime(path, (stamp, stamp))
+
+
+@pytest.fixture
+def root():
+    rootpath = tempfile.mkdtemp()
+    for name in ('a/b', 'c', '.git'):
+        os.makedirs(os.path.join(rootpath, name))
+    for name in ('one.py', 'a/two.py', 'a/b/three.py', 'c/four.txt', '.git/HEAD'):
+        with open(os.path.join(rootpath, name), 'w') as handle:
+            handle.write(name)
+    for name in ('', 'a', 'a/b', 'c', '.git'):
+        age(os.path.join(rootpath, name))
+    yield rootpath
+    shutil.rmtree(rootpath)
+    if os.path.exists(rootpath + '.json'):
+        os.remove(rootpath + '.json')
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    """Count directory reads by the index."""
+    scanned = []
+    def scan_entries(path):
+        scanned.append(os.path.basename(path.rstrip(os.sep)))
+        return real_scan_entries(path)
+    real_scan_entries = treeindex.scan_entries
+    monkeypatch.setattr(treeindex, 'scan_entries', scan_entries)
+    return scanned
+
+
+def test_first_refresh_reports_all_files_as_added(root):
+    index = TreeIndex(root, filename=root + '.json')
+    changes = index.refresh()
+    assert changes.added == ['a/b/three.py', 'a/two.py', 'c/four.txt', 'one.py']
+    assert changes.changed == changes.removed == []
+
+
+def test_snapshot_is_persisted(root):
+    filename = root + '.json'
+    index = TreeIndex(root, filename=filename)
+    index.refresh()
+    index.save()
+    assert os.path.exists(filename)
+
+    changes = TreeIndex(root, filename=filename).refresh()
+    assert changes.added == [] and changes.changed == [] and changes.removed == []
+
+
+def test_refresh_reports_added_changed_and_removed_files(root):
+    index = TreeIndex(root, filename=root + '.json')
+    index.refresh()
+
+    os.remove(os.path.join(root, 'a', 'two.py'))
+    with open(os.path.join(root, 'a', 'b', 'new.py'), 'w') as handle:
+        handle.write('new')
+    with open(os.path.join(root, 'c', 'four.txt'), 'a') as handle:
+        handle.write('changed')
+
+    changes = index.refresh()
+    assert changes.added == ['a/b/new.py']
+    assert changes.changed == ['c/four.txt']
+    assert changes.removed == ['a/two.py']
+
+
+def test_unchanged_directories_are_not_read_again(root, counter):
+    index = TreeIndex(root, filename=root + '.json')
+    index.refresh()
+    index.save()
+    assert sorted(counter) == sorted([os.path.basename(root), 'a', 'b', 'c'])
+
+    del counter[:]
+    with open(os.path.join(root, 'c', 'five.txt'), 'w') as handle:
+        handle.write('five')
+    changes = TreeIndex(root, filename=root + '.json').refresh(check_files=False)
+    assert counter == ['c']
+    assert changes.added == ['c/five.txt']
+
+
+def test_fileset_from_index_generates_the_same_paths(root, counter):
+    index = TreeIndex(root, filename=root + '.json')
+    patterns = ['**/*.py', 'c/']
+    expected = sorted(FileSet(root, patterns))
+    assert sorted(FileSet.from_index(index, patterns)) == expected
+
+    del counter[:]
+    assert sorted(FileSet.from_index(index, patterns)) == expected
+    assert counter == []
@@ -3,8 +3,12 @@
 """ Project automation for Invoke.
 """
 
+import os
+import time
+
 from invoke.tasks import call
 from rituals.easy import *
+from rituals.util import notify
 
 # Example for selective import
 #from rituals.acts.documentation import namespace as _
@@ -12,7 +16,7 @@ from rituals.easy import *
 
 
 @task(pre=[
-    clean, build, test_pytest, check_pylint, # pylint: disable=undefined-variable
+    clean, build, parallel(test_pytest, check_pylint), # pylint: disable=undefined-variable
     #call(clean, all=True),
     #call(build, docs=True),
     #call(test),
@@ -22,3 +26,20 @@ def ci(_):
     """Perform continuous integration tasks."""
 
 namespace.add_task(ci)
+
+
+@task(help=dict(
+    jobs="Number of shards for the parallel run (0 = one per CPU)",
+))
+def bench_check(ctx, jobs=0):
+    """Report the speedup of sharded over single-process pylint checks."""
+    jobs = jobs or os.cpu_count() or 1
+    durations = []
+    for count in (1, jobs):
+        started = time.time()
+        ctx.run('invoke check --jobs={}'.format(count), warn=True, hide=True)
+        durations.append(time.time() - started)
+        notify.info("check --jobs={}: {:.1f} secs".format(count, durations[-1]))
+    notify.info("Speedup with {} shards: {:.2f}x".format(jobs, durations[0] / max(durations[1], 1e-6)))
+
+namespace.add_task(bench_check)